@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from metrics import count, ERRORS
+import events
+
+THREADS_PER_JOB = 4 # cores one 7z -mx9 or par2 process keeps busy; sets the default jobs per device
+
+
+class ArchiveJob(NamedTuple):
+    """
+    One unit of work for the scheduler, e.g. archiving and parchiving one folder.
+
+    run is called with the number of CPU threads the job was granted and returns
+    True on success; returning False or raising marks the attempt as failed.
+    """
+    name: str
+    size: int    # bytes; larger jobs start first
+    device: int  # st_dev of the data, jobs on one device share its I/O limit
+    run: Callable[[int], bool]
+
+
+class JobResult(NamedTuple):
+    job: ArchiveJob
+    ok: bool
+    attempts: int
+    threads: int
+    seconds: float
+    error: Optional[str]
+
+
+def device_of(path: str) -> int:
+    """The device a path lives on, used as the I/O limit key."""
+    return os.stat(path).st_dev
+
+
+def substitute_executables(executables: Dict[str, str], runner: Callable = subprocess.run) -> Callable:
+    """
+    Returns a runner that swaps the program of matching commands, e.g.
+    {"7z": "/tmp/bench/fake-7z", "par2j64": "/tmp/bench/fake-par2j64"},
+    so the scheduler can be benchmarked without the real tools.
+    """
+    def run(command, *args, **kwargs):
+        if command and command[0] in executables:
+            command = [executables[command[0]], *command[1:]]
+        return runner(command, *args, **kwargs)
+    return run
+
+
+class ArchiveScheduler:
+    """
+    Runs archive jobs concurrently within a CPU-thread budget and per-device I/O limits.
+
+    Jobs are started largest first. A job starts when its device has fewer than
+    io_per_device jobs running and at least one thread of the budget is free; it
+    gets an even share of the free threads among the jobs that could start right
+    now, so a lone job on one disk still gets every core while jobs on several
+    disks split them. A failed job is retried up to retries times and never stops
+    the other jobs.
+
+    A job alternates between I/O-heavy archiving and CPU-heavy recovery data, so
+    by default several jobs share a device: enough to fill the CPU budget at
+    THREADS_PER_JOB threads each, and at least two, so one job's par2 overlaps the
+    next one's 7z. Pass io_per_device=1 for media that cannot take concurrent streams.
+
+    Args:
+        cpu_threads (int, optional): Threads shared by all running jobs. Defaults to os.cpu_count().
+        io_per_device (int, optional): Jobs allowed to run at once on one device.
+                                       Defaults to max(2, cpu_threads // THREADS_PER_JOB).
+        max_jobs (int, optional): Jobs allowed to run at once overall. Defaults to cpu_threads.
+        retries (int): Extra attempts for a job that failed.
+    """
+
+    def __init__(self, cpu_threads: Optional[int] = None, io_per_device: Optional[int] = None, max_jobs: Optional[int] = None, retries: int = 1):
+        self.cpu_threads = max(1, cpu_threads or os.cpu_count() or 1)
+        if io_per_device is None:
+            io_per_device = max(2, self.cpu_threads // THREADS_PER_JOB)
+        self.io_per_device = max(1, io_per_device)
+        self.max_jobs = max(1, max_jobs or self.cpu_threads)
+        self.retries = max(0, retries)
+
+    def _execute(self, job: ArchiveJob, threads: int) -> JobResult:
+        start = time.perf_counter()
+        error = None
+        attempts = 0
+        ok = False
+        while not ok and attempts <= self.retries:
+            attempts += 1
+            events.info(f"Starting '{job.name}' with {threads} thread(s) (attempt {attempts}).")
+            try:
+                ok = bool(job.run(threads))
+                error = None if ok else "job reported failure"
+            except Exception as e:
+                ok = False
+                error = f"{type(e).__name__}: {e}"
+            if not ok:
+                count(ERRORS)
+                events.error(f"Job '{job.name}' failed: {error}")
+        seconds = time.perf_counter() - start
+        if ok:
+            events.info(f"Finished '{job.name}' in {seconds:.1f}s.")
+        return JobResult(job, ok, attempts, threads, seconds, error)
+
+    def run(self, jobs: Iterable[ArchiveJob]) -> List[JobResult]:
+        """
+        Runs every job and waits for them.
+
+        Returns:
+            list: JobResult per job, largest job first.
+        """
+        pending = sorted(jobs, key=lambda job: job.size, reverse=True)
+        order = {id(job): position for position, job in enumerate(pending)}
+        results = []
+        device_jobs: Dict[int, int] = {}
+        state = {"free_threads": self.cpu_threads, "running": 0}
+        changed = threading.Condition()
+        workers = []
+
+        def execute(job, threads):
+            try:
+                result = self._execute(job, threads)
+            except BaseException as e: # never leave the dispatcher waiting on a lost job
+                result = JobResult(job, False, 0, threads, 0.0, f"{type(e).__name__}: {e}")
+            with changed:
+                results.append(result)
+                state["free_threads"] += threads
+                state["running"] -= 1
+                device_jobs[job.device] -= 1
+                changed.notify()
+
+        with changed:
+            while pending or state["running"]:
+                # Jobs that could start now, largest first, without exceeding any limit.
+                startable = []
+                claimed = dict(device_jobs)
+                for job in pending:
+                    if state["running"] + len(startable) >= self.max_jobs:
+                        break
+                    if claimed.get(job.device, 0) < self.io_per_device:
+                        claimed[job.device] = claimed.get(job.device, 0) + 1
+                        startable.append(job)
+
+                if not startable or state["free_threads"] < 1:
+                    changed.wait()
+                    continue
+
+                job = startable[0]
+                threads = max(1, state["free_threads"] // len(startable))
+                pending.remove(job)
+                state["free_threads"] -= threads
+                state["running"] += 1
+                device_jobs[job.device] = device_jobs.get(job.device, 0) + 1
+                worker = threading.Thread(target=execute, args=(job, threads), name=f"archive-{job.name}", daemon=True)
+                workers.append(worker)
+                worker.start()
+
+        for worker in workers:
+            worker.join()
+        results.sort(key=lambda result: order[id(result.job)])
+        return results
@@ -1,6 +1,7 @@
 import os
 import sys
 import math
+import shutil
 import subprocess
 
 __parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -9,19 +10,60 @@ sys.path.append(__parent_dir__)
 from size_of_directory import get_directory_size as get_size
 from find_files_by_name import find_files_by_name as find_files
 from file_extention_helper import replace_file_extension as replace_file_extension
+from metrics import count, stage, ERRORS, SUBPROCESSES
+from archive_scheduler import ArchiveJob, ArchiveScheduler, device_of
+from stream_archive import SUFFIXES as STREAM_SUFFIXES, available_codecs, create_stream_archive
+from parity import SUFFIX as PARITY_SUFFIX, create_recovery
+import events
 
+ARCHIVE_BACKEND_ENV = "FILE_ORGANIZER_ARCHIVE_BACKEND" # 7z, xz, zstd or auto (default)
+ARCHIVED_SUFFIX = ".done" # <archive>.done marks volumes that were written completely
+PARITY_ENGINE_ENV = "FILE_ORGANIZER_PARITY_ENGINE"     # par2j64, native or auto (default)
 
-def create_7z_archive(folder_path, archive_path):
+
+def archive_backend(backend=None, runner=None):
+    """
+    Picks the archiver: backend, else the FILE_ORGANIZER_ARCHIVE_BACKEND environment
+    variable, else auto. auto uses 7z when it is on PATH (or a runner stands in for
+    it) and the in-process xz backend of stream_archive otherwise.
+    """
+    backend = (backend or os.environ.get(ARCHIVE_BACKEND_ENV) or "auto").strip().lower()
+    if backend == "auto":
+        return "7z" if runner is not None or shutil.which("7z") else "xz"
+    if backend != "7z" and backend not in available_codecs():
+        raise ValueError(f"Unknown or unavailable archive backend '{backend}'; use 7z, auto or one of {', '.join(available_codecs())}.")
+    return backend
+
+
+def parity_engine(engine=None, runner=None):
+    """
+    Picks the recovery data engine: engine, else the FILE_ORGANIZER_PARITY_ENGINE
+    environment variable, else auto. auto uses par2j64 when it is on PATH (or a
+    runner stands in for it) and the in-process Reed-Solomon engine of parity otherwise.
+    """
+    engine = (engine or os.environ.get(PARITY_ENGINE_ENV) or "auto").strip().lower()
+    if engine == "auto":
+        return "par2j64" if runner is not None or shutil.which("par2j64") else "native"
+    if engine not in ("par2j64", "native"):
+        raise ValueError(f"Unknown parity engine '{engine}'; use par2j64, native or auto.")
+    return engine
+
+
+def create_7z_archive(folder_path, archive_path, threads=None, runner=None, delete_sources=True):
     """
     Creates a 7z archive from the specified folder.
 
     Args:
         folder_path (str): The path to the folder to archive.
         archive_name (str): The desired name of the archive (e.g., "my_archive.7z").
+        threads (int, optional): Compression threads (-mmt); 7z picks by default.
+        runner (callable, optional): Replacement for subprocess.run, e.g. substitute_executables.
+        delete_sources (bool): Delete the archived files afterwards (-sdel).
     """
 
     if not os.path.exists(folder_path):
-        print(f"Error: Folder '{folder_path}' not found.")
+        count(ERRORS)
+        events.error(f"Error: Folder '{folder_path}' not found.")
         return
 
     command = [
@@ -29,48 +71,69 @@ def create_7z_archive(folder_path, archive_path):
         "a",
         "-t7z",
         "-mx9",
+        *([f"-mmt{threads}"] if threads else []),
         "-ms16g",
         "-v4092m",
         "-ssp",
         "-stl",
         "-spe",
-        "-sdel",
+        *(["-sdel"] if delete_sources else []),
         archive_path,
         folder_path,
     ]
 
     try:
-        subprocess.run(command, check=True) # check=True will raise an exception if the command fails
-        print(f"Archive '{archive_path}' created successfully.")
+        with stage("7z_compress"):
+            count(SUBPROCESSES)
+            (runner or subprocess.run)(command, check=True) # check=True will raise an exception if the command fails
+        events.info(f"Archive '{archive_path}' created successfully.")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error creating archive: {e}")
+        count(ERRORS)
+        events.error(f"Error creating archive: {e}")
         return False
     except FileNotFoundError:
-        print("Error: 7z command not found. Make sure 7-Zip is installed and in your PATH.")
+        count(ERRORS)
+        events.error("Error: 7z command not found. Make sure 7-Zip is installed and in your PATH.")
         return False
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        count(ERRORS)
+        events.error(f"An unexpected error occurred: {e}")
         return False
 
 
 # src_files must not be relative
-def create_par2_recovery(src_files, redundancy_rate: int = 10, slice_size_factor: int = 4096, maximum_recovery_file_size: int = 4290772992):
-    
+def create_par2_recovery(src_files, redundancy_rate: int = 10, slice_size_factor: int = 4096, maximum_recovery_file_size: int = 4290772992, size_index=None, threads=None, runner=None, engine=None):
+    # size_index (DirectorySizeIndex, optional) answers folder sizes without re-walking unchanged trees.
+    # threads (int, optional) caps the cores par2j64 uses; runner replaces subprocess.run.
+    # engine (str, optional) picks par2j64 or the native parity engine, see parity_engine;
+    # the native engine writes one <file>.rsp, whatever maximum_recovery_file_size.
 
     src_files_paths = set()
     for file in src_files:
         if not os.path.exists(file):
-            print(f"Error: File or directory not found: {file}")
+            count(ERRORS)
+            events.error(f"Error: File or directory not found: {file}")
             return False
         
         src_files_paths.add(os.path.abspath(file))
 
-    output_directory = sorted(list(src_files_paths), key=len)[0] + '.par2'
+    engine = parity_engine(engine, runner)
+    output_directory = sorted(list(src_files_paths), key=len)[0] + ('.par2' if engine == "par2j64" else PARITY_SUFFIX)
     if os.path.exists(output_directory):
         raise FileExistsError(f"Output file already exists: {output_directory}")
 
-    source_files_size = get_size(src_files_paths)
+    if engine == "native":
+        try:
+            create_recovery(src_files_paths, output_directory, redundancy_rate, slice_size_factor, workers=threads)
+            events.info(f"Recovery file created successfully: {output_directory}")
+            return True
+        except Exception as e:
+            count(ERRORS)
+            events.error(f"Error creating recovery file: {e}")
+            return False
+
+    source_files_size = get_size(src_files_paths, size_index=size_index)
     recovery_file_count = math.ceil((source_files_size * redundancy_rate/100) / maximum_recovery_file_size)
            
 
@@ -81,65 +144,148 @@ def create_par2_recovery(src_files, redundancy_rate: int = 10, slice_size_factor
         f"/sm{slice_size_factor}",
         "/rd0",
         f"/rf{recovery_file_count}",
-        "/lc256", #Max cores (0) + GPU (+256) 
+        f"/lc{256 + (threads or 0)}", #Max cores (0) or threads + GPU (+256)
         output_directory
     ]
     command.extend(src_files_paths)
 
     try:
-        subprocess.run(command, check=True)
-        print(f"PAR2 recovery files created successfully for: {output_directory}")
+        with stage("par2_create"):
+            count(SUBPROCESSES)
+            (runner or subprocess.run)(command, check=True)
+        events.info(f"PAR2 recovery files created successfully for: {output_directory}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error creating PAR2 recovery files: {e}")
+        count(ERRORS)
+        events.error(f"Error creating PAR2 recovery files: {e}")
         return False
     except FileNotFoundError:
-        print("Error: par2 command not found. Make sure it is installed and in your PATH.")
+        count(ERRORS)
+        events.error("Error: par2 command not found. Make sure it is installed and in your PATH.")
         return False
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        count(ERRORS)
+        events.error(f"An unexpected error occurred: {e}")
         return False
 
 
-def archive_and_parchive(folder_path):
+def archive_and_parchive(folder_path, threads=None, runner=None, size_index=None, backend=None, parity=None):
+    """
+    Archives a folder into <folder>/<folder>.7z volumes and adds PAR2 recovery files.
+    With another backend (see archive_backend) the volumes are <folder>.tar.xz.001, ...
+    Once the volumes are complete, an empty <archive>.done file is written next to them.
+    Volumes or recovery files left by a failed run are removed, so the job can simply
+    be run again; when the volumes are complete and only the recovery files failed,
+    a new run only creates the recovery files. Volumes count as complete when the
+    marker exists, or when the sources are gone (-sdel) for runs that predate it.
+
+    Returns:
+        bool: True if the folder ended up archived and parchived.
+    """
     if not os.path.exists(folder_path):
-        print(f"Error: Folder '{folder_path}' not found.")
-        return
+        count(ERRORS)
+        events.error(f"Error: Folder '{folder_path}' not found.")
+        return False
 
+    backend = archive_backend(backend, runner)
     folder_name = os.path.basename(folder_path)
-    output_path = os.path.join(folder_path, folder_name + '.7z')
+    output_path = os.path.join(folder_path, folder_name + STREAM_SUFFIXES.get(backend, '.7z'))
+    marker = output_path + ARCHIVED_SUFFIX
+    existing_volumes = find_files(folder_path, starts_with=os.path.basename(output_path)) - {marker}
+    sources_left = any(os.path.join(folder_path, name) not in existing_volumes | {marker} for name in os.listdir(folder_path))
 
-    try:
-        create_7z_archive(folder_path, output_path)
-    except FileExistsError:
-        pass
-    except Exception as e:
-        raise Exception(f"An unknown error occured: {e}")
-    
-    archive_paths = find_files(folder_path, starts_with=os.path.basename(output_path))
+    if os.path.exists(marker) or (existing_volumes and not sources_left):
+        events.info(f"Archive '{output_path}' already exists; creating its recovery files only.")
+        archived = True
+    else:
+        if existing_volumes:
+            # Left by an interrupted run, since the sources are still there: start over.
+            events.warning(f"Removing the incomplete archive '{output_path}' of an earlier run.")
+            for partial_volume in existing_volumes:
+                os.remove(partial_volume)
+            existing_volumes = set()
+        try:
+            if backend == "7z":
+                archived = create_7z_archive(folder_path, output_path, threads=threads, runner=runner)
+            else:
+                archived = create_stream_archive(folder_path, output_path, codec=backend, workers=threads)
+        except FileExistsError:
+            archived = True
+        except Exception as e:
+            raise Exception(f"An unknown error occured: {e}")
 
+    archive_paths = find_files(folder_path, starts_with=os.path.basename(output_path)) - {marker}
+    if not archived:
+        for partial_volume in archive_paths - existing_volumes:
+            os.remove(partial_volume)
+        return False
+    if not os.path.exists(marker):
+        open(marker, "wb").close()
+
+    # Recovery files of an earlier attempt are not part of the data to protect.
+    archive_paths = {path for path in archive_paths if not path.endswith(('.par2', PARITY_SUFFIX))}
     try:
-        create_par2_recovery(archive_paths)
+        parchived = create_par2_recovery(archive_paths, size_index=size_index, threads=threads, runner=runner, engine=parity)
     except FileExistsError:
-        return
+        return True
     except Exception as e:
         raise Exception(f"An unknown error occured: {e}")
 
+    if not parchived:
+        partial_recovery = find_files(folder_path, starts_with=os.path.basename(output_path)) - archive_paths - {marker}
+        for partial_file in partial_recovery - existing_volumes:
+            os.remove(partial_file)
+    return parchived
 
-def archive_and_parchive_subfolders(folder_path):
 
-    subfolders = []
+def archive_and_parchive_subfolders(folder_path, cpu_threads=None, io_per_device=None, max_jobs=None, retries=1, runner=None, size_index=None, backend=None, parity=None):
+    """
+    Archives and parchives every subfolder of a folder, several at a time.
+
+    Subfolders run as ArchiveScheduler jobs, largest first, sharing cpu_threads
+    between the 7z and par2j64 processes and running at most io_per_device jobs
+    per disk (by default several, see ArchiveScheduler). A folder that fails is
+    retried, then reported; the others go on.
+
+    Args:
+        folder_path (str): The folder whose subfolders are archived.
+        cpu_threads (int, optional): Thread budget of all jobs together. Defaults to os.cpu_count().
+        io_per_device (int, optional): Jobs running at once on one disk, see ArchiveScheduler.
+        max_jobs (int, optional): Jobs running at once overall.
+        retries (int): Extra attempts for a folder that failed.
+        runner (callable, optional): Replacement for subprocess.run, e.g. substitute_executables.
+        size_index (DirectorySizeIndex, optional): Answers folder sizes without re-walking unchanged trees.
+        backend (str, optional): Archiver, see archive_backend.
+        parity (str, optional): Recovery data engine, see parity_engine.
+
+    Returns:
+        list: A JobResult per subfolder, largest first.
+    """
+
     if not os.path.exists(folder_path):
-        return subfolders
+        return []
 
+    backend = archive_backend(backend, runner)
+    parity = parity_engine(parity, runner)
+    jobs = []
     for item in os.listdir(folder_path):
         item_path = os.path.join(folder_path, item)
         if os.path.isdir(item_path):
-            subfolders.append(item_path)
+            jobs.append(ArchiveJob(
+                name=item,
+                size=get_size(item_path, size_index=size_index) or 0,
+                device=device_of(item_path),
+                run=lambda threads, folder=item_path: archive_and_parchive(folder, threads, runner, size_index, backend, parity),
+            ))
+
+    scheduler = ArchiveScheduler(cpu_threads=cpu_threads, io_per_device=io_per_device, max_jobs=max_jobs, retries=retries)
+    results = scheduler.run(jobs)
 
-    for folder in subfolders:
-        archive_and_parchive(folder)
-    
+    failed = [result for result in results if not result.ok]
+    if failed:
+        events.error(f"{len(failed)} of {len(results)} folders could not be archived: " +
+                     ", ".join(f"'{result.job.name}' ({result.error})" for result in failed))
+    return results
 
 
 def main():
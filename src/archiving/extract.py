@@ -6,8 +6,14 @@ import subprocess
 __parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(__parent_dir__)
 
-from find_files_by_name import find_files_by_name as find_files
+from find_files_by_name import iter_files_by_name
+from string_content_check import NameMatcher
 from file_extention_helper import append_file_extension as append_file_extension
+from metrics import count, stage, ERRORS, SUBPROCESSES
+from stream_archive import SUFFIXES as STREAM_SUFFIXES, extract_stream_archive
+from par2_runner import verify_par2_sets
+from parity import SUFFIX as PARITY_SUFFIX
+import events
 
 
 def remove_7z_extension(file_path):
@@ -33,7 +39,8 @@ def extract_7z(archive_path, extract_path):
     Extracts a 7z archive.
     """
     if not os.path.exists(archive_path):
-        print(f"Error: 7z archive not found: {archive_path}")
+        count(ERRORS)
+        events.error(f"Error: 7z archive not found: {archive_path}")
         return False
 
     command = [
@@ -46,17 +53,22 @@ def extract_7z(archive_path, extract_path):
     ]
 
     try:
-        subprocess.run(command, check=True)
-        print(f"Successfully extracted {archive_path} to {extract_path}")
+        with stage("7z_extract"):
+            count(SUBPROCESSES)
+            subprocess.run(command, check=True)
+        events.info(f"Successfully extracted {archive_path} to {extract_path}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error extracting {archive_path}: {e}")
+        count(ERRORS)
+        events.error(f"Error extracting {archive_path}: {e}")
         return False
     except FileNotFoundError:
-        print("Error: 7z command not found. Make sure it is installed and in your PATH.")
+        count(ERRORS)
+        events.error("Error: 7z command not found. Make sure it is installed and in your PATH.")
         return False
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        count(ERRORS)
+        events.error(f"An unexpected error occurred: {e}")
         return False
 
 
@@ -64,54 +76,39 @@ def verify_and_repair_par2(par2_file_path, repair=True):
     """
     Verifies and optionally repairs files using a PAR2 file.
     """
-    if not os.path.exists(par2_file_path):
-        print(f"Error: PAR2 file not found: {par2_file_path}")
-        return False
+    return verify_par2_sets([par2_file_path], repair=repair)[0].ok
 
-    par2_dir = os.path.dirname(par2_file_path)
-    try:
-        verify_process = subprocess.run(
-            ["par2j64", "v", par2_file_path],
-            cwd=par2_dir,
-            capture_output=True,
-            text=True,
-        )
-
-        if "All Files Complete" in verify_process.stdout:
-            print(f"Verification successful: All files are correct for {par2_file_path}")
-            return True
-        elif "Ready to repair" in verify_process.stdout:
-            print(f"Verification failed: Some files are missing or damaged for {par2_file_path}")
-            if repair:
-                print(f"Attempting repair for {par2_file_path}...")
-                repair_process = subprocess.run(
-                    ["par2j64", "r", par2_file_path],
-                    cwd=par2_dir,
-                    capture_output=True,
-                    text=True,
-                )
-                if "Repaired successfully" in repair_process.stdout:
-                    print(f"Repair successful for {par2_file_path}.")
-                    return True
-                else:
-                    print(f"Repair failed for {par2_file_path}.")
-                    print(repair_process.stdout)
-                    print(repair_process.stderr)
-                    return False
-            else:
-                return False
-        else:
-            print(f"Unknown PAR2 output during verification for {par2_file_path}:")
-            print(verify_process.stdout)
-            print(verify_process.stderr)
-            return False
 
-    except FileNotFoundError:
-        print("Error: par2j64 command not found. Make sure it is installed and in your PATH.")
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return False
+def _par2_sets_of(kind, file_path):
+    """
+    The recovery files that may protect an archive (PAR2, or .rsp of the native engine),
+    in the order they are tried, or the first candidate name if none exists.
+    """
+    if kind in STREAM_SUFFIXES:
+        names = [file_path]
+    else:
+        file_path_name = remove_7z_extension(file_path)
+        names = [append_file_extension(file_path_name, '.7z'), append_file_extension(file_path_name, '.7z.001')]
+    candidates = [name + suffix for suffix in ('.par2', PARITY_SUFFIX) for name in names]
+    return [candidate for candidate in candidates if os.path.exists(candidate)] or candidates[:1]
+
+
+def _verify_archives(archives):
+    """
+    Verifies (and repairs) the recovery set of every archive, in parallel across disks.
+    An archive whose set fails falls back to its next set, e.g. name.7z.001.par2 after
+    name.7z.par2. Returns the last result of each archive.
+    """
+    candidates = [_par2_sets_of(kind, file_path) for kind, file_path, _ in archives]
+    results = [None] * len(archives)
+    pending = list(range(len(archives)))
+    attempt = 0
+    while pending:
+        for position, result in zip(pending, verify_par2_sets([candidates[position][attempt] for position in pending])):
+            results[position] = result
+        attempt += 1
+        pending = [position for position in pending if not results[position].ok and attempt < len(candidates[position])]
+    return results
 
 
 def verify_and_extract_archives(folder_path):
@@ -119,25 +116,32 @@ def verify_and_extract_archives(folder_path):
         folder_path = os.path.abspath(folder_path)
 
     if not os.path.exists(folder_path):
-        print(f"Error: Folder '{folder_path}' does not exist.")
+        count(ERRORS)
+        events.error(f"Error: Folder '{folder_path}' does not exist.")
         return
     
-    _7z_files =  find_files(folder_path, ends_with = '.7z', search_subdir = True)
-    _7z_volume_files = find_files(folder_path, ends_with = '.7z.001', search_subdir = True)
-    archive_files = _7z_files | _7z_volume_files
-    
-    if not archive_files:
-        return print(f"No archives found in directory: {folder_path}")
-
-    for file_path in archive_files:
-        file_path_name = remove_7z_extension(file_path)
+    queries = {
+        '7z': NameMatcher(ends_with='.7z'),
+        '7z volume': NameMatcher(ends_with='.7z.001'),
+        **{codec: NameMatcher(ends_with=suffix + '.001') for codec, suffix in STREAM_SUFFIXES.items()},
+    }
+    archives = list(iter_files_by_name(folder_path, queries, search_subdir=True))
+    # Every archive's PAR2 set is verified (and repaired) first, in parallel across
+    # disks, then the sound archives are extracted one after another.
+    verified = _verify_archives(archives)
+
+    archives_found = 0
+    for (kind, file_path, _), result in zip(archives, verified):
+        archives_found += 1
         directory, _ = os.path.split(file_path)
         parent_folder_name = os.path.basename(directory)
 
-        if verify_and_repair_par2(append_file_extension(file_path_name, '.7z.par2')):
-            extract_7z(file_path, remove_7z_extension(file_path))
-        elif verify_and_repair_par2(append_file_extension(file_path_name, '.7z.001.par2')):
-            extract_7z(file_path, remove_7z_extension(file_path))
+        if result.ok:
+            if kind in STREAM_SUFFIXES:
+                # The archive's root is its folder's name, so it lands where 7z -spe puts it.
+                extract_stream_archive(file_path, directory)
+            else:
+                extract_7z(file_path, remove_7z_extension(file_path))
         
         try:
             items_in_dir = os.listdir(directory)
@@ -148,15 +152,18 @@ def verify_and_extract_archives(folder_path):
                     shutil.move(child_path, os.path.dirname(children_dir_path))
                 os.rmdir(children_dir_path)
         except FileNotFoundError:
-            print(f"Warning: Directory '{directory}' not found after extraction.")
+            events.warning(f"Warning: Directory '{directory}' not found after extraction.")
         except Exception as e:
-            print(f"An error occurred while moving folder: {e}")   
+            events.error(f"An error occurred while moving folder: {e}")
+
+    if not archives_found:
+        events.info(f"No archives found in directory: {folder_path}")
 
 
 def main():
     folder_path = input("Enter the directory folder: ")  
     verify_and_extract_archives(folder_path)
-    print("Done!")
+    events.info("Done!")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,320 @@
+import io
+import os
+import sys
+import lzma
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from compression import zstd # Python 3.14+
+except ImportError:
+    zstd = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from metrics import count, stage, ERRORS
+import events
+
+# Archive name suffix per codec; volumes append .001, .002, ... like 7z -v.
+SUFFIXES = {"xz": ".tar.xz", "zstd": ".tar.zst"}
+DEFAULT_LEVELS = {"xz": 6, "zstd": 9}
+VOLUME_SIZE = 4092 * 1024 * 1024 # as 7z -v4092m
+BLOCK_SIZE = 16 * 1024 * 1024    # tar stream bytes compressed per job
+
+
+def available_codecs():
+    """Codecs usable on this host: xz always, zstd with Python 3.14 or the zstandard package."""
+    return ["xz", "zstd"] if zstd is not None or zstandard is not None else ["xz"]
+
+
+def _compress_block(job):
+    """
+    Compresses one block of the tar stream into a complete xz stream or zstd frame.
+    Concatenated streams and frames decompress as one, so blocks compress independently.
+    """
+    codec, level, data = job
+    if codec == "xz":
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+    if zstd is not None:
+        return zstd.compress(data, level=level)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _decompressing_reader(codec, raw):
+    if codec == "xz":
+        return lzma.LZMAFile(raw) # reads across concatenated streams
+    if zstd is not None:
+        return zstd.ZstdFile(raw)
+    return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+
+
+def volume_paths(archive_path):
+    """The existing volumes of an archive, in order."""
+    paths = []
+    while os.path.exists(f"{archive_path}.{len(paths) + 1:03d}"):
+        paths.append(f"{archive_path}.{len(paths) + 1:03d}")
+    return paths
+
+
+class _VolumeWriter:
+    """Writes a byte stream into archive.001, archive.002, ... of at most volume_size bytes."""
+
+    def __init__(self, archive_path, volume_size):
+        self.archive_path = archive_path
+        self.volume_size = volume_size
+        self.paths = []
+        self.bytes_written = 0
+        self._file = None
+        self._room = 0
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            if not self._room:
+                self._next_volume()
+            part = view[:self._room]
+            self._file.write(part)
+            self._room -= len(part)
+            self.bytes_written += len(part)
+            view = view[len(part):]
+
+    def _next_volume(self):
+        if self._file is not None:
+            self._file.close()
+        path = f"{self.archive_path}.{len(self.paths) + 1:03d}"
+        self._file = open(path, "xb")
+        self.paths.append(path)
+        self._room = self.volume_size
+
+    def close(self):
+        if self._file is None: # an empty stream still gets its first volume
+            self._next_volume()
+        self._file.close()
+
+
+class _BlockCompressor(io.RawIOBase):
+    """
+    The file tarfile streams into. Full blocks are compressed by the executor (or
+    inline without one) and written to the volumes in order; at most max_pending
+    blocks are in flight, which bounds memory to about max_pending * block_size.
+    """
+
+    def __init__(self, volumes, codec, level, block_size, executor=None, max_pending=1):
+        self.volumes = volumes
+        self.codec = codec
+        self.level = level
+        self.block_size = block_size
+        self.executor = executor
+        self.max_pending = max_pending
+        self.bytes_in = 0
+        self._buffer = bytearray()
+        self._pending = deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self.bytes_in += len(data)
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        job = (self.codec, self.level, block)
+        if self.executor is None:
+            self.volumes.write(_compress_block(job))
+            return
+        self._pending.append(self.executor.submit(_compress_block, job))
+        while len(self._pending) >= self.max_pending:
+            self.volumes.write(self._pending.popleft().result())
+
+    def finish(self):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self.volumes.write(self._pending.popleft().result())
+
+
+class _VolumeReader(io.RawIOBase):
+    """Reads the volumes of an archive as one stream."""
+
+    def __init__(self, paths):
+        self._paths = deque(paths)
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self._file is None:
+                if not self._paths:
+                    return 0
+                self._file = open(self._paths.popleft(), "rb")
+            read = self._file.readinto(buffer)
+            if read:
+                return read
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def _archive_entries(folder_path, archive_path):
+    """
+    Folders and files under folder_path, parents first, leaving out the archive's own volumes.
+    Symlinked folders are not descended into; like symlinked files, the link itself is an entry.
+    """
+    volume_prefix = os.path.abspath(archive_path) + "."
+    for dirpath, dirnames, filenames in os.walk(folder_path):
+        dirnames.sort()
+        if dirpath != folder_path:
+            yield dirpath
+        for dirname in dirnames:
+            path = os.path.join(dirpath, dirname)
+            if os.path.islink(path):
+                yield path
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if not os.path.abspath(path).startswith(volume_prefix):
+                yield path
+
+
+def _delete_archived(folder_path, entries):
+    # As 7z -sdel: remove what went into the archive, deepest folders last.
+    for path in entries:
+        if not os.path.isdir(path) or os.path.islink(path):
+            os.remove(path)
+    for path in sorted((path for path in entries if os.path.isdir(path)), key=len, reverse=True):
+        try:
+            os.rmdir(path)
+        except OSError: # kept a file that appeared meanwhile
+            pass
+
+
+def create_stream_archive(
+        folder_path,
+        archive_path,
+        codec="xz",
+        level=None,
+        volume_size=VOLUME_SIZE,
+        block_size=BLOCK_SIZE,
+        workers=None,
+        delete_sources=True
+):
+    """
+    Creates a tar archive of a folder without 7-Zip, compressed in parallel blocks.
+
+    The tar stream is cut into block_size blocks that a process pool compresses
+    into independent xz streams (or zstd frames); they are written in order and
+    split into volumes like 7z -v, e.g. archive.tar.xz.001. The folder is the root
+    of the archive, as with 7z. Files are streamed, so memory stays around
+    2 * workers * block_size whatever the folder size.
+
+    Args:
+        folder_path (str): The path to the folder to archive.
+        archive_path (str): The archive path without the volume number (e.g. "folder/folder.tar.xz").
+        codec (str): "xz", or "zstd" when available (see available_codecs).
+        level (int, optional): Compression preset or level. Defaults to DEFAULT_LEVELS.
+        volume_size (int): Maximum bytes per volume.
+        block_size (int): Tar stream bytes per compressed block.
+        workers (int, optional): Compression processes. Defaults to os.cpu_count(); 1 compresses inline.
+        delete_sources (bool): Delete the archived files afterwards, as 7z -sdel.
+
+    Returns:
+        bool: True if the archive was created.
+    """
+    if not os.path.isdir(folder_path):
+        count(ERRORS)
+        events.error(f"Error: Folder '{folder_path}' not found.")
+        return False
+    if codec not in available_codecs():
+        count(ERRORS)
+        events.error(f"Error: Codec '{codec}' is not available; use one of {', '.join(available_codecs())}.")
+        return False
+    if volume_paths(archive_path):
+        count(ERRORS)
+        events.error(f"Error: Archive '{archive_path}' already exists.")
+        return False
+
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    workers = workers or os.cpu_count() or 1
+    volumes = _VolumeWriter(archive_path, volume_size)
+    entries = []
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with stage(f"{codec}_compress"):
+            compressor = _BlockCompressor(volumes, codec, level, block_size, executor, max_pending=2 * workers)
+            with tarfile.open(fileobj=compressor, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                root = os.path.basename(os.path.normpath(folder_path))
+                for path in _archive_entries(folder_path, archive_path):
+                    tar.add(path, arcname=os.path.join(root, os.path.relpath(path, folder_path)), recursive=False)
+                    entries.append(path)
+            compressor.finish()
+            volumes.close()
+    except Exception as e:
+        count(ERRORS)
+        events.error(f"Error creating archive: {e}")
+        volumes.close()
+        for path in volumes.paths:
+            os.remove(path)
+        return False
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if delete_sources:
+        _delete_archived(folder_path, entries)
+    ratio = volumes.bytes_written / compressor.bytes_in if compressor.bytes_in else 0
+    events.info(f"Archive '{archive_path}' created successfully ({len(volumes.paths)} volume(s), ratio {ratio:.2f}).")
+    return True
+
+
+def extract_stream_archive(archive_path, extract_path):
+    """
+    Extracts an archive made by create_stream_archive, streaming across its volumes.
+
+    Args:
+        archive_path (str): The archive path, with or without the .001 volume number.
+        extract_path (str): The folder to extract into.
+    """
+    if archive_path.endswith(".001"):
+        archive_path = archive_path[:-4]
+    codec = next((codec for codec, suffix in SUFFIXES.items() if archive_path.endswith(suffix)), None)
+    paths = volume_paths(archive_path)
+    if codec is None or not paths:
+        count(ERRORS)
+        events.error(f"Error: Archive not found: {archive_path}")
+        return False
+    if codec not in available_codecs():
+        count(ERRORS)
+        events.error(f"Error: Codec '{codec}' is not available to extract {archive_path}.")
+        return False
+
+    try:
+        with stage(f"{codec}_extract"):
+            with _VolumeReader(paths) as raw, _decompressing_reader(codec, io.BufferedReader(raw)) as stream:
+                with tarfile.open(fileobj=stream, mode="r|") as tar:
+                    if hasattr(tarfile, "data_filter"):
+                        tar.extractall(extract_path, filter="data")
+                    else:
+                        tar.extractall(extract_path)
+        events.info(f"Successfully extracted {archive_path} to {extract_path}")
+        return True
+    except Exception as e:
+        count(ERRORS)
+        events.error(f"Error extracting {archive_path}: {e}")
+        return False
@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+from generate_random_folders import generate_media_corpus
+from find_files_by_name import find_files_by_name
+from remove_duplicates import find_duplicates
+from grouping.group_files_by_name import sort_files as group_by_name
+from grouping.group_images_by_name_date import sort_files as group_by_name_date
+from grouping.group_images_by_date_taken import organize_images_by_date as group_by_date_taken
+from grouping.group_files_by_media_created import sort_by_media_created as group_by_media_created
+from grouping.group_folders_by_year import group_folders_by_year as group_folders
+from move_aae_files import sort_files_by_date as move_aae_files
+from match_files_by_name_start import sort_by_matching_name as match_by_name
+from delete_empty_folders import delete_empty_folders
+from scan_index import ScanIndex
+from size_of_directory import get_directory_size
+from metrics import METRICS
+import parity
+import events
+
+# The archiving scripts import their siblings as top-level modules.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "archiving"))
+from compress import create_7z_archive
+from extract import extract_7z
+from stream_archive import SUFFIXES as STREAM_SUFFIXES, create_stream_archive, extract_stream_archive
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+DUPLICATE_FILE_TYPES = [".jpg", ".jpeg", ".png", ".mp4", ".mov"]
+# Small files keep duplicate hashing from dominating every run; --realistic-sizes
+# uses the generator's camera-like sizes instead (sparse, but still read when hashed).
+COMPACT_SIZE_DISTRIBUTIONS = {
+    "photo": (40_000, 0.5),
+    "screenshot": (20_000, 0.5),
+    "video": (200_000, 0.8),
+    "other": (8_000, 1.0),
+}
+
+
+class _OutputCounter:
+    """Swallows the per-file messages of a stage, counting them (and the moves) instead."""
+
+    def __init__(self):
+        self.lines = 0
+        self.moved = 0
+
+    def write(self, text):
+        self.lines += text.count("\n")
+        self.moved += text.count("Moved ")
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def _summarize(result):
+    if isinstance(result, list) and result and hasattr(result[0], "as_dict"): # pipeline stage stats
+        return [stats.as_dict() for stats in result]
+    if isinstance(result, (set, list, dict, tuple)):
+        return len(result)
+    if isinstance(result, (bool, int, float)) or result is None:
+        return result
+    return str(result)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_stage(name, func):
+    """Runs func with its output counted instead of printed. Returns a result dict."""
+    counter = _OutputCounter()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    error = None
+    result = None
+    METRICS.reset()
+    try:
+        with contextlib.redirect_stdout(counter):
+            try:
+                result = func()
+            finally:
+                events.flush() # the messages are written by a background thread
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "stage": name,
+        "wall_seconds": round(time.perf_counter() - wall_start, 6),
+        "cpu_seconds": round(time.process_time() - cpu_start, 6),
+        "result": _summarize(result),
+        "files_moved": counter.moved,
+        "output_lines": counter.lines,
+        "counters": METRICS.snapshot()["counters"],
+        "error": error,
+    }
+
+
+def benchmark_stages(src_dir, dest_dir, use_index=False):
+    """
+    Times every stage on one corpus, read-only stages first, then the grouping
+    stages in the order main.py runs them, so each sees what the previous ones left.
+    """
+    results = []
+    index = None
+    if use_index:
+        holder = {}
+        results.append(time_stage("scan_index", lambda: holder.setdefault("index", ScanIndex([src_dir, dest_dir]))))
+        index = holder.get("index")
+
+    stages = [
+        ("find_files_by_name", lambda: find_files_by_name(src_dir, ends_with=".jpg", search_subdir=True)),
+        ("find_duplicates", lambda: find_duplicates(src_dir, DUPLICATE_FILE_TYPES)),
+        ("group_files_by_name[received_]", lambda: group_by_name(
+            src_dir, os.path.join(dest_dir, "facebook_messenger"), startswith="received_",
+            match_case=True, allowed_file_types=[".jpeg", ".png", ".gif"], index=index)),
+        ("group_files_by_name[FB_IMG_]", lambda: group_by_name(
+            src_dir, os.path.join(dest_dir, "facebook"), startswith="FB_IMG_",
+            match_case=True, allowed_file_types=[".jpg"], index=index)),
+        ("group_files_by_name[screenshot]", lambda: group_by_name(
+            src_dir, os.path.join(dest_dir, "screenshots"), startswith="screenshot",
+            allowed_file_types=[".jpg", ".png"], index=index)),
+        ("group_images_by_name_date", lambda: group_by_name_date(
+            src_dir, dest_dir, [".png", ".jpg", ".jpeg", ".mov", ".mp4", ".modd", ".heic"], index=index)),
+        ("move_aae_files", lambda: move_aae_files(src_dir, dest_dir, ".aae", True, index=index)),
+        ("group_images_by_date_taken", lambda: group_by_date_taken(
+            src_dir, dest_dir, [".png", ".jpg", ".jpeg", ".cr2", ".heic"], index=index)),
+        ("sort_by_matching_name", lambda: match_by_name(src_dir, dest_dir, [".aae", ".thm", ".modd", ".mov"], index=index)),
+        ("group_files_by_media_created", lambda: group_by_media_created(
+            src_dir, dest_dir, [".mov", ".mp4", ".cr2"], "UTC", index=index)),
+        ("group_folders_by_year", lambda: group_folders(dest_dir, dest_dir, index=index)),
+        ("delete_empty_folders", lambda: delete_empty_folders(src_dir, index=index)),
+    ]
+    for name, func in stages:
+        results.append(time_stage(name, func))
+        print(f"  {name}: {results[-1]['wall_seconds']:.3f}s", file=sys.stderr)
+    return results
+
+
+def _archive_volume_bytes(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def benchmark_archivers(folder, archivers, workdir, workers=None):
+    """
+    Archives and extracts folder with each archiver (7z, or a stream_archive codec)
+    into workdir, keeping the sources, and reports MB/s of input and the ratio.
+    """
+    input_bytes = get_directory_size(folder) or 0
+    results = []
+    for archiver in archivers:
+        archive_dir = os.path.join(workdir, f"archive-{archiver}")
+        extract_dir = os.path.join(workdir, f"extract-{archiver}")
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        os.makedirs(archive_dir)
+        os.makedirs(extract_dir)
+        name = os.path.basename(os.path.normpath(folder))
+        if archiver == "7z":
+            archive_path = os.path.join(archive_dir, name + ".7z")
+            create = lambda: create_7z_archive(folder, archive_path, threads=workers, delete_sources=False)
+            extract = lambda: extract_7z(archive_path + ".001", extract_dir)
+        else:
+            archive_path = os.path.join(archive_dir, name + STREAM_SUFFIXES[archiver])
+            create = lambda: create_stream_archive(folder, archive_path, codec=archiver, workers=workers, delete_sources=False)
+            extract = lambda: extract_stream_archive(archive_path, extract_dir)
+
+        compress_run = time_stage(f"{archiver}_compress", create)
+        extract_run = time_stage(f"{archiver}_extract", extract) if compress_run["result"] else None
+        output_bytes = _archive_volume_bytes(archive_dir)
+        results.append({
+            "archiver": archiver,
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "ratio": round(output_bytes / input_bytes, 4) if input_bytes and compress_run["result"] else None,
+            "compress": compress_run,
+            "compress_mb_per_second": round(input_bytes / 2**20 / compress_run["wall_seconds"], 3) if compress_run["result"] else None,
+            "extract": extract_run,
+            "extract_mb_per_second": round(input_bytes / 2**20 / extract_run["wall_seconds"], 3) if extract_run and extract_run["result"] else None,
+        })
+        print(f"  archive {archiver}: {results[-1]['compress_mb_per_second']} MB/s, ratio {results[-1]['ratio']}", file=sys.stderr)
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        shutil.rmtree(extract_dir, ignore_errors=True)
+    return results
+
+
+def benchmark_parity(workdir, size_mb, redundancy_rate=10, worker_counts=None):
+    """
+    Times the native parity engine on size_mb of random data: creating recovery
+    data, verifying, and repairing after damaging half the redundancy, once per
+    worker count. Throughput is reported in MB of source data per second, and per core.
+    """
+    parity_dir = os.path.join(workdir, "parity")
+    shutil.rmtree(parity_dir, ignore_errors=True)
+    os.makedirs(parity_dir)
+    data_path = os.path.join(parity_dir, "data.bin")
+    with open(data_path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(2**20))
+    worker_counts = worker_counts or sorted({1, os.cpu_count() or 1})
+
+    runs = []
+    try:
+        for workers in worker_counts:
+            recovery_path = data_path + parity.SUFFIX
+            if os.path.exists(recovery_path):
+                os.remove(recovery_path)
+            create = time_stage("parity_create", lambda: parity.create_recovery([data_path], recovery_path, redundancy_rate, workers=workers))
+            verify = time_stage("parity_verify", lambda: parity.verify_recovery(recovery_path, workers).complete)
+            damaged_bytes = size_mb * 2**20 * redundancy_rate // 200
+            with open(data_path, "r+b") as f:
+                f.seek(size_mb * 2**20 // 3)
+                f.write(os.urandom(damaged_bytes))
+            repair = time_stage("parity_repair", lambda: parity.repair_recovery(recovery_path, workers))
+
+            def throughput(run):
+                return round(size_mb / run["wall_seconds"], 3) if run["wall_seconds"] and not run["error"] else None
+
+            runs.append({
+                "workers": workers,
+                "create": create,
+                "verify": verify,
+                "repair": repair,
+                "damaged_bytes": damaged_bytes,
+                "create_mb_per_second": throughput(create),
+                "create_mb_per_second_per_core": round(throughput(create) / workers, 3) if throughput(create) else None,
+                "verify_mb_per_second": throughput(verify),
+                "repair_mb_per_second": throughput(repair),
+            })
+            print(f"  parity x{workers}: {runs[-1]['create_mb_per_second']} MB/s create", file=sys.stderr)
+    finally:
+        shutil.rmtree(parity_dir, ignore_errors=True)
+    return {"size_mb": size_mb, "redundancy_rate": redundancy_rate, "numpy": parity.np is not None, "runs": runs}
+
+
+def run_benchmark(size_name, file_count, workdir, seed, use_index=False, keep=False, realistic_sizes=False, archivers=(), archive_folder=None):
+    corpus_dir = os.path.join(workdir, f"corpus-{size_name}-seed{seed}")
+    src_dir = os.path.join(corpus_dir, "src")
+    dest_dir = os.path.join(corpus_dir, "dest")
+    if os.path.exists(corpus_dir):
+        shutil.rmtree(corpus_dir)
+
+    print(f"Building {size_name} corpus in '{corpus_dir}'...", file=sys.stderr)
+    build_start = time.perf_counter()
+    size_distributions = None if realistic_sizes else COMPACT_SIZE_DISTRIBUTIONS
+    corpus = generate_media_corpus(src_dir, file_count, seed=seed, size_distributions=size_distributions)
+    corpus["build_seconds"] = round(time.perf_counter() - build_start, 6)
+    os.makedirs(dest_dir, exist_ok=True)
+
+    try:
+        # Before the stages, which move the corpus around.
+        archives = benchmark_archivers(archive_folder or src_dir, archivers, corpus_dir) if archivers else None
+        stages = benchmark_stages(src_dir, dest_dir, use_index)
+    finally:
+        if not keep:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    run = {
+        "size": size_name,
+        "corpus": corpus,
+        "stages": stages,
+        "total_wall_seconds": round(sum(stage["wall_seconds"] for stage in stages), 6),
+    }
+    if archives is not None:
+        run["archives"] = archives
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the organizer stages on seeded synthetic media trees.")
+    parser.add_argument("--sizes", default="10k", help=f"Comma separated corpus sizes from {', '.join(SIZES)} (default: 10k).")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0).")
+    parser.add_argument("--workdir", default=None, help="Where corpora are built (default: a temporary directory).")
+    parser.add_argument("--output", default="-", help="JSON results file, or - for stdout (default).")
+    parser.add_argument("--index", action="store_true", help="Run the stages on a shared ScanIndex, as main.py does.")
+    parser.add_argument("--realistic-sizes", action="store_true", help="Generate camera-like file sizes instead of small files.")
+    parser.add_argument("--keep", action="store_true", help="Keep the corpora after the run.")
+    parser.add_argument("--archivers", default="", help=f"Also time archiving with these, comma separated from 7z, {', '.join(STREAM_SUFFIXES)}.")
+    parser.add_argument("--parity-mb", type=int, default=0, help="Also time the native parity engine on this many MB of random data.")
+    parser.add_argument("--archive-folder", default=None, help="Folder the archivers run on (default: the corpus, whose files are mostly zeros).")
+    args = parser.parse_args()
+
+    size_names = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in size_names if size not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(unknown)}")
+    archivers = [archiver.strip() for archiver in args.archivers.split(",") if archiver.strip()]
+    unknown = [archiver for archiver in archivers if archiver != "7z" and archiver not in STREAM_SUFFIXES]
+    if unknown:
+        parser.error(f"Unknown archivers: {', '.join(unknown)}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="organizer-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    report = {
+        "revision": _git_revision(),
+        "started": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "index": args.index,
+        "realistic_sizes": args.realistic_sizes,
+        "runs": [
+            run_benchmark(size, SIZES[size], workdir, args.seed, args.index, args.keep, args.realistic_sizes, archivers, args.archive_folder)
+            for size in size_names
+        ],
+    }
+    if args.parity_mb:
+        print(f"Timing the parity engine on {args.parity_mb} MB...", file=sys.stderr)
+        report["parity"] = benchmark_parity(workdir, args.parity_mb)
+    if not args.workdir and not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Results written to '{args.output}'", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,113 @@
 import os
+import fnmatch
+
+from metrics import count, timed, ERRORS
+import events
+
+def _is_excluded(path, start_path, exclude):
+    """True if the folder or any folder between it and start_path matches an exclusion pattern."""
+    relative = os.path.relpath(path, start_path)
+    if relative == os.curdir:
+        return False
+    return any(fnmatch.fnmatch(part, pattern) for part in relative.split(os.sep) for pattern in exclude)
+
+@timed("delete_empty_folders")
+def delete_empty_folders(start_path, index=None, walk=None, exclude=None, dry_run=False, keep_start=False):
+    """
+    Deletes empty folders under start_path (and start_path itself if it ends up empty) in one walk.
+
+    The walk is bottom-up, and each folder's remaining entries are counted without the
+    subfolders already deleted below it, so a chain of folders that only contain empty
+    folders is removed in the same pass.
+
+    Parameters:
+      start_path (str): The folder to clean.
+      index (ScanIndex, optional): Shared scan index. When given, the tree is read from it
+                                   and deletions keep it up to date.
+      walk (callable, optional): Replacement for os.walk when no index is given.
+      exclude (list, optional): Folder name patterns (fnmatch, e.g. ['.git', '@eaDir']) that are
+                                never deleted, together with everything below them.
+      dry_run (bool): Only count the folders that would be deleted.
+      keep_start (bool): Never delete start_path itself, e.g. a watched drop folder.
+
+    Returns:
+      int: The number of folders deleted (or that would be deleted in a dry run).
+    """
+    walk = index.walk if index is not None else (walk or os.walk)
+    rmdir = index.rmdir if index is not None else os.rmdir
+    removed = set()
+    start = os.path.abspath(start_path)
 
-def delete_empty_folders(start_path):
-    deletion_occurred = False
     # Walk the directory tree from the bottom up
-    for root, dirs, files in os.walk(start_path, topdown=False):
-        # If both subdirectories and files are empty, then the folder is empty
-        if not dirs and not files:
-            try:
-                os.rmdir(root)
-                print(f"Deleted empty folder: {root}")
-                deletion_occurred = True
-            except Exception as e:
-                print(f"Error deleting folder {root}: {e}")
-    return deletion_occurred
+    for root, dirs, files in walk(start_path, topdown=False):
+        remaining = len(files) + sum(1 for name in dirs if os.path.join(root, name) not in removed)
+        if remaining or (keep_start and os.path.abspath(root) == start):
+            continue
+        if exclude and _is_excluded(root, start_path, exclude):
+            continue
+
+        if dry_run:
+            events.deleted(root, dry_run=True)
+            removed.add(root)
+            continue
+        try:
+            rmdir(root)
+            events.deleted(root)
+            removed.add(root)
+        except Exception as e:
+            count(ERRORS)
+            events.error(f"Error deleting folder {root}: {e}", path=root)
+    return len(removed)
+
+@timed("delete_emptied_folders")
+def delete_emptied_folders(folders, stop_path, index=None, exclude=None):
+    """
+    Deletes the given folders if they are empty, then their parents as they become empty,
+    up to but not including stop_path.
+
+    Only these folders and their parents are listed, so a caller that knows where files
+    were moved out of (e.g. one watch batch) does not walk the whole tree. Folders
+    outside stop_path are ignored.
+
+    Parameters:
+      folders (iterable): Folders files were moved out of.
+      stop_path (str): The folder to stop at; it is never deleted.
+      index (ScanIndex, optional): Shared scan index; deletions keep it up to date.
+      exclude (list, optional): Folder name patterns that are never deleted, see delete_empty_folders.
+
+    Returns:
+      int: The number of folders deleted.
+    """
+    rmdir = index.rmdir if index is not None else os.rmdir
+    stop = os.path.abspath(stop_path)
+    prefix = stop.rstrip(os.sep) + os.sep
+
+    candidates = set()
+    for folder in folders:
+        path = os.path.abspath(folder)
+        while path.startswith(prefix) and path not in candidates:
+            candidates.add(path)
+            path = os.path.dirname(path)
+
+    removed = 0
+    # Deepest first, so each parent is checked after every candidate below it.
+    for path in sorted(candidates, key=lambda p: p.count(os.sep), reverse=True):
+        if exclude and _is_excluded(path, stop, exclude):
+            continue
+        try:
+            with os.scandir(path) as it:
+                if next(it, None) is not None:
+                    continue
+        except OSError: # already gone or unreadable
+            continue
+        try:
+            rmdir(path)
+            events.deleted(path)
+            removed += 1
+        except Exception as e:
+            count(ERRORS)
+            events.error(f"Error deleting folder {path}: {e}", path=path)
+    return removed
 
 def main():
     starting_directory = input("Please enter the directory to start from: ").strip()
@@ -21,9 +116,8 @@ def main():
         print(f"Error: '{starting_directory}' is not a valid directory.")
         return
 
-    # Continue deleting until no further empty folders are found
-    while delete_empty_folders(starting_directory):
-        pass
+    # Nested empty folders are removed in the same pass.
+    delete_empty_folders(starting_directory)
 
 if __name__ == '__main__':
     main()
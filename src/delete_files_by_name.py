@@ -2,6 +2,7 @@ import os
 from typing import Optional
 
 from find_files_by_name import find_files_by_name as find_files
+import events
 
 def delete_files_by_name(
         directory: str,
@@ -25,11 +26,11 @@ def delete_files_by_name(
     for file in files:
         try:
             os.remove(file)
-            print(f"File removed: {file}")
+            events.deleted(file)
         except FileNotFoundError:
-            print(f"Warning: File '{file}' not found.")
+            events.warning(f"Warning: File '{file}' not found.", path=file)
         except Exception as e:
-            print(f"An error occurred while moving folder: {e}")
+            events.error(f"An error occurred while removing '{file}': {e}", path=file)
     
 
 def main():
@@ -53,7 +54,7 @@ def main():
         must_pass_all,
         search_subdir
     )
-    print("Done!")
+    events.info("Done!")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from typing import Optional, TextIO
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+LEVEL_ENV = "FILE_ORGANIZER_LOG_LEVEL"       # debug, info, warning or error
+EVENT_LOG_ENV = "FILE_ORGANIZER_EVENT_LOG"   # path of a JSON lines event log
+
+# Messages of the structured event kinds, formatted by the writer thread.
+TEMPLATES = {
+    "moved": "Moved '{source}' to '{destination}'",
+    "skipped": "Skipping '{path}': {reason}",
+    "deleted": "Deleted '{path}'",
+    "would_delete": "Would delete '{path}'",
+}
+
+
+class _Flush:
+    """Queued behind the events to flush; set once the writer has written them."""
+    __slots__ = ('done',)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class EventReporter:
+    """
+    Collects move, skip and error events from any thread and writes them in batches.
+
+    Emitting an event only appends a tuple to a queue: no formatting, no write and
+    no flush happen on the caller's thread. A background thread wakes every
+    flush_interval seconds, formats the new events at or above the level into one
+    write to the stream, appends every event to the optional JSON lines event log,
+    and redraws a single progress line (files and bytes moved per second, and an
+    ETA once a total is set) at most every progress_interval seconds.
+
+    The queue is bounded by max_queued: an emitter that finds it that full waits
+    until the writer has caught up, so a burst of events from fast stages cannot
+    grow it without limit while the stream is slow.
+
+    Args:
+        stream (file, optional): Where messages go; sys.stdout at the time of writing by default.
+        level (int): Messages below this level are not written to the stream.
+        event_log (str, optional): Path of a JSON lines file receiving every event.
+        progress (bool, optional): Draw the progress line; by default only when the stream is a terminal.
+        flush_interval (float): Seconds between batched writes.
+        progress_interval (float): Minimum seconds between progress line redraws.
+        max_queued (int): Queued events at which emitters wait for the writer.
+    """
+
+    def __init__(
+            self,
+            stream: Optional[TextIO] = None,
+            level: int = INFO,
+            event_log: Optional[str] = None,
+            progress: Optional[bool] = None,
+            flush_interval: float = 0.25,
+            progress_interval: float = 0.5,
+            max_queued: int = 10000
+    ):
+        self.stream = stream
+        self.level = level
+        self.progress = progress
+        self.flush_interval = flush_interval
+        self.progress_interval = progress_interval
+        self.max_queued = max_queued
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._lock = threading.Lock() # guards starting and stopping the writer
+        self._thread = None
+        self._log = None
+        self._log_path = None
+        self._reset_progress()
+        self.set_event_log(event_log)
+
+    def _reset_progress(self):
+        self.total_files = None
+        self.total_bytes = None
+        self.files_done = 0
+        self.bytes_done = 0
+        self._progress_started = None # time of the first move
+        self._progress_drawn = 0.0
+        self._progress_files = 0
+        self._progress_visible = False
+
+    def set_event_log(self, path: Optional[str]):
+        """Starts appending events to a JSON lines file (None stops)."""
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._log_path = path
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._log = open(path, "a", encoding="utf-8")
+
+    def set_total(self, files: Optional[int] = None, bytes: Optional[int] = None):
+        """Sets the expected number of files (and bytes) to move, for the ETA."""
+        self.total_files = files
+        self.total_bytes = bytes
+
+    # Emitting (any thread)
+
+    def emit(self, level: int, kind: str, message: Optional[str] = None, **fields):
+        """Queues an event. message may be left out for the kinds in TEMPLATES."""
+        self._queue.append((time.time(), level, kind, message, fields))
+        if self._thread is None:
+            self._start()
+        elif len(self._queue) >= self.max_queued:
+            self.flush() # wakes the writer now and waits for it instead of queueing further
+
+    def debug(self, message: str, **fields):
+        self.emit(DEBUG, "debug", message, **fields)
+
+    def info(self, message: str, **fields):
+        self.emit(INFO, "info", message, **fields)
+
+    def warning(self, message: str, **fields):
+        self.emit(WARNING, "warning", message, **fields)
+
+    def error(self, message: str, **fields):
+        self.emit(ERROR, "error", message, **fields)
+
+    def moved(self, source: str, destination: str, size: Optional[int] = None):
+        self.emit(INFO, "moved", source=source, destination=destination, size=size)
+
+    def skipped(self, path: str, reason: str):
+        self.emit(INFO, "skipped", path=path, reason=reason)
+
+    def deleted(self, path: str, dry_run: bool = False):
+        self.emit(INFO, "would_delete" if dry_run else "deleted", path=path)
+
+    # Writing (writer thread)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._write_pending():
+                return
+
+    def _write_pending(self) -> bool:
+        """Writes every queued event. Returns False once the reporter is closed."""
+        lines = []
+        log_lines = []
+        flushes = []
+        running = True
+        for _ in range(len(self._queue)): # only what was queued so far, so busy emitters cannot stall the writer
+            item = self._queue.popleft()
+            if isinstance(item, _Flush):
+                flushes.append(item)
+                continue
+            if item is None: # close()
+                running = False
+                continue
+
+            timestamp, level, kind, message, fields = item
+            if message is None:
+                message = TEMPLATES[kind].format(**fields)
+            if kind == "moved":
+                if self._progress_started is None:
+                    self._progress_started = timestamp
+                self.files_done += 1
+                self.bytes_done += fields.get("size") or 0
+            if level >= self.level:
+                lines.append(message)
+            if self._log is not None:
+                log_lines.append(json.dumps({
+                    "time": timestamp, "level": LEVEL_NAMES.get(level, level), "kind": kind,
+                    "message": message, **fields,
+                }))
+
+        stream = self.stream or sys.stdout
+        show_progress = self.progress if self.progress is not None else stream.isatty()
+        text = ""
+        if lines:
+            if self._progress_visible:
+                text += "\r\033[K" # the progress line is redrawn below the new messages
+                self._progress_visible = False
+            text += "\n".join(lines) + "\n"
+        now = time.monotonic()
+        progressed = self.files_done != self._progress_files
+        if show_progress and self.files_done and (lines or not running or (progressed and now - self._progress_drawn >= self.progress_interval)):
+            text += "\r\033[K" + self.progress_line()
+            self._progress_drawn = now
+            self._progress_files = self.files_done
+            self._progress_visible = True
+        if not running and self._progress_visible:
+            text += "\n"
+            self._progress_visible = False
+
+        try:
+            if text:
+                stream.write(text)
+                stream.flush()
+            if log_lines:
+                self._log.write("\n".join(log_lines) + "\n")
+                self._log.flush()
+        except (OSError, ValueError): # closed stream or full disk: events are dropped, not the run
+            pass
+        for flush in flushes:
+            flush.done.set()
+        return running
+
+    def progress_line(self) -> str:
+        elapsed = max(time.time() - (self._progress_started or time.time()), 1e-3)
+        files_rate = self.files_done / elapsed
+        line = f"{self.files_done}"
+        if self.total_files:
+            line += f"/{self.total_files}"
+        line += f" files, {files_rate:.0f} files/s, {_format_bytes(self.bytes_done / elapsed)}/s"
+        if self.total_files and files_rate > 0:
+            remaining = max(self.total_files - self.files_done, 0)
+            line += f", ETA {_format_duration(remaining / files_rate)}"
+        return line
+
+    # Control
+
+    def flush(self, timeout: Optional[float] = None):
+        """Blocks until every event emitted so far has been written."""
+        if self._thread is None:
+            return
+        marker = _Flush()
+        self._queue.append(marker)
+        self._wake.set()
+        marker.done.wait(timeout)
+
+    def close(self):
+        """Writes the remaining events, ends the progress line and stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.append(None)
+            self._wake.set()
+            thread.join()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def configure(self, level: Optional[int] = None, event_log: Optional[str] = None, progress: Optional[bool] = None):
+        """Changes settings after writing what was emitted under the old ones."""
+        self.flush()
+        if level is not None:
+            self.level = level
+        if progress is not None:
+            self.progress = progress
+        if event_log is not None and event_log != self._log_path:
+            self.set_event_log(event_log)
+
+    def configure_from_environment(self):
+        """Applies FILE_ORGANIZER_LOG_LEVEL and FILE_ORGANIZER_EVENT_LOG, if set."""
+        levels = {name: level for level, name in LEVEL_NAMES.items()}
+        level_name = os.environ.get(LEVEL_ENV, "").strip().lower()
+        if level_name and level_name not in levels:
+            self.warning(f"Ignoring unknown {LEVEL_ENV} '{level_name}'.")
+        self.configure(level=levels.get(level_name), event_log=os.environ.get(EVENT_LOG_ENV) or None)
+
+
+# The reporter every module emits to.
+REPORTER = EventReporter()
+atexit.register(REPORTER.close)
+
+debug = REPORTER.debug
+info = REPORTER.info
+warning = REPORTER.warning
+error = REPORTER.error
+moved = REPORTER.moved
+skipped = REPORTER.skipped
+deleted = REPORTER.deleted
+flush = REPORTER.flush
@@ -0,0 +1,194 @@
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Optional
+
+from metrics import open_counted, BYTES_READ_METADATA
+
+TAG_EXIF_IFD_POINTER = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+TAG_OFFSET_TIME_ORIGINAL = 0x9011
+TAG_SUBSEC_TIME_ORIGINAL = 0x9291
+
+DATE_TAGS = {
+    TAG_DATE_TIME_ORIGINAL: "DateTimeOriginal",
+    TAG_OFFSET_TIME_ORIGINAL: "OffsetTimeOriginal",
+    TAG_SUBSEC_TIME_ORIGINAL: "SubSecTimeOriginal",
+}
+
+TYPE_ASCII = 2
+TYPE_LONG = 4
+MAX_IFD_ENTRIES = 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class ExifFormatError(ValueError):
+    """Raised when a file is not a supported format or its headers are malformed."""
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ExifFormatError("Unexpected end of file while reading headers.")
+    return data
+
+
+def _read_ifd(f: BinaryIO, base: int, offset: int, endian: str):
+    """Reads the entries of one TIFF image file directory as (tag, type, count, raw value) tuples."""
+    f.seek(base + offset)
+    (count,) = struct.unpack(endian + "H", _read_exact(f, 2))
+    if count > MAX_IFD_ENTRIES:
+        raise ExifFormatError(f"Implausible IFD entry count: {count}")
+
+    data = _read_exact(f, count * 12)
+    return [struct.unpack(endian + "HHI4s", data[i:i + 12]) for i in range(0, len(data), 12)]
+
+
+def _read_ascii(f: BinaryIO, base: int, endian: str, count: int, raw: bytes) -> str:
+    if count <= 4:
+        value = raw[:count]
+    else:
+        (offset,) = struct.unpack(endian + "I", raw)
+        f.seek(base + offset)
+        value = _read_exact(f, count)
+    return value.split(b"\x00", 1)[0].decode("ascii", errors="ignore").strip()
+
+
+def read_tiff_dates(f: BinaryIO, base: int) -> Dict[str, str]:
+    """
+    Reads the capture date tags from a TIFF structure starting at offset base of an
+    open file. This is the layout of TIFF/CR2 files and of every Exif payload.
+
+    Raises:
+        ExifFormatError: If the TIFF header or its directories are malformed.
+    """
+    f.seek(base)
+    header = _read_exact(f, 8)
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        raise ExifFormatError("Invalid TIFF byte order mark.")
+
+    magic, ifd0_offset = struct.unpack(endian + "HI", header[2:])
+    if magic != 42:
+        raise ExifFormatError(f"Unsupported TIFF magic number: {magic}")
+
+    exif_ifd_offset = None
+    for tag, tag_type, count, raw in _read_ifd(f, base, ifd0_offset, endian):
+        if tag == TAG_EXIF_IFD_POINTER and tag_type == TYPE_LONG:
+            (exif_ifd_offset,) = struct.unpack(endian + "I", raw)
+            break
+
+    dates = {}
+    if exif_ifd_offset is None:
+        return dates
+
+    for tag, tag_type, count, raw in _read_ifd(f, base, exif_ifd_offset, endian):
+        if tag in DATE_TAGS and tag_type == TYPE_ASCII:
+            dates[DATE_TAGS[tag]] = _read_ascii(f, base, endian, count, raw)
+    return dates
+
+
+def _read_jpeg_dates(f: BinaryIO) -> Dict[str, str]:
+    """Walks JPEG marker segments up to the APP1 Exif segment, skipping everything else."""
+    f.seek(2)
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return {}
+
+        code = marker[1]
+        if code in (0xDA, 0xD9): # start of scan / end of image: no more metadata
+            return {}
+
+        (length,) = struct.unpack(">H", marker[2:])
+        if code == 0xE1:
+            if f.read(6) == b"Exif\x00\x00":
+                return read_tiff_dates(f, f.tell())
+            f.seek(length - 8, 1)
+        else:
+            f.seek(length - 2, 1)
+
+
+def _read_png_dates(f: BinaryIO) -> Dict[str, str]:
+    """Walks PNG chunk headers to the eXIf chunk, seeking over image data."""
+    f.seek(len(PNG_SIGNATURE))
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return {}
+
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"eXIf":
+            return read_tiff_dates(f, f.tell())
+        if chunk_type == b"IEND":
+            return {}
+        f.seek(length + 4, 1) # chunk data and CRC
+
+
+def read_exif_dates(file_path: str) -> Dict[str, str]:
+    """
+    Reads the capture date tags of an image by seeking straight to its Exif data.
+
+    Supports JPEG (APP1 segment), TIFF-based raw files such as CR2 (IFD0 -> Exif IFD)
+    and PNG (eXIf chunk). Only the headers are read, never the image data.
+
+    Args:
+        file_path (str): The path to the image.
+
+    Returns:
+        dict: The raw values of any of 'DateTimeOriginal', 'OffsetTimeOriginal'
+              and 'SubSecTimeOriginal' that are present.
+
+    Raises:
+        ExifFormatError: If the file is not a supported format or its headers are malformed.
+    """
+    with open_counted(file_path, BYTES_READ_METADATA) as f:
+        magic = f.read(8)
+        if magic[:2] == b"\xff\xd8":
+            return _read_jpeg_dates(f)
+        if magic[:4] in (b"II*\x00", b"MM\x00*"):
+            return read_tiff_dates(f, 0)
+        if magic == PNG_SIGNATURE:
+            return _read_png_dates(f)
+    raise ExifFormatError(f"Unsupported image format: {file_path}")
+
+
+def get_date_time_original(file_path: str) -> Optional[datetime]:
+    """
+    Returns the 'DateTimeOriginal' of an image, or None if the image has none.
+
+    Sub-second precision and the UTC offset are applied when the image has them,
+    in which case the returned datetime is timezone-aware.
+
+    Raises:
+        ExifFormatError: If the file is not a supported format or its headers are malformed.
+        ValueError: If the stored date is not a valid 'YYYY:MM:DD HH:MM:SS' value.
+    """
+    return parse_date_time_original(read_exif_dates(file_path))
+
+
+def parse_date_time_original(dates: Dict[str, str]) -> Optional[datetime]:
+    """
+    Builds a datetime from the raw tag values returned by read_exif_dates / read_tiff_dates.
+    See get_date_time_original.
+    """
+    value = dates.get("DateTimeOriginal")
+    if not value:
+        return None
+
+    date_taken = datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
+
+    subsec = dates.get("SubSecTimeOriginal", "")
+    if subsec.isdigit():
+        date_taken = date_taken.replace(microsecond=int(subsec[:6].ljust(6, "0")))
+
+    offset = dates.get("OffsetTimeOriginal", "")
+    if len(offset) == 6 and offset[0] in "+-" and offset[3] == ":" and (offset[1:3] + offset[4:6]).isdigit():
+        minutes = int(offset[1:3]) * 60 + int(offset[4:6])
+        sign = -1 if offset[0] == "-" else 1
+        date_taken = date_taken.replace(tzinfo=timezone(sign * timedelta(minutes=minutes)))
+
+    return date_taken
@@ -1,7 +1,9 @@
 import os
 import shutil
 
-def extract_and_move_files(src_folder, dest_folder, allowed_file_types=None):
+import events
+
+def extract_and_move_files(src_folder, dest_folder, allowed_file_types=None, walk=None):
     """
     Extracts all files (or files of specified types) from folders and subfolders
     and moves them to the destination folder.
@@ -11,16 +13,17 @@ def extract_and_move_files(src_folder, dest_folder, allowed_file_types=None):
         dest_folder (str): The destination folder where files will be moved.
         allowed_file_types (list, optional): A list of allowed file extensions (e.g., ['.txt', '.jpg']).
                                             If None, all files are moved.
+        walk (callable, optional): Replacement for os.walk, e.g. parallel_walk for network mounts.
     """
 
     if not os.path.exists(src_folder):
-        print(f"Error: Source folder '{src_folder}' does not exist.")
+        events.error(f"Error: Source folder '{src_folder}' does not exist.")
         return
 
     if not os.path.exists(dest_folder):
         os.makedirs(dest_folder)
 
-    for root, _, files in os.walk(src_folder):
+    for root, _, files in (walk or os.walk)(src_folder):
         for file in files:
             file_path = os.path.join(root, file)
             _, file_extension = os.path.splitext(file)
@@ -29,9 +32,9 @@ def extract_and_move_files(src_folder, dest_folder, allowed_file_types=None):
                 dest_file_path = os.path.join(dest_folder, file)
                 try:
                     shutil.move(file_path, dest_file_path)
-                    print(f"Moved: {file_path} to {dest_file_path}")
+                    events.moved(file_path, dest_file_path)
                 except Exception as e:
-                    print(f"Error moving {file_path}: {e}")
+                    events.error(f"Error moving {file_path}: {e}", path=file_path)
 
 
 def main():
@@ -1,9 +1,100 @@
 import os
-from typing import Optional
+import stat
+from typing import Callable, Hashable, Iterator, Mapping, Optional, Tuple
 
-from string_content_check import string_content_check as check_file_name
+from string_content_check import NameMatcher
+from metrics import count, timed, DIRECTORIES_LISTED, STAT_CALLS
 
 
+def iter_files_by_name(
+        directory: str,
+        queries: Mapping[Hashable, NameMatcher],
+        search_subdir: bool = False,
+        walk: Optional[Callable] = None
+) -> Iterator[Tuple[Hashable, str, os.stat_result]]:
+    """
+    Walks a directory once and yields the files matching any of several named queries.
+
+    Built on os.scandir: file and directory types come from the directory listing, so
+    only matching files are stat'ed. Results are yielded as each directory is read,
+    so callers can start working before the walk finishes. Each directory is listed
+    completely before its matches are yielded, so callers may create or move entries
+    next to a yielded file. Like os.walk, symlinked directories are not followed and
+    unreadable directories are skipped.
+
+    Args:
+        directory (str): The directory to search.
+        queries (dict): Query name -> NameMatcher. A file matching several queries is
+                        yielded once per query.
+        search_subdir (bool): Whether to search subdirectories.
+        walk (callable, optional): os.walk-compatible walker used for subdirectory searches
+                                   instead of the scandir walk, e.g. parallel_walk for
+                                   network mounts. Matching names are then stat'ed to
+                                   skip anything that is not a file.
+
+    Yields:
+        tuple: (query name, full file path, os.stat_result of the file).
+
+    Raises:
+        NotADirectoryError: If directory is not a directory.
+    """
+    if not os.path.isdir(directory):
+        raise NotADirectoryError(f"Path is not a directory: {directory}")
+
+    queries = list(queries.items())
+    if search_subdir and walk is not None:
+        yield from _iter_walk_matches(directory, queries, walk)
+        return
+
+    pending = [directory]
+    while pending:
+        dir_path = pending.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        count(DIRECTORIES_LISTED)
+
+        subdirs = []
+        stat_calls = 0
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    for query, matcher in queries:
+                        if matcher.matches(entry.name):
+                            stat_calls += 1
+                            yield query, entry.path, entry.stat()
+                elif search_subdir and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+            except OSError: # removed or unreadable since the listing
+                continue
+        count(STAT_CALLS, stat_calls)
+
+        # Reversed so the stack visits subdirectories in listing order.
+        pending.extend(reversed(subdirs))
+
+
+def _iter_walk_matches(directory, queries, walk):
+    for root, _, filenames in walk(directory):
+        count(DIRECTORIES_LISTED)
+        for filename in filenames:
+            matched = [query for query, matcher in queries if matcher.matches(filename)]
+            if not matched:
+                continue
+            path = os.path.join(root, filename)
+            count(STAT_CALLS)
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(stat_result.st_mode):
+                continue
+            for query in matched:
+                yield query, path, stat_result
+
+
+@timed("find_files_by_name")
 def find_files_by_name(
         directory: str,
         starts_with: Optional[str] = None,
@@ -11,10 +102,12 @@ def find_files_by_name(
         ends_with: Optional[str] = None,
         match_case: bool = False,
         must_pass_all: bool = False, # AND operation
-        search_subdir: bool = False
+        search_subdir: bool = False,
+        walk: Optional[Callable] = None
 ):
     """
     Finds all files in a directory (and optionally subdirectories) that match the given criteria.
+    See iter_files_by_name to stream the results or run several queries in one walk.
 
     Args:
         directory (str): The directory to search.
@@ -24,28 +117,13 @@ def find_files_by_name(
         match_case (bool): Whether the match is case-sensitive.
         must_pass_all (bool): If True, all criteria must match; otherwise, any match is sufficient.
         search_subdir (bool): Whether to search subdirectories.
+        walk (callable, optional): Replacement walker for subdirectory searches, see iter_files_by_name.
 
     Returns:
         set: A set of full file paths to matching files.
     """
-    if not os.path.isdir(directory):
-        raise NotADirectoryError(f"Path is not a directory: {directory}")
-    
-    files_found = set()
-
-    def add_matching_files(dir_path: str, filenames: list):
-        for filename in filenames:
-            full_path = os.path.join(dir_path, filename)
-            if os.path.isfile(full_path) and check_file_name(filename, starts_with, contains, ends_with, match_case, must_pass_all):
-                files_found.add(full_path)
-
-    if search_subdir:
-        for root, _, filenames in os.walk(directory):
-            add_matching_files(root, filenames)
-    else:
-        add_matching_files(directory, os.listdir(directory))
-
-    return files_found
+    matcher = NameMatcher(starts_with, contains, ends_with, match_case, must_pass_all)
+    return {path for _, path, _ in iter_files_by_name(directory, {None: matcher}, search_subdir, walk)}
 
 
 
@@ -1,6 +1,13 @@
 import os
+import json
+import math
 import random
+import shutil
 import string
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 def format_word():
     """Generate a simple word of random lowercase letters."""
@@ -83,6 +90,316 @@ def create_random_folders(current_dir, current_depth, max_depth, max_folders):
         create_random_folders(new_folder_path, current_depth + 1, max_depth, max_folders)
 
 
+# Media corpus generation (for benchmarks)
+
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+CORPUS_START = datetime(2012, 1, 1)
+CORPUS_DAYS = 13 * 365
+CORPUS_SHARD_FOLDERS = 16 # folders per unit of work; fixed so the tree does not depend on the worker count
+SPARSE_THRESHOLD = 64 * 1024 # payloads larger than this are left as holes instead of written
+
+# (kind, weight): how often each kind of file appears in a generated corpus
+FILE_KINDS = [
+    ("facebook", 12),
+    ("messenger", 10),
+    ("camera_photo", 25),
+    ("camera_video", 6),
+    ("screenshot", 8),
+    ("iphone", 14),    # IMG_1234.JPG with an IMG_1234.AAE sidecar
+    ("canon_video", 3), # MVI_1234.MOV with an MVI_1234.THM sidecar
+    ("mod_video", 2),   # MOV001.MOD with a MOV001.MODD sidecar
+    ("other", 20),
+]
+
+# Size class -> (median bytes, sigma) of a log-normal distribution
+SIZE_DISTRIBUTIONS = {
+    "photo": (2_500_000, 0.6),
+    "screenshot": (400_000, 0.8),
+    "video": (60_000_000, 1.2),
+    "other": (150_000, 1.5),
+}
+
+
+def stub_jpeg(date_taken: datetime) -> bytes:
+    """A minimal JPEG whose APP1 Exif segment holds DateTimeOriginal."""
+    value = date_taken.strftime("%Y:%m:%d %H:%M:%S").encode("ascii") + b"\0"
+    ifd0 = struct.pack("<H", 1) + struct.pack("<HHII", 0x8769, 4, 1, 26) + struct.pack("<I", 0)
+    exif_ifd = struct.pack("<H", 1) + struct.pack("<HHII", 0x9003, 2, len(value), 44) + struct.pack("<I", 0)
+    tiff = b"II*\x00" + struct.pack("<I", 8) + ifd0 + exif_ifd + value
+    app1 = b"Exif\x00\x00" + tiff
+    return b"\xff\xd8\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9"
+
+
+def stub_mp4(created: datetime, mdat_bytes: int = 0) -> bytes:
+    """
+    The boxes of a minimal MP4 whose moov/mvhd box holds the creation time. The
+    final mdat box header declares mdat_bytes of payload, which the caller appends
+    (or leaves as a hole).
+    """
+    seconds = int((created.replace(tzinfo=timezone.utc) - MP4_EPOCH).total_seconds())
+    mvhd_payload = b"\x00\x00\x00\x00" + struct.pack(">II", seconds, seconds) + bytes(88)
+    mvhd = struct.pack(">I4s", 8 + len(mvhd_payload), b"mvhd") + mvhd_payload
+    moov = struct.pack(">I4s", 8 + len(mvhd), b"moov") + mvhd
+    ftyp = struct.pack(">I4s4sI4s", 20, b"ftyp", b"isom", 0x200, b"isom")
+    mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + mdat_bytes) # 64-bit size, videos may exceed 4 GiB
+    return ftyp + moov + mdat
+
+
+def stub_aae(adjusted: datetime) -> bytes:
+    """A minimal iOS edit sidecar with the <date> tag read by move_aae_files."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<plist version="1.0"><dict>'
+        f"<key>adjustmentTimestamp</key><date>{adjusted.strftime('%Y-%m-%dT%H:%M:%SZ')}</date>"
+        "</dict></plist>\n"
+    ).encode("utf-8")
+
+
+def draw_size(size_class, size_distributions=None):
+    """Draws a file size in bytes from the log-normal distribution of a size class."""
+    median, sigma = (size_distributions or SIZE_DISTRIBUTIONS)[size_class]
+    return max(1, int(random.lognormvariate(math.log(median), sigma)))
+
+
+def random_media_files(date: datetime, size_distributions=None):
+    """
+    Picks a kind of file and returns it with any sidecar it comes with, as
+    (name, kind, header, size) tuples. The header is the start of the file;
+    the rest, up to size, is filler. Names follow the patterns the organizer sorts on.
+    """
+    kind = random.choices([kind for kind, _ in FILE_KINDS], weights=[weight for _, weight in FILE_KINDS])[0]
+    stamp = date.strftime("%Y%m%d_%H%M%S")
+
+    def sized(size_class, header):
+        return max(len(header), draw_size(size_class, size_distributions))
+
+    def video(name):
+        size = draw_size("video", size_distributions)
+        header_size = len(stub_mp4(date))
+        return (name, kind, stub_mp4(date, max(0, size - header_size)), max(size, header_size))
+
+    if kind == "facebook":
+        millis = int(date.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        header = stub_jpeg(date)
+        return [(f"FB_IMG_{millis}.jpg", kind, header, sized("photo", header))]
+    if kind == "messenger":
+        header = random.randbytes(64)
+        ext = random.choice([".jpeg", ".png", ".gif"])
+        return [(f"received_{random.randint(10 ** 14, 10 ** 17)}{ext}", kind, header, sized("photo", header))]
+    if kind == "camera_photo":
+        header = stub_jpeg(date)
+        return [(f"{stamp}.jpg", kind, header, sized("photo", header))]
+    if kind == "camera_video":
+        return [video(f"{stamp}{random.choice(['.mp4', '.mov'])}")]
+    if kind == "screenshot":
+        header = random.randbytes(64)
+        prefix = random.choice(["Screenshot_", "screenshot_", "Screenshot "])
+        name = f"{prefix}{date.strftime('%Y%m%d-%H%M%S')}{random.choice(['.png', '.jpg'])}"
+        return [(name, kind, header, sized("screenshot", header))]
+    if kind == "iphone":
+        stem = f"IMG_{random.randint(0, 9999):04d}"
+        header = stub_jpeg(date)
+        sidecar = stub_aae(date)
+        return [(f"{stem}.JPG", kind, header, sized("photo", header)), (f"{stem}.AAE", kind, sidecar, len(sidecar))]
+    if kind == "canon_video":
+        stem = f"MVI_{random.randint(0, 9999):04d}"
+        thumbnail = stub_jpeg(date)
+        return [video(f"{stem}.MOV"), (f"{stem}.THM", kind, thumbnail, len(thumbnail) + 8192)]
+    if kind == "mod_video":
+        stem = f"MOV{random.randint(0, 999):03d}"
+        header = random.randbytes(64)
+        return [(f"{stem}.MOD", kind, header, sized("video", header)), (f"{stem}.MODD", kind, random.randbytes(256), 256)]
+    header = random.randbytes(64)
+    return [(f"{format_word()}{random.choice(['.txt', '.pdf', '.docx'])}", kind, header, sized("other", header))]
+
+
+def write_stub_file(path, header, size, sparse_threshold=SPARSE_THRESHOLD):
+    """
+    Writes header and fills the file up to size: with random bytes, or, when the
+    filler is larger than sparse_threshold, with a hole that takes no disk space.
+
+    Returns:
+        bool: True if the file was made sparse.
+    """
+    filler = size - len(header)
+    with open(path, "xb") as f:
+        f.write(header)
+        if filler > sparse_threshold:
+            f.truncate(size)
+            return True
+        if filler > 0:
+            f.write(random.randbytes(filler))
+    return False
+
+
+def _generate_shard(job):
+    """
+    Fills one shard of folders with originals. Runs in a worker process; the shard
+    has its own seed, so its files do not depend on which process generates it.
+
+    Returns:
+        list: (relative path, kind, size, date, sparse) for every file written.
+    """
+    base_dir, shard_seed, folders, size_distributions, sparse_threshold = job
+    random.seed(shard_seed)
+    records = []
+    for folder, budget in folders:
+        folder_path = os.path.join(base_dir, folder)
+        names = set()
+        while budget > 0:
+            date = CORPUS_START + timedelta(seconds=random.randint(0, CORPUS_DAYS * 86400))
+            entries = random_media_files(date, size_distributions)
+            if len(entries) > budget or any(name.lower() in names for name, _, _, _ in entries):
+                continue
+            for name, kind, header, size in entries:
+                sparse = write_stub_file(os.path.join(folder_path, name), header, size, sparse_threshold)
+                names.add(name.lower())
+                records.append((os.path.join(folder, name), kind, size, date.isoformat(), sparse))
+            budget -= len(entries)
+    return records
+
+
+def _create_folder_tree(base_dir, target_folders, max_depth, min_folders, max_folders):
+    """Creates random folders breadth-first until there are target_folders. Returns their relative paths."""
+    folders = [""]
+    seen_folders = {""}
+    frontier = deque([("", 1)])
+    while frontier and len(folders) < target_folders:
+        parent, depth = frontier.popleft()
+        for _ in range(random.randint(min_folders, max_folders)):
+            folder = os.path.join(parent, generate_random_folder_name())
+            if folder.lower() in seen_folders:
+                continue
+            os.makedirs(os.path.join(base_dir, folder), exist_ok=True)
+            folders.append(folder)
+            seen_folders.add(folder.lower())
+            if depth < max_depth:
+                frontier.append((folder, depth + 1))
+    return folders
+
+
+def _link_duplicate(base_dir, original, folder, hardlink):
+    """Places a copy of original in folder as 'stem (n).ext'. Returns its relative path."""
+    stem, ext = os.path.splitext(os.path.basename(original))
+    while True:
+        duplicate = os.path.join(folder, f"{stem} ({random.randint(1, 99)}){ext}")
+        try:
+            if hardlink:
+                os.link(os.path.join(base_dir, original), os.path.join(base_dir, duplicate))
+            else:
+                with open(os.path.join(base_dir, duplicate), "xb") as f:
+                    with open(os.path.join(base_dir, original), "rb") as src:
+                        shutil.copyfileobj(src, f)
+            return duplicate
+        except FileExistsError:
+            continue
+
+
+def generate_media_corpus(
+        base_dir,
+        file_count,
+        seed=0,
+        max_depth=4,
+        max_folders=6,
+        files_per_folder=40,
+        duplicate_rate=0.05,
+        min_folders=1,
+        size_distributions=None,
+        sparse_threshold=SPARSE_THRESHOLD,
+        hardlink_duplicates=True,
+        workers=None,
+        manifest_path=None
+):
+    """
+    Builds a reproducible tree of media-like files for benchmarks.
+
+    Folders get random names (as create_random_folders makes them) and files get
+    realistic camera/phone names with stub EXIF and mvhd headers, so every grouping
+    stage has work to do. File sizes are drawn per size class; anything past the
+    header that exceeds sparse_threshold is left as a hole, so multi-gigabyte
+    "videos" cost no disk space or write time. Originals are written by worker
+    processes, one shard of folders at a time. Duplicates are then added as hard
+    links to earlier files, under their own names in other folders, forming clusters.
+
+    The tree depends only on the seed and the arguments, not on the number of
+    workers. A manifest lists every file with its kind, size, date and the file
+    it duplicates, as the truth to check the organizer against.
+
+    Args:
+        base_dir (str): The directory to fill; created if missing.
+        file_count (int): Number of files (sidecars included).
+        seed (int): Random seed; the same seed and arguments give the same tree.
+        max_depth (int): Maximum folder depth.
+        max_folders (int): Maximum number of subfolders per folder.
+        files_per_folder (int): Average number of files per folder.
+        duplicate_rate (float): Fraction of files that duplicate another file.
+        min_folders (int): Minimum number of subfolders per folder, until the tree is big enough.
+        size_distributions (dict, optional): Overrides for SIZE_DISTRIBUTIONS.
+        sparse_threshold (int): Filler larger than this many bytes is left as a hole.
+        hardlink_duplicates (bool): Link duplicates to their original instead of copying them.
+        workers (int, optional): Number of worker processes; defaults to the CPU count.
+        manifest_path (str, optional): Where to write the JSON lines manifest; defaults
+                                       to '<base_dir>.manifest.jsonl', next to the tree.
+
+    Returns:
+        dict: Counts of the generated folders, files, duplicates, sparse files and bytes.
+    """
+    sizes = dict(SIZE_DISTRIBUTIONS, **(size_distributions or {}))
+    base_dir = os.path.normpath(base_dir)
+    os.makedirs(base_dir, exist_ok=True)
+
+    random.seed(f"{seed}/folders")
+    folders = _create_folder_tree(base_dir, max(1, file_count // files_per_folder), max_depth, min_folders, max_folders)
+
+    # Spread the originals over the folders, then hand out fixed shards of folders.
+    duplicate_count = int(file_count * duplicate_rate)
+    budgets = [0] * len(folders)
+    for _ in range(file_count - duplicate_count):
+        budgets[random.randrange(len(folders))] += 1
+    jobs = []
+    for shard, first in enumerate(range(0, len(folders), CORPUS_SHARD_FOLDERS)):
+        chunk = [(folder, budgets[first + i]) for i, folder in enumerate(folders[first:first + CORPUS_SHARD_FOLDERS])]
+        jobs.append((base_dir, f"{seed}/shard/{shard}", chunk, sizes, sparse_threshold))
+
+    if workers == 1:
+        shards = map(_generate_shard, jobs)
+        records = [record for shard_records in shards for record in shard_records]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = [record for shard_records in executor.map(_generate_shard, jobs) for record in shard_records]
+
+    # Duplicates come in clusters of one to three copies of the same original.
+    random.seed(f"{seed}/duplicates")
+    duplicates = []
+    while records and len(duplicates) < duplicate_count:
+        original = random.choice(records)
+        for _ in range(min(random.randint(1, 3), duplicate_count - len(duplicates))):
+            duplicate = _link_duplicate(base_dir, original[0], random.choice(folders), hardlink_duplicates)
+            duplicates.append((duplicate,) + original[1:] + (original[0],))
+
+    manifest_path = manifest_path or base_dir + ".manifest.jsonl"
+    summary = {
+        "folders": len(folders),
+        "files": len(records) + len(duplicates),
+        "duplicates": len(duplicates),
+        "sparse_files": sum(1 for record in records if record[4]),
+        "bytes": sum(record[2] for record in records) + sum(record[2] for record in duplicates),
+        "manifest": manifest_path,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        settings = {
+            "seed": seed, "file_count": file_count, "max_depth": max_depth, "min_folders": min_folders,
+            "max_folders": max_folders, "files_per_folder": files_per_folder, "duplicate_rate": duplicate_rate,
+            "size_distributions": sizes, "sparse_threshold": sparse_threshold, "hardlink_duplicates": hardlink_duplicates,
+        }
+        f.write(json.dumps({"corpus": dict(settings, **summary)}) + "\n")
+        for path, kind, size, date, sparse in records:
+            f.write(json.dumps({"path": path, "kind": kind, "size": size, "date": date, "sparse": sparse, "duplicate_of": None}) + "\n")
+        for path, kind, size, date, sparse, original in duplicates:
+            f.write(json.dumps({"path": path, "kind": kind, "size": size, "date": date, "sparse": sparse, "duplicate_of": original}) + "\n")
+
+    return summary
+
+
 def main():
     base_dir = input("Enter the base directory where random folders will be created: ").strip()
     if not os.path.exists(base_dir):
@@ -96,10 +413,18 @@ def main():
     try:
         max_depth = int(input("Enter the maximum subfolder depth: ").strip())
         max_folders = int(input("Enter the maximum number of folders per level: ").strip())
+        file_count = int(input("Enter the number of media files to generate (0 for empty folders only): ").strip() or 0)
+        seed = int(input("Enter the random seed: ").strip() or 0) if file_count else 0
     except ValueError:
         print("Please enter valid integer values for maximum depth and number of folders.")
         return
 
+    if file_count:
+        summary = generate_media_corpus(base_dir, file_count, seed=seed, max_depth=max_depth, max_folders=max_folders)
+        print(f"Created {summary['files']} files ({summary['duplicates']} duplicates) in {summary['folders']} folders. "
+              f"Manifest written to '{summary['manifest']}'")
+        return
+
     create_random_folders(base_dir, current_depth=1, max_depth=max_depth, max_folders=max_folders)
     print("Folder creation complete.")
 
@@ -1,31 +1,101 @@
 import os
-import shutil
+import sys
 import pytz
 import datetime
-from win32com.propsys import propsys, pscon
 
-def get_media_created_date(filepath, target_timezone):
+try:
+    from win32com.propsys import propsys, pscon
+except ImportError:
+    propsys = pscon = None
+
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from isobmff_reader import read_creation_time, IsobmffFormatError
+from exif_reader import get_date_time_original, ExifFormatError
+from move_planner import MovePlan
+from pipeline import Stage, move_stage, run_pipeline
+from metrics import count, timed, ERRORS
+import events
+
+
+def read_media_created_date(filepath):
+    """
+    Reads the media created date of a file without converting its timezone.
+
+    MOV/MP4/HEIC files are parsed directly from their ISO base media boxes and
+    TIFF-based raw files (e.g. CR2) from their Exif headers, on any platform.
+    Other formats fall back to the Windows property store when pywin32 is available.
+    Returns a datetime object (naive if the file only stores local time) or None.
+    """
+    try:
+        return read_creation_time(filepath)
+    except IsobmffFormatError:
+        pass
+
+    try:
+        return get_date_time_original(filepath)
+    except ExifFormatError:
+        pass
+
+    if propsys is None:
+        raise ValueError("Unsupported media format and the Windows property store is not available.")
+
+    properties = propsys.SHGetPropertyStoreFromParsingName(filepath)
+    dt = properties.GetValue(pscon.PKEY_Media_DateEncoded).GetValue()
+    if dt is None:
+        return None
+    # If the property is not already a datetime, convert it from a timestamp.
+    if not isinstance(dt, datetime.datetime):
+        dt = datetime.datetime.fromtimestamp(int(dt))
+        dt = dt.replace(tzinfo=pytz.timezone('UTC'))
+    return dt
+
+
+def to_timezone(dt, target_timezone):
+    """
+    Converts a datetime to the target timezone. Naive datetimes are taken to
+    already be local time there.
+    """
+    target_tz = pytz.timezone(target_timezone)
+    if dt.tzinfo is None:
+        return target_tz.localize(dt)
+    return dt.astimezone(target_tz)
+
+
+def get_media_created_date(filepath, target_timezone, cache=None):
     """
     Extracts the media created date from a file's metadata.
     Returns a datetime object localized to the target timezone (e.g. 'Asia/Tokyo')
     in 'yyyy_MM_dd' format or None if unavailable.
+
+    If a MetadataCache is given, unchanged files are answered from it without
+    being opened; the date is cached as read, before timezone conversion.
     """
     try:
-        properties = propsys.SHGetPropertyStoreFromParsingName(filepath)
-        dt = properties.GetValue(pscon.PKEY_Media_DateEncoded).GetValue()
-        # If the property is not already a datetime, convert it from a timestamp.
-        if not isinstance(dt, datetime.datetime):
-            dt = datetime.datetime.fromtimestamp(int(dt))
-            dt = dt.replace(tzinfo=pytz.timezone('UTC'))
+        if cache is not None:
+            stat_result = os.stat(filepath)
+            hit, value = cache.get(filepath, 'media_created', stat_result)
+            if hit:
+                if value is None:
+                    return None
+                return to_timezone(datetime.datetime.fromisoformat(value), target_timezone)
+
+        dt = read_media_created_date(filepath)
+
+        if cache is not None:
+            cache.put(filepath, 'media_created', dt.isoformat() if dt else None, stat_result)
+        if dt is None:
+            return None
         # Convert the date to the target timezone
-        target_tz = pytz.timezone(target_timezone)
-        dt_converted = dt.astimezone(target_tz)
-        return dt_converted
+        return to_timezone(dt, target_timezone)
     except Exception as e:
-        print(f"Error extracting media created date from '{filepath}': {e}")
+        count(ERRORS)
+        events.error(f"Error extracting media created date from '{filepath}': {e}", path=filepath)
         return None
 
-def sort_by_media_created(src_folder, dest_folder, allowed_file_types=None, timezone='UTC'):
+@timed("group_files_by_media_created")
+def sort_by_media_created(src_folder, dest_folder, allowed_file_types=None, timezone='UTC', index=None, cache=None, plan=None, walk=None, metadata_workers=8, on_conflict='skip'):
     """
     Scans the src_folder (recursively) and moves files into subfolders within dest_folder
     based on the file's media created date. The subfolder names are in the format yyyy_MM_dd.
@@ -35,12 +105,29 @@ def sort_by_media_created(src_folder, dest_folder, allowed_file_types=None, time
       dest_folder (str): The directory where sorted subfolders will be created.
       allowed_file_types (list): List of allowed file extensions (e.g. ['.jpg', '.png']). If None, all files are processed.
       timezone (str): The target timezone (e.g. 'UTC', 'Asia/Tokyo') for the media created date.
+      index (ScanIndex, optional): Shared scan index. When given, the tree is read from it
+                                   instead of os.walk and moves keep it up to date.
+      walk (callable, optional): Replacement for os.walk when no index is given,
+                                 e.g. parallel_walk for network mounts.
+      cache (MetadataCache, optional): Persistent cache for the media created lookups.
+      plan (MovePlan, optional): When given, moves are only added to this plan and nothing
+                                 is moved; otherwise a plan is built for this call and executed.
+      on_conflict (str): Policy for targets that already exist, see MovePlan; used without a plan.
+                         'skip' keeps both files, 'overwrite' replaces the target as shutil.move used to.
+      metadata_workers (int): Number of files whose media created date is read at the same time.
+
+    Runs as a pipeline (scan -> read date -> plan -> move), like organize_images_by_date.
+
+    Returns:
+      list: Per-stage StageStats of the pipeline, or None if src_folder does not exist.
     """
     if not os.path.isdir(src_folder):
-        print(f"Source folder '{src_folder}' does not exist.")
+        events.error(f"Source folder '{src_folder}' does not exist.")
         return
-    if not os.path.exists(dest_folder):
-        os.makedirs(dest_folder)
+
+    own_plan = plan is None
+    if own_plan:
+        plan = MovePlan(on_conflict, index=index)
     
     # Prepare allowed file extensions tuple (lowercase) if provided.
     if allowed_file_types:
@@ -48,27 +135,34 @@ def sort_by_media_created(src_folder, dest_folder, allowed_file_types=None, time
     else:
         allowed_exts = None
 
-    for root, _, files in os.walk(src_folder):
-        for file in files:
-            # Skip files that do not match allowed file types.
-            if allowed_exts and not file.lower().endswith(allowed_exts):
-                continue
-            
-            src_path = os.path.join(root, file)
-            dt = get_media_created_date(src_path, timezone)
-            if dt:
-                folder_name = dt.strftime("%Y_%m_%d")
-                target_folder = os.path.join(dest_folder, folder_name)
-                if not os.path.exists(target_folder):
-                    os.makedirs(target_folder)
-                target_path = os.path.join(target_folder, file)
-                try:
-                    shutil.move(src_path, target_path)
-                    print(f"Moved '{src_path}' to '{target_path}'")
-                except Exception as e:
-                    print(f"Error moving file '{src_path}' to '{target_path}': {e}")
-            else:
-                print(f"Media created date not found for file: '{src_path}'")
+    walk = index.walk if index is not None else (walk or os.walk)
+
+    def scan():
+        for root, _, files in walk(src_folder):
+            for file in files:
+                # Skip files that do not match allowed file types.
+                if not allowed_exts or file.lower().endswith(allowed_exts):
+                    yield os.path.join(root, file)
+
+    def read_date(src_path):
+        return src_path, get_media_created_date(src_path, timezone, cache)
+
+    def plan_move(item):
+        src_path, dt = item
+        if not dt:
+            events.skipped(src_path, "media created date not found")
+            return None
+        folder_name = dt.strftime("%Y_%m_%d")
+        return plan.add(src_path, os.path.join(dest_folder, folder_name, os.path.basename(src_path)), f"media created {folder_name}")
+
+    stages = [
+        Stage("read media created", read_date, concurrency=metadata_workers, in_executor=True),
+        Stage("plan", plan_move),
+    ]
+    if own_plan:
+        stages.append(move_stage(index, on_conflict=plan.on_conflict))
+    # The index is in memory and only safe to read from the event loop thread.
+    return run_pipeline(scan(), stages, threaded_source=index is None)
 
 if __name__ == "__main__":
     src_folder = input("Enter the source folder path: ").strip()
@@ -77,4 +171,5 @@ if __name__ == "__main__":
     allowed_file_types = [ext.strip() for ext in allowed_types_input.split(',')] if allowed_types_input else None
     timezone_input = input("Enter the target timezone (e.g. 'UTC', 'Asia/Tokyo'): ").strip() or 'UTC'
     
-    sort_by_media_created(src_folder, dest_folder, allowed_file_types, timezone_input)
+    for stage_stats in sort_by_media_created(src_folder, dest_folder, allowed_file_types, timezone_input) or []:
+        events.info(str(stage_stats))
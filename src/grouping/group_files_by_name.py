@@ -1,5 +1,13 @@
+import functools
 import os
-import shutil
+import sys
+
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from move_planner import MovePlan, execute_plan
+from string_content_check import NameMatcher
+from metrics import timed
 
 def file_matches(filename, startswith=None, endswith=None, contains=None, match_case=False, allowed_file_types=None):
     """
@@ -16,50 +24,45 @@ def file_matches(filename, startswith=None, endswith=None, contains=None, match_
     Returns:
       bool: True if the filename matches all criteria; False otherwise.
     """
-    test_name = filename if match_case else filename.lower()
-    
-    # Check allowed file types if provided
-    if allowed_file_types:
-        ext = os.path.splitext(filename)[1]
-        allowed_types = allowed_file_types if match_case else [ft.lower() for ft in allowed_file_types]
-        if ext.lower() not in allowed_types:
-            return False
-
-    if startswith:
-        sw = startswith if match_case else startswith.lower()
-        if not test_name.startswith(sw):
-            return False
-
-    if endswith:
-        ew = endswith if match_case else endswith.lower()
-        if not test_name.endswith(ew):
-            return False
+    return _build_matcher(startswith, endswith, contains, match_case, allowed_file_types).matches(filename)
 
-    if contains:
-        sub = contains if match_case else contains.lower()
-        if sub not in test_name:
-            return False
+def _build_matcher(startswith, endswith, contains, match_case, allowed_file_types):
+    extensions = tuple(allowed_file_types) if allowed_file_types else None
+    return _cached_matcher(startswith, endswith, contains, match_case, extensions)
 
-    return True
+@functools.lru_cache(maxsize=64)
+def _cached_matcher(startswith, endswith, contains, match_case, extensions):
+    # file_matches is called once per file; reuse the compiled matcher for the same criteria.
+    return NameMatcher(startswith, contains, endswith, match_case, must_pass_all=True, extensions=extensions)
 
-def sort_files(scan_dir, target_dir, startswith=None, endswith=None, contains=None, match_case=False, allowed_file_types=None):
+@timed("group_files_by_name")
+def sort_files(scan_dir, target_dir, startswith=None, endswith=None, contains=None, match_case=False, allowed_file_types=None, index=None, plan=None, walk=None, on_conflict='skip'):
     """
     Recursively scans the scan_dir and moves files that match the criteria into target_dir.
+
+    If a shared ScanIndex is passed as index, the tree is read from it instead of
+    os.walk and moves are routed through it so it stays up to date. Otherwise
+    walk may replace os.walk, e.g. with parallel_walk for network mounts.
+    If a MovePlan is passed as plan, the moves are only added to it and nothing
+    is moved; otherwise a plan is built for this call and executed.
+    Without a plan, on_conflict decides what happens to targets that already
+    exist (see MovePlan): 'skip' keeps both files, 'overwrite' replaces the
+    target as shutil.move used to.
     """
-    # Ensure the target directory exists
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
+    own_plan = plan is None
+    if own_plan:
+        plan = MovePlan(on_conflict, index=index)
+
+    walk = index.walk if index is not None else (walk or os.walk)
+    matcher = _build_matcher(startswith, endswith, contains, match_case, allowed_file_types)
+    reason = f"name matches (starts with {startswith!r}, ends with {endswith!r}, contains {contains!r})"
+
+    for root, _, files in walk(scan_dir):
+        for file in matcher.filter(files):
+            plan.add(os.path.join(root, file), os.path.join(target_dir, file), reason)
 
-    for root, _, files in os.walk(scan_dir):
-        for file in files:
-            if file_matches(file, startswith, endswith, contains, match_case, allowed_file_types):
-                source_file = os.path.join(root, file)
-                target_file = os.path.join(target_dir, file)
-                try:
-                    shutil.move(source_file, target_file)
-                    print(f"Moved: {source_file} -> {target_file}")
-                except Exception as e:
-                    print(f"Error moving {source_file}: {e}")
+    if own_plan:
+        execute_plan(plan, index)
 
 def main():
     # Ask the user for directories
@@ -1,26 +1,44 @@
 import os
+import sys
 import shutil
 
-def group_folders_by_year(src_folder, dest_folder):
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from metrics import timed
+import events
+
+@timed("group_folders_by_year")
+def group_folders_by_year(src_folder, dest_folder, index=None, names=None):
     """
     Groups folders in the format YYYY_MM_DD by year, creating subfolders in the destination.
 
     Args:
         src_folder (str): The source folder containing the folders to group.
         dest_folder (str): The destination folder where year-based subfolders will be created.
+        index (ScanIndex, optional): Shared scan index. When given, the folder is listed from it
+                                     and moves keep it up to date.
+        names (iterable, optional): Only group these folders of src_folder, e.g. the ones that
+                                    just received files. By default every folder is grouped.
     """
 
     if not os.path.exists(src_folder):
-        print(f"Error: Source folder '{src_folder}' does not exist.")
+        events.error(f"Error: Source folder '{src_folder}' does not exist.")
         return
 
     if not os.path.exists(dest_folder):
         os.makedirs(dest_folder)
 
-    for item in os.listdir(src_folder):
+    listdir = index.listdir if index is not None else os.listdir
+    isdir = index.isdir if index is not None else os.path.isdir
+    exists = index.exists if index is not None else os.path.exists
+    move = index.move if index is not None else shutil.move
+    rmdir = index.rmdir if index is not None else os.rmdir
+
+    for item in listdir(src_folder) if names is None else sorted(names):
         item_path = os.path.join(src_folder, item)
 
-        if os.path.isdir(item_path):
+        if isdir(item_path):
             year = item.split('_')[0]  # Extract the year from the folder name
             year_folder = os.path.join(dest_folder, year)
             
@@ -32,10 +50,21 @@ def group_folders_by_year(src_folder, dest_folder):
                     os.makedirs(year_folder)
 
                 dest_item_path = os.path.join(year_folder, item)
-                shutil.move(item_path, dest_item_path)
+                if not isdir(dest_item_path):
+                    move(item_path, dest_item_path)
+                    continue
+
+                # Grouped on an earlier run: merge instead of nesting the folder inside itself.
+                for child in listdir(item_path):
+                    if exists(os.path.join(dest_item_path, child)):
+                        events.warning(f"Warning: '{os.path.join(dest_item_path, child)}' already exists. Leaving '{child}' in '{item_path}'.")
+                        continue
+                    move(os.path.join(item_path, child), os.path.join(dest_item_path, child))
+                if not listdir(item_path):
+                    rmdir(item_path)
 
             except (IndexError, ValueError) as e:
-                print(f"Warning: Skipping '{item}'. Invalid folder name format or other error: {e}")
+                events.warning(f"Warning: Skipping '{item}'. Invalid folder name format or other error: {e}")
 
 
 def main():
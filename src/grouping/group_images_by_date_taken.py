@@ -1,30 +1,79 @@
 import os
-import shutil
-from PIL import Image
-from PIL.ExifTags import TAGS
+import sys
 from datetime import datetime
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
-def get_date_taken(image_path):
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from exif_reader import get_date_time_original, ExifFormatError, TAG_DATE_TIME_ORIGINAL
+from isobmff_reader import read_creation_time, IsobmffFormatError
+from move_planner import MovePlan
+from pipeline import Stage, move_stage, run_pipeline
+from metrics import count, timed, ERRORS
+import events
+
+# HEIF images keep their Exif in an item of the ISO base media meta box.
+HEIF_FILE_TYPES = ('.heic', '.heif')
+
+
+def get_date_taken_with_pillow(image_path):
+    """
+    Extract 'DateTimeOriginal' by decoding the image headers with Pillow.
+    Used for formats the header-only reader does not handle (e.g. HEIC with a plugin).
+    Returns a datetime object or None if unavailable.
+    """
+    if Image is None:
+        raise ImportError("Pillow is required to read metadata from this file type.")
+
+    with Image.open(image_path) as image:
+        exif_data = image._getexif()
+    if exif_data and TAG_DATE_TIME_ORIGINAL in exif_data:
+        return datetime.strptime(exif_data[TAG_DATE_TIME_ORIGINAL], "%Y:%m:%d %H:%M:%S")
+    return None
+
+
+def get_date_taken(image_path, cache=None):
     """
     Extract the date an image was taken from its metadata.
     Returns a string in 'yyyy_MM_dd' format or None if unavailable.
+
+    JPEG, TIFF/CR2 and PNG files are read header-only, HEIC/HEIF through their
+    Exif item; other formats, or files those readers reject, fall back to Pillow.
+    If a MetadataCache is given, unchanged files are answered from it without
+    being opened, and both found dates and "no date" results are stored.
     """
     try:
-        image = Image.open(image_path)
-        exif_data = image._getexif()
-        if exif_data:
-            for tag, value in exif_data.items():
-                tag_name = TAGS.get(tag, tag)
-                if tag_name == "DateTimeOriginal":
-                    date_taken = datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
-                    return date_taken.strftime("%Y_%m_%d")
+        if cache is not None:
+            stat_result = os.stat(image_path)
+            hit, date_taken = cache.get(image_path, 'date_taken', stat_result)
+            if hit:
+                return date_taken
+
+        try:
+            if image_path.lower().endswith(HEIF_FILE_TYPES):
+                date_time_original = read_creation_time(image_path)
+            else:
+                date_time_original = get_date_time_original(image_path)
+        except (ExifFormatError, IsobmffFormatError):
+            date_time_original = get_date_taken_with_pillow(image_path)
+        date_taken = date_time_original.strftime("%Y_%m_%d") if date_time_original else None
+
+        if cache is not None:
+            cache.put(image_path, 'date_taken', date_taken, stat_result)
+        return date_taken
     except Exception as e:
-        print(f"Error reading metadata from {image_path}: {e}")
+        count(ERRORS)
+        events.error(f"Error reading metadata from {image_path}: {e}", path=image_path)
     return None
 
 
-def organize_images_by_date(src_folder, dest_folder, allowed_file_types):
+@timed("group_images_by_date_taken")
+def organize_images_by_date(src_folder, dest_folder, allowed_file_types, index=None, cache=None, plan=None, walk=None, metadata_workers=8, on_conflict='skip'):
     """
     Organizes images from src_folder into subfolders in dest_folder based on the 'Date Taken' property.
     Only processes files that have extensions in allowed_file_types.
@@ -33,33 +82,58 @@ def organize_images_by_date(src_folder, dest_folder, allowed_file_types):
       src_folder (str): The source directory containing images.
       dest_folder (str): The destination directory where sorted folders will be created.
       allowed_file_types (list): A list of allowed file extensions (e.g. ['.jpg', '.jpeg', '.png']).
+      index (ScanIndex, optional): Shared scan index. When given, the tree is read from it
+                                   instead of os.walk and moves keep it up to date.
+      walk (callable, optional): Replacement for os.walk when no index is given,
+                                 e.g. parallel_walk for network mounts.
+      cache (MetadataCache, optional): Persistent cache for the 'Date Taken' lookups.
+      plan (MovePlan, optional): When given, moves are only added to this plan and nothing
+                                 is moved; otherwise a plan is built for this call and executed.
+      on_conflict (str): Policy for targets that already exist, see MovePlan; used without a plan.
+                         'skip' keeps both files, 'overwrite' replaces the target as shutil.move used to.
+      metadata_workers (int): Number of files whose 'Date Taken' is read at the same time.
+
+    Runs as a pipeline (scan -> read date -> plan -> move), so files are already being
+    moved while later ones are still being read.
+
+    Returns:
+      list: Per-stage StageStats of the pipeline.
     """
-    if not os.path.exists(dest_folder):
-        os.makedirs(dest_folder)
+    own_plan = plan is None
+    if own_plan:
+        plan = MovePlan(on_conflict, index=index)
 
     # Convert allowed file types to a tuple of lowercase extensions for checking
     allowed_exts = tuple(ext.lower() for ext in allowed_file_types)
 
-    for root, _, files in os.walk(src_folder):
-        for file in files:
-            # Process only files with allowed extensions
-            if not file.lower().endswith(allowed_exts):
-                continue
-            
-            file_path = os.path.join(root, file)
-            try:
-                date_taken = get_date_taken(file_path)
-                if date_taken:
-                    target_folder = os.path.join(dest_folder, date_taken)
-                    if not os.path.exists(target_folder):
-                        os.makedirs(target_folder)
-                    
-                    shutil.move(file_path, os.path.join(target_folder, file))
-                    print(f"Moved '{file}' to '{target_folder}'")
-                else:
-                    print(f"No 'Date Taken' found for {file}. Skipping...")
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+    walk = index.walk if index is not None else (walk or os.walk)
+
+    def scan():
+        for root, _, files in walk(src_folder):
+            for file in files:
+                # Process only files with allowed extensions
+                if file.lower().endswith(allowed_exts):
+                    yield os.path.join(root, file)
+
+    def read_date(file_path):
+        return file_path, get_date_taken(file_path, cache)
+
+    def plan_move(item):
+        file_path, date_taken = item
+        file = os.path.basename(file_path)
+        if not date_taken:
+            events.skipped(file, "no 'Date Taken' found")
+            return None
+        return plan.add(file_path, os.path.join(dest_folder, date_taken, file), f"date taken {date_taken}")
+
+    stages = [
+        Stage("read date taken", read_date, concurrency=metadata_workers, in_executor=True),
+        Stage("plan", plan_move),
+    ]
+    if own_plan:
+        stages.append(move_stage(index, on_conflict=plan.on_conflict))
+    # The index is in memory and only safe to read from the event loop thread.
+    return run_pipeline(scan(), stages, threaded_source=index is None)
 
 
 if __name__ == "__main__":
@@ -73,4 +147,5 @@ if __name__ == "__main__":
     if not os.path.isdir(source_folder):
         print(f"Error: '{source_folder}' is not a valid directory.")
     else:
-        organize_images_by_date(source_folder, destination_folder, allowed_file_types)
+        for stage_stats in organize_images_by_date(source_folder, destination_folder, allowed_file_types):
+            events.info(str(stage_stats))
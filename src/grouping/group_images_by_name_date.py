@@ -1,8 +1,16 @@
 import os
 import re
-import shutil
+import sys
 
-def sort_files(scan_dir, dest_dir, allowed_file_types=None):
+__parent_dir__ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(__parent_dir__)
+
+from move_planner import MovePlan, execute_plan
+from metrics import timed
+import events
+
+@timed("group_images_by_name_date")
+def sort_files(scan_dir, dest_dir, allowed_file_types=None, index=None, plan=None, walk=None, on_conflict='skip'):
     """
     Scans a directory for files with date-prefixed names, and moves them 
     into subfolders named with the date.
@@ -13,10 +21,18 @@ def sort_files(scan_dir, dest_dir, allowed_file_types=None):
         allowed_file_types (list, optional): A list of file extensions to process 
                                              (e.g., ['.jpg', '.png']). 
                                              If None, all files are considered.
+        index (ScanIndex, optional): Shared scan index. When given, the tree is read
+                                     from it instead of os.walk and moves keep it up to date.
+        walk (callable, optional): Replacement for os.walk when no index is given,
+                                   e.g. parallel_walk for network mounts.
+        plan (MovePlan, optional): When given, moves are only added to this plan and nothing
+                                   is moved; otherwise a plan is built for this call and executed.
+        on_conflict (str): Policy for targets that already exist, see MovePlan; used without a plan.
+                           'skip' keeps both files, 'overwrite' replaces the target as shutil.move used to.
     """
-    # Ensure the destination directory exists
-    if not os.path.exists(dest_dir):
-        os.makedirs(dest_dir)
+    own_plan = plan is None
+    if own_plan:
+        plan = MovePlan(on_conflict, index=index)
 
     # A list of regex patterns to match different date prefixes.
     # The script will check for:
@@ -29,15 +45,18 @@ def sort_files(scan_dir, dest_dir, allowed_file_types=None):
         re.compile(r'^(\d{4})_(\d{2})_(\d{2})_')
     ]
     
+    walk = index.walk if index is not None else (walk or os.walk)
+
+    # Ensure the allowed types list is clean (lowercase, no whitespace)
+    allowed = {ft.lower().strip() for ft in allowed_file_types} if allowed_file_types else None
+
     # Walk the scan directory recursively
-    print(f"Scanning '{scan_dir}'...")
-    for root, dirs, files in os.walk(scan_dir):
+    events.info(f"Scanning '{scan_dir}'...")
+    for root, dirs, files in walk(scan_dir):
         for file in files:
             # If allowed_file_types is specified, check the file extension
-            if allowed_file_types:
+            if allowed is not None:
                 ext = os.path.splitext(file)[1].lower()
-                # Ensure the allowed types list is clean (lowercase, no whitespace)
-                allowed = [ft.lower().strip() for ft in allowed_file_types]
                 if ext not in allowed:
                     continue
 
@@ -52,25 +71,15 @@ def sort_files(scan_dir, dest_dir, allowed_file_types=None):
                     break  # Exit the loop once a match is found
             
             if date_str:
-                # Create the destination folder for the date if it doesn't exist
-                folder_path = os.path.join(dest_dir, date_str)
-                if not os.path.exists(folder_path):
-                    os.makedirs(folder_path)
-                
                 source_file = os.path.join(root, file)
-                dest_file = os.path.join(folder_path, file)
-                
-                # Avoid moving a file to the same location if script is run on dest_dir
-                if source_file == dest_file:
-                    continue
+                dest_file = os.path.join(dest_dir, date_str, file)
 
-                try:
-                    shutil.move(source_file, dest_file)
-                    print(f"Moved '{source_file}' to '{dest_file}'")
-                except Exception as e:
-                    print(f"Error moving file '{source_file}': {e}")
+                # The plan skips files already in place if script is run on dest_dir
+                plan.add(source_file, dest_file, f"date in name {date_str}")
 
-    print("File sorting complete.")
+    if own_plan:
+        execute_plan(plan, index)
+        events.info("File sorting complete.")
 
 def main():
     """
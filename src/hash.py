@@ -1,26 +1,184 @@
 import os
+import mmap
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
 
-def calculate_md5(file_path: str) -> str:
+from metrics import count, open_counted, BYTES_HASHED, STAT_CALLS, ERRORS
+import events
+
+HASH_BUFFER_SIZE = 1 << 20 # 1 MiB reads
+MMAP_THRESHOLD = 64 << 20 # files at least this large are hashed through mmap
+
+_local = threading.local()
+
+
+def _get_buffer() -> bytearray:
+    """Returns a read buffer reused by every hash computed on the current thread."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = bytearray(HASH_BUFFER_SIZE)
+    return buffer
+
+
+def calculate_digests(file_path: str, algorithms: Sequence[str] = ('md5',)) -> Dict[str, str]:
+    """
+    Calculates one or more checksums of a file in a single read.
+
+    Small files are read with readinto into a reused buffer; large files are
+    mapped with mmap and fed to the hashers without copying. hashlib releases
+    the GIL while hashing, so this can be run from several threads at once.
+
+    Args:
+        file_path (str): The path to the file.
+        algorithms (sequence of str): hashlib algorithm names (e.g. 'md5', 'sha256', 'blake2b').
+
+    Returns:
+        dict: Algorithm name to hexadecimal digest.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    hashers = [hashlib.new(name) for name in algorithms]
+
+    with open(file_path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        count(BYTES_HASHED, size)
+
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, HASH_BUFFER_SIZE):
+                        chunk = view[offset:offset + HASH_BUFFER_SIZE]
+                        for hasher in hashers:
+                            hasher.update(chunk)
+                        chunk.release()
+                finally:
+                    view.release()
+        else:
+            buffer = _get_buffer()
+            view = memoryview(buffer)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                for hasher in hashers:
+                    hasher.update(view[:read])
+
+    return {name: hasher.hexdigest() for name, hasher in zip(algorithms, hashers)}
+
+
+def _hash_file(file_path: str, algorithms: Sequence[str], cache=None) -> Optional[Dict[str, str]]:
+    try:
+        if cache is not None:
+            count(STAT_CALLS)
+            stat_result = os.stat(file_path)
+            digests = {}
+            for name in algorithms:
+                hit, digest = cache.get(file_path, name, stat_result)
+                if not hit:
+                    break
+                digests[name] = digest
+            else:
+                return digests
+
+        digests = calculate_digests(file_path, algorithms)
+
+        if cache is not None:
+            for name, digest in digests.items():
+                cache.put(file_path, name, digest, stat_result)
+        return digests
+
+    except (OSError, ValueError) as e:
+        count(ERRORS)
+        events.error(f"Error hashing {file_path}: {e}", path=file_path)
+        return None
+
+
+def hash_files(
+        file_paths: Iterable[str],
+        algorithms: Sequence[str] = ('md5',),
+        max_workers: Optional[int] = None,
+        cache=None
+) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+    """
+    Hashes a batch of files on a thread pool and yields results as they complete.
+
+    Only a bounded number of files is in flight at once, so file_paths may be a
+    long-running generator.
+
+    Args:
+        file_paths (iterable of str): The files to hash.
+        algorithms (sequence of str): hashlib algorithm names computed in the same read.
+        max_workers (int, optional): Number of hashing threads. Defaults to the CPU count.
+        cache (MetadataCache, optional): Persistent cache; unchanged files are answered without reading them.
+
+    Yields:
+        tuple: (file_path, digests), where digests maps algorithm name to hex digest,
+               or is None if the file could not be read.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_in_flight = max_workers * 4
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        for file_path in file_paths:
+            future = executor.submit(_hash_file, file_path, algorithms, cache)
+            in_flight[future] = file_path
+
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for finished in done:
+                    yield in_flight.pop(finished), finished.result()
+
+        for finished in list(in_flight):
+            yield in_flight.pop(finished), finished.result()
+
+
+def calculate_md5(file_path: str, cache=None) -> str:
     """
     Calculates the MD5 checksum of a file.
 
     Args:
         file_path (str): The path to the file.
+        cache (MetadataCache, optional): Persistent cache; unchanged files are answered without reading them.
 
     Returns:
         str: The hexadecimal representation of the MD5 checksum, or None if an error occurs.
     """
-    try:
-        if not os.path.isfile(file_path):
-            return None #file does not exist.
+    if not os.path.isfile(file_path):
+        return None #file does not exist.
+
+    digests = _hash_file(file_path, ('md5',), cache)
+    return digests['md5'] if digests else None
+
+
+def calculate_partial_md5(file_path: str, sample_size: int = 16384) -> str:
+    """
+    Calculates an MD5 checksum over the first and last sample_size bytes of a file.
+    Files no larger than two samples are hashed in full.
 
+    Args:
+        file_path (str): The path to the file.
+        sample_size (int): The number of bytes to read from each end of the file.
+
+    Returns:
+        str: The hexadecimal representation of the sample checksum, or None if an error occurs.
+    """
+    try:
         hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
+        with open_counted(file_path, BYTES_HASHED) as f:
+            size = os.fstat(f.fileno()).st_size
+            hash_md5.update(f.read(sample_size))
+            if size > 2 * sample_size:
+                f.seek(-sample_size, os.SEEK_END)
+            hash_md5.update(f.read(sample_size))
         return hash_md5.hexdigest()
 
     except OSError as e:
-        print(f"Error calculating MD5: {e}")
-        return None
\ No newline at end of file
+        count(ERRORS)
+        events.error(f"Error calculating partial MD5: {e}", path=file_path)
+        return None
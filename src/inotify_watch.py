@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from typing import Callable, Dict, Iterable, List, Optional
+
+import events
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, name length
+READ_BUFFER_SIZE = 64 * 1024
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        raise OSError("inotify is only available on Linux.")
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class _PendingFile:
+    __slots__ = ('last_event', 'closed', 'size')
+
+    def __init__(self, last_event: float):
+        self.last_event = last_event
+        self.closed = False # the last event was close_write or moved_to
+        self.size = None # size at the last readiness check
+
+
+class InotifyWatcher:
+    """
+    Watches a directory tree with Linux inotify and reports files once they are complete.
+
+    Every directory in the tree gets a watch, including directories created later.
+    A new file is only reported after it has been quiet for settle_seconds (no create,
+    write or close event), and either its writer closed it (close_write, or it was
+    moved in whole) or its size did not change between two checks, for copies that
+    keep the file open. The cost of a check depends on the files waiting, not on the tree size.
+
+    Args:
+        root (str): The directory tree to watch.
+        settle_seconds (float): How long a file must be quiet before it is reported.
+        exclude (iterable of str, optional): Directories inside root that are not watched,
+                                             e.g. a destination folder within the source.
+    """
+
+    def __init__(self, root: str, settle_seconds: float = 2.0, exclude: Optional[Iterable[str]] = None):
+        self._libc = _load_libc()
+        self.root = os.path.normpath(os.path.abspath(root))
+        self.settle_seconds = settle_seconds
+        self.exclude = {os.path.normpath(os.path.abspath(path)) for path in exclude or ()}
+        self.overflowed = False # set when the kernel queue overflowed and events were lost
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, f"inotify_init1 failed: {os.strerror(e)}")
+
+        self._watches: Dict[int, str] = {} # watch descriptor -> directory path
+        self._pending: Dict[str, _PendingFile] = {}
+        self._add_tree(self.root, report_files=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _is_excluded(self, path: str) -> bool:
+        return any(path == excluded or path.startswith(excluded + os.sep) for excluded in self.exclude)
+
+    def _add_watch(self, path: str) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e == errno.ENOSPC:
+                raise OSError(e, "inotify watch limit reached; raise fs.inotify.max_user_watches.")
+            if e in (errno.ENOENT, errno.ENOTDIR, errno.EACCES): # gone or unreadable meanwhile
+                return False
+            raise OSError(e, f"inotify_add_watch failed for '{path}': {os.strerror(e)}")
+        self._watches[wd] = path
+        return True
+
+    def _add_tree(self, top: str, report_files: bool):
+        """
+        Watches top and every directory below it. With report_files, files already
+        inside are queued, since they may have arrived before the watch existed.
+        """
+        now = time.monotonic()
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [name for name in dirnames if not self._is_excluded(os.path.join(dirpath, name))]
+            if not self._add_watch(dirpath):
+                dirnames[:] = []
+                continue
+            if report_files:
+                for filename in filenames:
+                    self._pending.setdefault(os.path.join(dirpath, filename), _PendingFile(now))
+
+    def _drop_pending_below(self, directory: str):
+        prefix = directory + os.sep
+        for path in [path for path in self._pending if path.startswith(prefix)]:
+            del self._pending[path]
+
+    def rescan(self):
+        """
+        Re-watches the whole tree and queues every file in it. Used after the kernel
+        event queue overflowed, when arrivals may have been missed.
+        """
+        self.overflowed = False
+        self._add_tree(self.root, report_files=True)
+
+    def read_events(self, timeout: Optional[float] = None) -> int:
+        """
+        Waits up to timeout seconds for events and applies them to the waiting files.
+
+        Returns:
+            int: The number of events read.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return 0
+
+        try:
+            data = os.read(self._fd, READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return 0
+
+        count = 0
+        now = time.monotonic()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b"\0"))
+            offset += name_length
+            count += 1
+            self._handle_event(wd, mask, name, now)
+        return count
+
+    def _handle_event(self, wd: int, mask: int, name: str, now: float):
+        if mask & IN_Q_OVERFLOW:
+            self.overflowed = True
+            return
+
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        if mask & IN_DELETE_SELF:
+            # The watch itself is removed with IN_IGNORED.
+            self._drop_pending_below(directory)
+            return
+        if not name:
+            return
+
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & IN_MOVED_FROM:
+                # Moved within the tree, it is re-added under its new path by IN_MOVED_TO.
+                self._drop_pending_below(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO) and not self._is_excluded(path):
+                self._add_tree(path, report_files=True)
+            return
+
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._pending.pop(path, None)
+        elif mask & (IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO):
+            pending = self._pending.get(path)
+            if pending is None:
+                pending = self._pending[path] = _PendingFile(now)
+            pending.last_event = now
+            pending.closed = bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO))
+
+    def ready_paths(self) -> List[str]:
+        """
+        Returns the files that have settled and stops tracking them. Files that
+        disappeared meanwhile are dropped.
+        """
+        now = time.monotonic()
+        ready = []
+        for path, pending in list(self._pending.items()):
+            if now - pending.last_event < self.settle_seconds:
+                continue
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                del self._pending[path]
+                continue
+            if not pending.closed and size != pending.size:
+                # Not seen at this size before: check again after another quiet period.
+                pending.size = size
+                pending.last_event = now
+                continue
+            del self._pending[path]
+            ready.append(path)
+        return ready
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+
+def watch(
+        root: str,
+        on_batch: Callable[[List[str]], None],
+        settle_seconds: float = 2.0,
+        exclude: Optional[Iterable[str]] = None,
+        stop: Optional[Callable[[], bool]] = None
+):
+    """
+    Watches root and calls on_batch with each batch of newly completed files, until
+    stop() returns True or the process is interrupted.
+
+    Args:
+        root (str): The directory tree to watch.
+        on_batch (callable): Called with a list of file paths that finished arriving.
+        settle_seconds (float): How long a file must be quiet before it is reported.
+        exclude (iterable of str, optional): Directories inside root that are not watched.
+        stop (callable, optional): Checked after every wait; return True to stop watching.
+    """
+    with InotifyWatcher(root, settle_seconds, exclude) as watcher:
+        while stop is None or not stop():
+            # Wake up in time to re-check files that are still settling.
+            timeout = settle_seconds / 2 if watcher.pending_count else None
+            if stop is not None and timeout is None:
+                timeout = 1.0
+            watcher.read_events(timeout)
+
+            if watcher.overflowed:
+                events.warning(f"inotify queue overflowed; rescanning '{root}'.")
+                watcher.rescan()
+
+            batch = watcher.ready_paths()
+            if batch:
+                on_batch(batch)
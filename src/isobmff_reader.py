@@ -0,0 +1,199 @@
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+from exif_reader import read_tiff_dates, parse_date_time_original
+from metrics import open_counted, BYTES_READ_METADATA
+
+# ISO base media timestamps count seconds from 1904-01-01 UTC.
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+# Box types that may open an ISO base media / QuickTime file.
+LEADING_BOX_TYPES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+
+
+class IsobmffFormatError(ValueError):
+    """Raised when a file is not an ISO base media file or its boxes are malformed."""
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise IsobmffFormatError("Unexpected end of file while reading box headers.")
+    return data
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Yields (box type, payload offset, box end offset) for each box between start and end.
+    Only the box headers are read; payloads such as mdat are skipped by seeking.
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack(">I4s", _read_exact(f, 8))
+        header_size = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", _read_exact(f, 8))
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+
+        if size < header_size or offset + size > end:
+            raise IsobmffFormatError(f"Invalid size for box {box_type!r} at offset {offset}")
+
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_box(f: BinaryIO, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for found_type, payload, box_end in _iter_boxes(f, start, end):
+        if found_type == box_type:
+            return payload, box_end
+    return None
+
+
+def _read_uint(data: bytes, offset: int, size: int) -> int:
+    return int.from_bytes(data[offset:offset + size], "big") if size else 0
+
+
+def _read_mvhd_creation_time(f: BinaryIO, payload: int) -> Optional[datetime]:
+    f.seek(payload)
+    version = _read_exact(f, 4)[0]
+    if version == 1:
+        (creation_time,) = struct.unpack(">Q", _read_exact(f, 8))
+    else:
+        (creation_time,) = struct.unpack(">I", _read_exact(f, 4))
+
+    if creation_time == 0: # unset by many encoders
+        return None
+    return MP4_EPOCH + timedelta(seconds=creation_time)
+
+
+def _read_item_types(data: bytes) -> Dict[int, bytes]:
+    """Parses an iinf box payload into a mapping of item ID to item type."""
+    version = data[0]
+    offset = 4
+    if version == 0:
+        offset += 2
+    else:
+        offset += 4
+
+    item_types = {}
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        if size < 8:
+            break
+        if box_type == b"infe":
+            infe_version = data[offset + 8]
+            body = offset + 12
+            if infe_version >= 2:
+                id_size = 2 if infe_version == 2 else 4
+                item_id = _read_uint(data, body, id_size)
+                item_type = data[body + id_size + 2:body + id_size + 6]
+                item_types[item_id] = item_type
+        offset += size
+    return item_types
+
+
+def _read_item_locations(data: bytes) -> Dict[int, Tuple[int, int]]:
+    """Parses an iloc box payload into a mapping of item ID to (file offset, length) of its first extent."""
+    version = data[0]
+    offset_size = data[4] >> 4
+    length_size = data[4] & 0x0F
+    base_offset_size = data[5] >> 4
+    index_size = data[5] & 0x0F if version in (1, 2) else 0
+    offset = 6
+
+    id_size = 2 if version < 2 else 4
+    item_count = _read_uint(data, offset, id_size)
+    offset += id_size
+
+    locations = {}
+    for _ in range(item_count):
+        item_id = _read_uint(data, offset, id_size)
+        offset += id_size
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = _read_uint(data, offset, 2) & 0x0F
+            offset += 2
+        offset += 2 # data_reference_index
+        base_offset = _read_uint(data, offset, base_offset_size)
+        offset += base_offset_size
+        extent_count = _read_uint(data, offset, 2)
+        offset += 2
+
+        for extent in range(extent_count):
+            offset += index_size
+            extent_offset = _read_uint(data, offset, offset_size)
+            offset += offset_size
+            extent_length = _read_uint(data, offset, length_size)
+            offset += length_size
+            if extent == 0 and construction_method == 0:
+                locations[item_id] = (base_offset + extent_offset, extent_length)
+
+        if offset > len(data):
+            raise IsobmffFormatError("Truncated iloc box.")
+    return locations
+
+
+def _read_heif_exif_date(f: BinaryIO, payload: int, end: int) -> Optional[datetime]:
+    """Finds the Exif item of a HEIF meta box through iinf/iloc and reads its capture date."""
+    children = payload + 4 # meta is a full box
+    iinf = _find_box(f, children, end, b"iinf")
+    iloc = _find_box(f, children, end, b"iloc")
+    if iinf is None or iloc is None:
+        return None
+
+    f.seek(iinf[0])
+    item_types = _read_item_types(_read_exact(f, iinf[1] - iinf[0]))
+    f.seek(iloc[0])
+    locations = _read_item_locations(_read_exact(f, iloc[1] - iloc[0]))
+
+    for item_id, item_type in item_types.items():
+        if item_type == b"Exif" and item_id in locations:
+            item_offset, _ = locations[item_id]
+            f.seek(item_offset)
+            (tiff_header_offset,) = struct.unpack(">I", _read_exact(f, 4))
+            return parse_date_time_original(read_tiff_dates(f, item_offset + 4 + tiff_header_offset))
+    return None
+
+
+def read_creation_time(file_path: str) -> Optional[datetime]:
+    """
+    Reads the creation time of a MOV/MP4/HEIC file by walking its ISO base media boxes.
+
+    Video files are answered from moov/mvhd (stored in UTC). HEIF images are answered
+    from the Exif item referenced by meta/iinf and meta/iloc. Only box headers and
+    these small boxes are read, so the cost does not depend on the size of mdat.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        datetime: The creation time, or None if the file does not record one. mvhd
+                  times are timezone-aware (UTC); Exif times are aware only when the
+                  file stores an offset, otherwise they are naive local wall-clock times.
+
+    Raises:
+        IsobmffFormatError: If the file is not an ISO base media file or is malformed.
+    """
+    with open_counted(file_path, BYTES_READ_METADATA) as f:
+        end = os.fstat(f.fileno()).st_size
+        first = _read_exact(f, 8)
+        if first[4:8] not in LEADING_BOX_TYPES:
+            raise IsobmffFormatError(f"Not an ISO base media file: {file_path}")
+
+        meta = None
+        for box_type, payload, box_end in _iter_boxes(f, 0, end):
+            if box_type == b"moov":
+                mvhd = _find_box(f, payload, box_end, b"mvhd")
+                if mvhd is not None:
+                    return _read_mvhd_creation_time(f, mvhd[0])
+            elif box_type == b"meta":
+                meta = (payload, box_end)
+
+        if meta is not None:
+            return _read_heif_exif_date(f, *meta)
+    return None
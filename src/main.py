@@ -2,6 +2,7 @@ import os
 
 from grouping.group_files_by_name import sort_files as group_by_name
 from delete_empty_folders import delete_empty_folders as delete_empty_folders
+from delete_empty_folders import delete_emptied_folders
 from grouping.group_images_by_name_date import sort_files as group_by_name_date
 from grouping.group_folders_by_year import group_folders_by_year as group_folders
 from grouping.group_images_by_date_taken import (
@@ -10,20 +11,36 @@ from grouping.group_images_by_date_taken import (
 from grouping.group_files_by_media_created import (
     sort_by_media_created as group_by_media_created,
 )
+from metadata_cache import MetadataCache
+from move_planner import MovePlan
 from match_files_by_name_start import sort_by_matching_name as match_by_name
 from move_aae_files import sort_files_by_date as move_aae_files
+from parallel_walk import parallel_walk
+from inotify_watch import watch
+from metrics import METRICS, stage
+import events
+from scan_index import ScanIndex
 
+# What a move does when its target already exists, see MovePlan. Existing files are
+# kept; 'overwrite' brings back the shutil.move behaviour of earlier versions.
+ON_CONFLICT = 'skip'
 
-def main():
-    src_dir = input("Enter the directory to scan for image files: ").strip()
-    dest_dir = input("Enter the destination directory for sorted folders: ").strip()
 
+def run_stages(src_dir, dest_dir, index, cache, plan=None, on_conflict=ON_CONFLICT):
+    """
+    Runs every grouping stage over the files of src_dir known to index.
+    With a plan, the moves are only planned (dry run); otherwise each stage
+    resolves existing targets with on_conflict.
+    """
     group_by_name(
         scan_dir=src_dir,
         target_dir=os.path.join(dest_dir, r"unsorted\facebook\facebook_messenger"),
         startswith="received_",
         match_case=True,
         allowed_file_types=[".jpeg", ".png", ".gif"],
+        index=index,
+        plan=plan,
+        on_conflict=on_conflict,
     )
 
     group_by_name(
@@ -32,6 +49,9 @@ def main():
         startswith="FB_IMG_",
         match_case=True,
         allowed_file_types=[".jpg"],
+        index=index,
+        plan=plan,
+        on_conflict=on_conflict,
     )
 
     group_by_name(
@@ -39,10 +59,18 @@ def main():
         target_dir=os.path.join(dest_dir, r"unsorted\screenshots"),
         startswith="screenshot",
         allowed_file_types=[".jpg", ".png"],
+        index=index,
+        plan=plan,
+        on_conflict=on_conflict,
     )
 
     group_by_name_date(
-        src_dir, dest_dir, [".png", ".jpg", ".jpeg", ".mov", ".mp4", ".modd", ".heic"]
+        src_dir,
+        dest_dir,
+        [".png", ".jpg", ".jpeg", ".mov", ".mp4", ".modd", ".heic"],
+        index=index,
+        plan=plan,
+        on_conflict=on_conflict,
     )
 
     move_aae_files(
@@ -50,20 +78,135 @@ def main():
         dest_folder=dest_dir,
         allowed_file_types=".aae",
         recursive=True,
+        index=index,
+        cache=cache,
+        plan=plan,
+        on_conflict=on_conflict,
     )
 
-    group_by_date_taken(src_dir, dest_dir, [".png", ".jpg", ".jpeg", ".cr2", ".heic"])
+    group_by_date_taken(
+        src_dir,
+        dest_dir,
+        [".png", ".jpg", ".jpeg", ".cr2", ".heic"],
+        index=index,
+        cache=cache,
+        plan=plan,
+        on_conflict=on_conflict,
+    )
 
-    match_by_name(src_dir, dest_dir, [".aae", ".thm", ".modd", ".mov"])
+    # Sidecar matching follows files already moved into dest_dir, so it is not planned.
+    if plan is None:
+        match_by_name(src_dir, dest_dir, [".aae", ".thm", ".modd", ".mov"], index=index)
 
     group_by_media_created(
-        src_dir, dest_dir, [".mov", ".mp4", ".cr2"], "Asia/Singapore"
+        src_dir,
+        dest_dir,
+        [".mov", ".mp4", ".cr2"],
+        "Asia/Singapore",
+        index=index,
+        cache=cache,
+        plan=plan,
+        on_conflict=on_conflict,
     )
 
-    group_folders(dest_dir, dest_dir)
 
-    for _ in range(3):
-        delete_empty_folders(src_dir)
+def watch_and_organize(src_dir, dest_dir, index, cache, settle_seconds=2.0):
+    """
+    Keeps organizing files as they arrive in src_dir, until interrupted.
+
+    The source tree is dropped from the index, and each batch of settled new
+    files is added to it before the stages run, so a cycle only looks at the
+    arrivals (and whatever earlier arrivals no stage could place) rather than
+    the whole tree. The destination stays indexed for conflict checks, also
+    when it lies inside src_dir. Year grouping and empty folder cleanup are
+    limited to the folders the batch's moves went into or out of.
+    """
+    dest_root = os.path.abspath(dest_dir)
+
+    def on_batch(paths):
+        events.info(f"Organizing {len(paths)} new file(s).")
+        index.take_moved_dirs() # only this batch's moves count below
+        for path in paths:
+            index.add_file(path)
+        run_stages(src_dir, dest_dir, index, cache)
+
+        moved_dirs = index.take_moved_dirs()
+        received = set()
+        for folder in moved_dirs:
+            relative = os.path.relpath(folder, dest_root)
+            if relative not in (os.curdir, os.pardir) and not relative.startswith(os.pardir + os.sep):
+                received.add(relative.split(os.sep)[0])
+        if received:
+            group_folders(dest_dir, dest_dir, index=index, names=received)
+
+        moved_dirs |= index.take_moved_dirs()
+        moved_dirs.update(os.path.dirname(os.path.abspath(path)) for path in paths)
+        delete_emptied_folders(moved_dirs, src_dir, index=index)
+        # Files no stage could place stay on disk but are not looked at again.
+        index.forget(src_dir, keep=[dest_dir])
+        index.add_root(src_dir, scan=False)
+        cache.commit()
+
+    index.forget(src_dir, keep=[dest_dir])
+    index.add_root(src_dir, scan=False)
+    events.info(f"Watching '{src_dir}' for new files. Press Ctrl+C to stop.")
+    try:
+        watch(src_dir, on_batch, settle_seconds, exclude=[dest_dir])
+    except KeyboardInterrupt:
+        events.info("Stopped watching.")
+
+
+def export_metrics():
+    """Writes the run's counters and stage timings as JSON and as a Prometheus textfile."""
+    try:
+        paths = METRICS.export()
+    except OSError as e:
+        events.error(f"Error writing metrics: {e}")
+        return
+    events.info(f"Metrics written to '{paths['json']}' and '{paths['prometheus']}'")
+
+
+def main():
+    src_dir = input("Enter the directory to scan for image files: ").strip()
+    dest_dir = input("Enter the destination directory for sorted folders: ").strip()
+    dry_run = input("Dry run (write the move plan, move nothing)? (y/n): ").strip().lower() == 'y'
+    keep_watching = not dry_run and input("Keep watching for new files afterwards? (y/n): ").strip().lower() == 'y'
+
+    # Messages are written in batches by a background thread, with a progress line on
+    # a terminal; FILE_ORGANIZER_LOG_LEVEL and FILE_ORGANIZER_EVENT_LOG adjust them.
+    events.REPORTER.configure_from_environment()
+
+    # Dates and digests from earlier runs are reused for files that have not changed.
+    cache = MetadataCache()
+
+    # The cache is closed and the metrics are written even if a stage fails.
+    try:
+        # List both trees once, many directories at a time; every stage below reads
+        # from and updates this index.
+        with stage("scan_index"):
+            index = ScanIndex([src_dir, dest_dir], cache=cache, walk=parallel_walk)
+        events.REPORTER.set_total(files=len(index.find(under=src_dir)))
+
+        # In a dry run every grouping stage adds to one plan instead of moving files.
+        plan = MovePlan(ON_CONFLICT, index=index) if dry_run else None
+
+        run_stages(src_dir, dest_dir, index, cache, plan)
+
+        if dry_run:
+            plan_path = os.path.abspath("move_plan.jsonl")
+            plan.write_json_lines(plan_path)
+            events.info(f"Dry run: {plan.summary()}. Plan written to '{plan_path}'")
+            return
+
+        group_folders(dest_dir, dest_dir, index=index)
+
+        delete_empty_folders(src_dir, index=index, keep_start=keep_watching)
+
+        if keep_watching:
+            watch_and_organize(src_dir, dest_dir, index, cache)
+    finally:
+        cache.close()
+        export_metrics()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,70 @@
 import os
 import shutil
+from typing import List
 
-def sort_by_matching_name(src_path, dest_path, allowed_src_file_types=None, allowed_dest_file_types=None):
+from metrics import count, timed, FILES_MOVED, ERRORS
+import events
+
+
+class PrefixTrie:
+    """
+    Character trie over a set of keys, answering "which keys is this name prefixed by?"
+    in time proportional to the length of the name, independent of the number of keys.
+    """
+
+    _END = '' # marks a node where a key ends; never a real character
+
+    def __init__(self):
+        self._root = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key: str, value=None):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        if self._END not in node:
+            self._size += 1
+        node[self._END] = (key, value)
+
+    def remove(self, key: str):
+        path = [self._root]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        if path[-1].pop(self._END, None) is None:
+            return
+        self._size -= 1
+
+        # Prune branches that no longer lead to any key.
+        for char, parent in zip(reversed(key), reversed(path[:-1])):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def prefixes_of(self, name: str) -> List[tuple]:
+        """
+        Returns every (key, value) whose key is a prefix of name, shortest first.
+        """
+        matches = []
+        node = self._root
+        if self._END in node:
+            matches.append(node[self._END])
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                break
+            if self._END in node:
+                matches.append(node[self._END])
+        return matches
+
+
+@timed("match_files_by_name_start")
+def sort_by_matching_name(src_path, dest_path, allowed_src_file_types=None, allowed_dest_file_types=None, index=None, walk=None):
     """
     Move files from match_path to the directory containing a file in src_path with the same base name.
     
@@ -12,6 +75,15 @@ def sort_by_matching_name(src_path, dest_path, allowed_src_file_types=None, allo
                                               If None, all source file types are allowed.
       allowed_dest_file_types (list or None): List of allowed extensions (e.g. ['.jpg', '.png']) for destination match files.
                                               If None, all match file types are allowed.
+      index (ScanIndex, optional): Shared scan index. When given, both trees are read from it
+                                   instead of os.walk and moves keep it up to date.
+      walk (callable, optional): Replacement for os.walk when no index is given,
+                                 e.g. parallel_walk for network mounts.
+
+    Matching uses a prefix trie, so each destination file costs time proportional to
+    its name length. When several source base names prefix the same file (e.g.
+    'IMG_1' and 'IMG_12' for 'IMG_123.jpg'), the longest one is used and the
+    ambiguity is reported. Each source file is moved at most once.
     """
     # Prepare allowed extensions as tuples (lowercased) if provided.
     if allowed_src_file_types is not None:
@@ -19,9 +91,12 @@ def sort_by_matching_name(src_path, dest_path, allowed_src_file_types=None, allo
     if allowed_dest_file_types is not None:
         allowed_dest_file_types = tuple(ext.lower() for ext in allowed_dest_file_types)
     
-    # Build a mapping from base filename (without extension) to the directory in src_path.
-    src_map = {}
-    for root, _, files in os.walk(src_path):
+    walk = index.walk if index is not None else (walk or os.walk)
+    move = index.move if index is not None else shutil.move
+
+    # Build a prefix index from base filename (without extension) to the file in src_path.
+    src_map = PrefixTrie()
+    for root, _, files in walk(src_path):
         for file in files:
             ext = os.path.splitext(file)[1].lower()
             if not (allowed_src_file_types is None or ext in allowed_src_file_types):
@@ -30,36 +105,35 @@ def sort_by_matching_name(src_path, dest_path, allowed_src_file_types=None, allo
             base = os.path.splitext(file)[0]
             file_path = os.path.join(root, file)
             # In case multiple files have the same base, the last one found will be used.
-            src_map[base] = file_path
+            src_map.add(base, file_path)
 
     # Process files in match_path.
-    for root, _, files in os.walk(dest_path):
+    for root, _, files in walk(dest_path):
         for file in files:
 
             ext = os.path.splitext(file)[1].lower()
             if not (allowed_dest_file_types is None or ext in allowed_dest_file_types):
                 continue
 
-            matched_key = None
-            for key in src_map:
-                if file.startswith(key):
-                    matched_key = key
-                    break
-
-            if matched_key is None:
+            matches = src_map.prefixes_of(file)
+            if not matches:
                 continue
 
-            src_file_path = src_map[matched_key]
+            matched_key, src_file_path = matches[-1]
+            if len(matches) > 1:
+                candidates = ", ".join(repr(key) for key, _ in matches)
+                events.warning(f"Ambiguous match for '{os.path.join(root, file)}': {candidates}. Using '{matched_key}'.")
+
             dest_file_path = os.path.join(root, os.path.basename(src_file_path))
 
-            
             try:
-                shutil.move(src_file_path, dest_file_path)
-                print(f"Moved '{src_file_path}' to '{dest_file_path}'")
+                move(src_file_path, dest_file_path)
+                src_map.remove(matched_key)
+                count(FILES_MOVED)
+                events.moved(src_file_path, dest_file_path)
             except Exception as e:
-                print(f"Error moving '{src_file_path}' to '{dest_file_path}': {e}")
-
-                
+                count(ERRORS)
+                events.error(f"Error moving '{src_file_path}' to '{dest_file_path}': {e}", path=src_file_path)
 
 
 def main():
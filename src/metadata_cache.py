@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+from metrics import count, CACHE_HITS, CACHE_MISSES
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "file-organizer", "metadata.sqlite3")
+
+
+class MetadataCache:
+    """
+    On-disk cache of per-file metadata (digests, capture dates), stored in SQLite.
+
+    Entries are keyed by (device, inode, size, mtime_ns) plus a kind such as 'md5'
+    or 'date_taken', so a file that has not changed since the last run is answered
+    from the cache without opening it. A value of None is a cached negative result
+    (e.g. "no EXIF date"). The path is stored alongside and is updated in place when
+    the organizer moves a file, since a rename keeps the key valid.
+
+    Args:
+        db_path (str): The path to the SQLite database file.
+        commit_interval (int): Number of writes to batch before committing.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, commit_interval: int = 1000):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.db_path = db_path
+        self.commit_interval = commit_interval
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS metadata (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (dev, ino, size, mtime_ns, kind)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_path ON metadata (path)")
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _key(stat_result: os.stat_result) -> Tuple[int, int, int, int]:
+        return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+    def get(self, path: str, kind: str, stat_result: Optional[os.stat_result] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Looks up a cached value for a file.
+
+        Args:
+            path (str): The path to the file.
+            kind (str): The kind of metadata (e.g. 'md5', 'date_taken').
+            stat_result (os.stat_result, optional): A stat of the file, if the caller already has one.
+
+        Returns:
+            tuple: (hit, value). value is None for a cached negative result.
+        """
+        try:
+            key = self._key(stat_result or os.stat(path))
+        except OSError:
+            return False, None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM metadata WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND kind=?",
+                key + (kind,),
+            ).fetchone()
+        if row is None:
+            count(CACHE_MISSES)
+            return False, None
+        count(CACHE_HITS)
+        return True, row[0]
+
+    def put(self, path: str, kind: str, value: Optional[str], stat_result: Optional[os.stat_result] = None):
+        """
+        Stores a value (or a negative result, if value is None) for a file.
+        Older entries for the same inode and kind are replaced.
+        """
+        try:
+            key = self._key(stat_result or os.stat(path))
+        except OSError:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM metadata WHERE dev=? AND ino=? AND kind=?",
+                (key[0], key[1], kind),
+            )
+            self._conn.execute(
+                "INSERT INTO metadata (dev, ino, size, mtime_ns, kind, path, value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (kind, os.path.abspath(path), value),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_interval:
+                self._conn.commit()
+                self._pending = 0
+
+    def record_move(self, src: str, dst: str):
+        """
+        Updates stored paths after a file or folder was moved, instead of invalidating them.
+
+        A move across devices is a copy with a new device and inode, so entries that
+        no longer match the destination's device are re-keyed to the copied file, or
+        dropped if the file changed meanwhile.
+        """
+        src = os.path.abspath(src)
+        dst = os.path.abspath(dst)
+        prefix = src.rstrip(os.sep) + os.sep
+        # Range bound on the path index: every path that starts with prefix sorts below this.
+        prefix_end = prefix[:-1] + chr(ord(os.sep) + 1)
+        dst_prefix = dst.rstrip(os.sep) + os.sep
+        dst_prefix_end = dst_prefix[:-1] + chr(ord(os.sep) + 1)
+        try:
+            device = os.stat(dst).st_dev
+        except OSError:
+            device = None
+
+        with self._lock:
+            self._conn.execute("UPDATE metadata SET path=? WHERE path=?", (dst, src))
+            self._conn.execute(
+                "UPDATE metadata SET path=? || substr(path, ?) WHERE path >= ? AND path < ?",
+                (dst_prefix, len(prefix) + 1, prefix, prefix_end),
+            )
+            copied = [] if device is None else self._conn.execute(
+                "SELECT dev, ino, size, mtime_ns, kind, path FROM metadata "
+                "WHERE dev != ? AND (path = ? OR (path >= ? AND path < ?))",
+                (device, dst, dst_prefix, dst_prefix_end),
+            ).fetchall()
+            self._pending += 1
+
+        if copied:
+            self._rekey(copied)
+
+    def _rekey(self, rows):
+        # Rows are (dev, ino, size, mtime_ns, kind, path) of entries whose file was copied.
+        updates = []
+        for row in rows:
+            try:
+                stat_result = os.stat(row[5])
+            except OSError:
+                stat_result = None
+            updates.append((row, stat_result))
+
+        with self._lock:
+            for row, stat_result in updates:
+                if stat_result is not None and stat_result.st_size == row[2]:
+                    self._conn.execute(
+                        "UPDATE OR REPLACE metadata SET dev=?, ino=?, size=?, mtime_ns=? "
+                        "WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND kind=?",
+                        self._key(stat_result) + row[:5],
+                    )
+                else:
+                    self._conn.execute(
+                        "DELETE FROM metadata WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND kind=?",
+                        row[:5],
+                    )
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
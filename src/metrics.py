@@ -0,0 +1,246 @@
+import io
+import os
+import json
+import time
+import threading
+import contextlib
+import functools
+from typing import Callable, Dict, Optional
+
+DEFAULT_METRICS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "file-organizer")
+METRICS_DIR_ENV = "FILE_ORGANIZER_METRICS_DIR" # e.g. node-exporter's --collector.textfile.directory
+PROMETHEUS_PREFIX = "file_organizer"
+
+# Counter names
+DIRECTORIES_LISTED = "directories_listed"
+STAT_CALLS = "stat_calls"
+BYTES_HASHED = "bytes_hashed"
+BYTES_READ_METADATA = "bytes_read_metadata"
+FILES_MOVED = "files_moved"
+BYTES_COPIED = "bytes_copied"
+CACHE_HITS = "cache_hits"
+CACHE_MISSES = "cache_misses"
+SUBPROCESSES = "subprocesses"
+ERRORS = "errors"
+
+COUNTER_HELP = {
+    DIRECTORIES_LISTED: "Directories listed.",
+    STAT_CALLS: "stat calls made on files.",
+    BYTES_HASHED: "Bytes read to hash files.",
+    BYTES_READ_METADATA: "Bytes read to parse EXIF and media headers.",
+    FILES_MOVED: "Files moved.",
+    BYTES_COPIED: "Bytes copied by moves across devices.",
+    CACHE_HITS: "Metadata cache lookups answered from the cache.",
+    CACHE_MISSES: "Metadata cache lookups that had to read the file.",
+    SUBPROCESSES: "External commands run (7z, par2).",
+    ERRORS: "Errors reported by the stages.",
+}
+
+
+class StageTimes:
+    """Accumulated timings of one named stage, over every time it ran."""
+
+    __slots__ = ('calls', 'wall_seconds', 'cpu_seconds', 'child_cpu_seconds', 'errors', 'counters')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0       # this process, all threads
+        self.child_cpu_seconds = 0.0 # finished subprocesses, e.g. 7z
+        self.errors = 0              # runs that ended with an exception
+        self.counters: Dict[str, int] = {} # counter increments made while the stage ran
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "child_cpu_seconds": round(self.child_cpu_seconds, 6),
+            "errors": self.errors,
+            "counters": dict(self.counters),
+        }
+
+
+def _child_cpu_seconds() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Run-wide counters and per-stage wall/CPU timers.
+
+    Counters are plain named totals, safe to increment from any thread. A stage
+    records its wall time, the process CPU time and the CPU time of subprocesses
+    it waited for, plus the counter increments made while it ran. Stages may nest.
+    Stages running at the same time in different threads see each other's counter
+    increments, so their per-stage counters overlap.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters: Dict[str, int] = {}
+            self.stages: Dict[str, StageTimes] = {}
+
+    def count(self, name: str, value: int = 1):
+        """Adds value to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Times the body of a with block as one run of the named stage."""
+        with self._lock:
+            counters_before = dict(self.counters)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        child_start = _child_cpu_seconds()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            child = _child_cpu_seconds() - child_start
+            with self._lock:
+                times = self.stages.get(name)
+                if times is None:
+                    times = self.stages[name] = StageTimes()
+                times.calls += 1
+                times.wall_seconds += wall
+                times.cpu_seconds += cpu
+                times.child_cpu_seconds += child
+                times.errors += failed
+                for counter, value in self.counters.items():
+                    delta = value - counters_before.get(counter, 0)
+                    if delta:
+                        times.counters[counter] = times.counters.get(counter, 0) + delta
+
+    def timed(self, name: str) -> Callable:
+        """Decorator that runs every call of a function as the named stage."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "duration_seconds": round(time.time() - self.started, 6),
+                "counters": dict(self.counters),
+                "stages": {name: times.as_dict() for name, times in self.stages.items()},
+            }
+
+    def prometheus_text(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format. Everything is a
+        gauge describing the last run, as the textfile collector expects from batch jobs.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def gauge(name, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(str(label))}"' for key, label in labels)
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if labels else f"{prefix}_{name} {value}")
+
+        gauge("last_run_timestamp_seconds", "Start of the last run, in seconds since the epoch.", [((), snapshot["started"])])
+        gauge("last_run_duration_seconds", "Duration of the last run.", [((), snapshot["duration_seconds"])])
+        for counter in sorted(set(COUNTER_HELP) | set(snapshot["counters"])):
+            help_text = COUNTER_HELP.get(counter, counter.replace("_", " ").capitalize() + ".")
+            gauge(counter, f"{help_text[:-1]} in the last run.", [((), snapshot["counters"].get(counter, 0))])
+
+        stages = sorted(snapshot["stages"].items())
+        for field, help_text in [
+            ("calls", "Times each stage ran in the last run."),
+            ("wall_seconds", "Wall-clock time spent in each stage in the last run."),
+            ("cpu_seconds", "Process CPU time spent in each stage in the last run."),
+            ("child_cpu_seconds", "CPU time of subprocesses run by each stage in the last run."),
+            ("errors", "Stage runs that failed in the last run."),
+        ]:
+            gauge(f"stage_{field}", help_text, [((("stage", name),), times[field]) for name, times in stages])
+        gauge("stage_counter", "Counter increments made while each stage ran in the last run.", [
+            ((("stage", name), ("counter", counter)), value)
+            for name, times in stages
+            for counter, value in sorted(times["counters"].items())
+        ])
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+            f.write("\n")
+
+    def write_prometheus(self, path: str, prefix: str = PROMETHEUS_PREFIX):
+        # Written aside and renamed, so the collector never reads a half-written file.
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text(prefix))
+        os.replace(temp_path, path)
+
+    def export(self, directory: Optional[str] = None) -> Dict[str, str]:
+        """
+        Writes metrics.json and file_organizer.prom into directory (by default the
+        FILE_ORGANIZER_METRICS_DIR environment variable, else the cache directory).
+
+        Returns:
+            dict: Format ('json', 'prometheus') -> path written.
+        """
+        directory = directory or os.environ.get(METRICS_DIR_ENV) or DEFAULT_METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            "json": os.path.join(directory, "metrics.json"),
+            "prometheus": os.path.join(directory, f"{PROMETHEUS_PREFIX}.prom"),
+        }
+        self.write_json(paths["json"])
+        self.write_prometheus(paths["prometheus"])
+        return paths
+
+
+class _CountingFileIO(io.FileIO):
+    """A raw file that counts the bytes actually read from the OS."""
+
+    bytes_read = 0
+
+    def readinto(self, buffer):
+        read = super().readinto(buffer)
+        if read:
+            self.bytes_read += read
+        return read
+
+
+@contextlib.contextmanager
+def open_counted(path: str, counter: str):
+    """Opens a file for buffered binary reading and adds the bytes it read to counter on close."""
+    raw = _CountingFileIO(path, "rb")
+    try:
+        with io.BufferedReader(raw) as f:
+            yield f
+    finally:
+        count(counter, raw.bytes_read)
+        raw.close()
+
+
+# The run-wide metrics every module records into.
+METRICS = Metrics()
+count = METRICS.count
+stage = METRICS.stage
+timed = METRICS.timed
@@ -1,9 +1,12 @@
 import os
-import shutil
 import re
 from datetime import datetime
 
-def get_file_date(file_path):
+from move_planner import MovePlan, execute_plan
+from metrics import timed
+import events
+
+def get_file_date(file_path, cache=None):
     """
     Extracts a date from the file. It first tries to find a date tag 
     (e.g., <date>yyyy-MM-ddTHH:mm:ssZ</date>) within the file content.
@@ -11,63 +14,70 @@ def get_file_date(file_path):
 
     Args:
         file_path (str): The full path to the file.
+        cache (MetadataCache, optional): Persistent cache for the date tag, so unchanged
+                                         files are not re-read.
 
     Returns:
         datetime.datetime: The extracted date as a datetime object, or None if no date is found.
     """
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            # Use regex to find any date tag in the content
-            match = re.search(r"<date>(.*?)</date>", content)
-            if match:
-                date_str = match.group(1)
-                # Parse the standard ISO 8601 format date
-                return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+        hit = False
+        if cache is not None:
+            stat_result = os.stat(file_path)
+            hit, date_str = cache.get(file_path, 'date_tag', stat_result)
+
+        if not hit:
+            date_str = None
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+                # Use regex to find any date tag in the content
+                match = re.search(r"<date>(.*?)</date>", content)
+                if match:
+                    date_str = match.group(1)
+            if cache is not None:
+                cache.put(file_path, 'date_tag', date_str, stat_result)
+
+        if date_str:
+            # Parse the standard ISO 8601 format date
+            return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
     except Exception as e:
-        print(f"Could not read file {os.path.basename(file_path)} to find date tag: {e}")
+        events.warning(f"Could not read file {os.path.basename(file_path)} to find date tag: {e}", path=file_path)
 
     # Fallback to file modification time if no date tag is found
     try:
         mod_time = os.path.getmtime(file_path)
         return datetime.fromtimestamp(mod_time)
     except OSError as e:
-        print(f"Could not get modification time for {os.path.basename(file_path)}: {e}")
+        events.warning(f"Could not get modification time for {os.path.basename(file_path)}: {e}", path=file_path)
 
     return None
 
-def process_and_move_file(file_path, dest_folder, allowed_exts):
+def process_and_move_file(file_path, dest_folder, allowed_exts, plan, cache=None):
     """
-    Processes a single file: checks its type, extracts the date, and moves it.
+    Processes a single file: checks its type, extracts the date, and plans its move.
 
     Args:
         file_path (str): The full path to the file to process.
         dest_folder (str): The root destination directory.
         allowed_exts (tuple): A tuple of lowercase file extensions to process.
+        plan (MovePlan): The plan the move is added to.
+        cache (MetadataCache, optional): Persistent cache for the date lookup.
     """
     if not file_path.lower().endswith(allowed_exts):
         return # Skip files that don't match the allowed types
 
-    file_date = get_file_date(file_path)
+    file_date = get_file_date(file_path, cache)
 
     if file_date:
         # Create a folder name in yyyy_MM_dd format
         date_folder_name = file_date.strftime("%Y_%m_%d")
         target_folder = os.path.join(dest_folder, date_folder_name)
-
-        # Create the date-specific folder if it doesn't exist
-        os.makedirs(target_folder, exist_ok=True)
-
-        # Move the file
-        try:
-            shutil.move(file_path, os.path.join(target_folder, os.path.basename(file_path)))
-            print(f"Moved '{os.path.basename(file_path)}' to '{target_folder}'")
-        except Exception as e:
-            print(f"Error moving file '{file_path}': {e}")
+        plan.add(file_path, os.path.join(target_folder, os.path.basename(file_path)), f"file date {date_folder_name}")
     else:
-        print(f"Could not determine date for '{os.path.basename(file_path)}'. Skipping.")
+        events.skipped(file_path, "could not determine date")
 
-def sort_files_by_date(src_folder, dest_folder, allowed_file_types, recursive):
+@timed("move_aae_files")
+def sort_files_by_date(src_folder, dest_folder, allowed_file_types, recursive, index=None, cache=None, plan=None, walk=None, on_conflict='skip'):
     """
     Organizes files into date-stamped folders based on an extracted date.
 
@@ -76,6 +86,15 @@ def sort_files_by_date(src_folder, dest_folder, allowed_file_types, recursive):
         dest_folder (str): The path to the destination directory.
         allowed_file_types (str or tuple or list): File extensions to process.
         recursive (bool): If True, scans all child directories.
+        index (ScanIndex, optional): Shared scan index. When given, the tree is read from it
+                                     instead of os.walk and moves keep it up to date.
+        walk (callable, optional): Replacement for os.walk when no index is given,
+                                   e.g. parallel_walk for network mounts.
+        cache (MetadataCache, optional): Persistent cache for the date lookups.
+        plan (MovePlan, optional): When given, moves are only added to this plan and nothing
+                                   is moved; otherwise a plan is built for this call and executed.
+        on_conflict (str): Policy for targets that already exist, see MovePlan; used without a plan.
+                           'skip' keeps both files, 'overwrite' replaces the target as shutil.move used to.
     """
     # Normalize allowed_file_types to a tuple of lowercase strings for consistent checks
     if isinstance(allowed_file_types, str):
@@ -83,23 +102,34 @@ def sort_files_by_date(src_folder, dest_folder, allowed_file_types, recursive):
     elif isinstance(allowed_file_types, (list, tuple)):
         allowed_exts = tuple(ext.lower() for ext in allowed_file_types if ext)
     else:
-        print("Error: 'allowed_file_types' must be a string, tuple, or list.")
+        events.error("Error: 'allowed_file_types' must be a string, tuple, or list.")
         return
         
     if not allowed_exts:
-        print("Error: No allowed file types specified.")
+        events.error("Error: No allowed file types specified.")
         return
 
+    own_plan = plan is None
+    if own_plan:
+        plan = MovePlan(on_conflict, index=index)
+
+    walk = index.walk if index is not None else (walk or os.walk)
+    listdir = index.listdir if index is not None else os.listdir
+    isfile = index.isfile if index is not None else os.path.isfile
+
     # Scan directories and process files
     if recursive:
-        for root, _, files in os.walk(src_folder):
+        for root, _, files in walk(src_folder):
             for filename in files:
-                process_and_move_file(os.path.join(root, filename), dest_folder, allowed_exts)
+                process_and_move_file(os.path.join(root, filename), dest_folder, allowed_exts, plan, cache)
     else:
-        for filename in os.listdir(src_folder):
+        for filename in listdir(src_folder):
             file_path = os.path.join(src_folder, filename)
-            if os.path.isfile(file_path):
-                process_and_move_file(file_path, dest_folder, allowed_exts)
+            if isfile(file_path):
+                process_and_move_file(file_path, dest_folder, allowed_exts, plan, cache)
+
+    if own_plan:
+        execute_plan(plan, index)
 
 def main():
     """
@@ -136,7 +166,7 @@ def main():
 
     print("\nStarting the sorting process...")
     sort_files_by_date(src_dir, dest_dir, allowed_types, is_recursive)
-    print("\nSorting complete.")
+    events.info("\nSorting complete.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,387 @@
+import os
+import sys
+import json
+import errno
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, NamedTuple, Optional, TextIO, Union
+
+from metrics import count, FILES_MOVED, BYTES_COPIED, ERRORS
+import events
+
+CONFLICT_POLICIES = ('skip', 'rename', 'overwrite')
+
+
+class MoveOperation(NamedTuple):
+    source: str
+    destination: str
+    reason: str
+    size: int
+
+
+class MovePlan:
+    """
+    A complete list of file moves, decided before anything touches the disk.
+
+    Grouping functions add operations to a plan instead of moving files one by
+    one. The plan resolves conflicts up front (targets that already exist, or two
+    sources planned to the same target) and can then be executed, or exported as
+    JSON lines for a dry run.
+
+    A source is only planned once: when several stages share a plan, the first
+    stage that claims a file wins, as it would when the stages run one after another.
+
+    Args:
+        on_conflict (str): What to do when a target is taken: 'skip' the move,
+                           'rename' it to a free "name (n).ext", or 'overwrite'
+                           an existing file (never another planned target).
+                           'skip' is the default: the grouping stages used to
+                           overwrite existing files with shutil.move, and now keep
+                           them unless 'overwrite' is asked for.
+        index (ScanIndex, optional): Shared scan index used to check existing targets without
+                                     a stat and to look up source sizes it already knows.
+    """
+
+    def __init__(self, on_conflict: str = 'skip', index=None):
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}: got {on_conflict!r}")
+
+        self.on_conflict = on_conflict
+        self.index = index
+        self.operations: List[MoveOperation] = []
+        self.skipped: List[MoveOperation] = [] # reason holds why the move was skipped
+        self._sources = set()
+        self._targets = set()
+
+    def __len__(self):
+        return len(self.operations)
+
+    def __iter__(self) -> Iterator[MoveOperation]:
+        return iter(self.operations)
+
+    @property
+    def total_size(self) -> int:
+        return sum(operation.size for operation in self.operations)
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def _exists(self, path: str) -> bool:
+        if self.index is not None:
+            return self.index.exists(path)
+        return os.path.exists(path)
+
+    def _is_taken(self, path: str) -> bool:
+        return self._key(path) in self._targets or self._exists(path)
+
+    def _free_name(self, destination: str) -> str:
+        return _free_name(destination, self._is_taken)
+
+    def add(self, source: str, destination: str, reason: str = '') -> Optional[MoveOperation]:
+        """
+        Plans moving source to destination (a full file path, not a folder).
+
+        Returns:
+            MoveOperation: The planned operation, or None if the move was skipped.
+        """
+        source_key = self._key(source)
+        if source_key in self._sources or source_key == self._key(destination):
+            return None
+
+        if self._key(destination) in self._targets:
+            if self.on_conflict != 'rename':
+                self.skipped.append(MoveOperation(source, destination, "duplicate target in plan", 0))
+                return None
+            destination = self._free_name(destination)
+        elif self._exists(destination):
+            if self.on_conflict == 'skip':
+                self.skipped.append(MoveOperation(source, destination, "target exists", 0))
+                return None
+            if self.on_conflict == 'rename':
+                destination = self._free_name(destination)
+
+        try:
+            size = self.index.size(source) if self.index is not None else os.path.getsize(source)
+        except OSError as e:
+            self.skipped.append(MoveOperation(source, destination, f"cannot stat source: {e}", 0))
+            return None
+
+        operation = MoveOperation(source, destination, reason, size)
+        self.operations.append(operation)
+        self._sources.add(source_key)
+        self._targets.add(self._key(destination))
+        return operation
+
+    def add_operation(self, operation: MoveOperation):
+        """Adds an operation that was already checked, e.g. by the plan that produced it."""
+        self.operations.append(operation)
+        self._sources.add(self._key(operation.source))
+        self._targets.add(self._key(operation.destination))
+
+    def sorted_operations(self) -> List[MoveOperation]:
+        """Returns the operations ordered by target directory, then source path."""
+        return sorted(self.operations, key=lambda op: (os.path.dirname(op.destination), op.source))
+
+    def summary(self) -> dict:
+        return {
+            "files": len(self.operations),
+            "bytes": self.total_size,
+            "target_directories": len({os.path.dirname(op.destination) for op in self.operations}),
+            "skipped": len(self.skipped),
+        }
+
+    def write_json_lines(self, output: Union[str, TextIO] = '-'):
+        """
+        Writes one JSON object per operation, sorted by target directory, followed by
+        the skipped moves (with "skipped": true). output may be a path, a file object,
+        or '-' for stdout.
+        """
+        if isinstance(output, str) and output != '-':
+            with open(output, 'w', encoding='utf-8') as f:
+                return self.write_json_lines(f)
+        if output == '-':
+            output = sys.stdout
+
+        for operation in self.sorted_operations():
+            output.write(json.dumps(operation._asdict()) + "\n")
+        for operation in self.skipped:
+            output.write(json.dumps(dict(operation._asdict(), skipped=True)) + "\n")
+
+
+def _free_name(destination: str, is_taken: Callable[[str], bool]) -> str:
+    """The first "name (n).ext" next to destination that is not taken."""
+    base, ext = os.path.splitext(destination)
+    counter = 1
+    candidate = f"{base} ({counter}){ext}"
+    while is_taken(candidate):
+        counter += 1
+        candidate = f"{base} ({counter}){ext}"
+    return candidate
+
+
+COPY_CHUNK_SIZE = 64 << 20 # bytes per copy_file_range/sendfile call
+ZERO_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+
+
+def _copy_with(copy_call, fsrc, fdst) -> int:
+    """Repeats a zero-copy call until the source is exhausted. Returns the bytes copied."""
+    copied = 0
+    while True:
+        sent = copy_call(fsrc.fileno(), fdst.fileno(), copied)
+        if not sent:
+            return copied
+        copied += sent
+
+
+def copy_file_fast(source: str, destination: str) -> int:
+    """
+    Copies a file's data and metadata, using os.copy_file_range or os.sendfile when
+    the platform supports them so the data never passes through Python.
+    Falls back to a buffered copy otherwise.
+
+    Returns:
+        int: The number of bytes copied.
+    """
+    with open(source, 'rb') as fsrc, open(destination, 'wb') as fdst:
+        copy_calls = []
+        if hasattr(os, 'copy_file_range'):
+            copy_calls.append(lambda src_fd, dst_fd, offset: os.copy_file_range(src_fd, dst_fd, COPY_CHUNK_SIZE, offset, offset))
+        if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+            copy_calls.append(lambda src_fd, dst_fd, offset: os.sendfile(dst_fd, src_fd, offset, COPY_CHUNK_SIZE))
+
+        copied = None
+        for copy_call in copy_calls:
+            try:
+                copied = _copy_with(copy_call, fsrc, fdst)
+                break
+            except OSError as e:
+                # Only fall back if nothing was written yet.
+                if e.errno not in ZERO_COPY_FALLBACK_ERRNOS or fdst.tell() or os.fstat(fdst.fileno()).st_size:
+                    raise
+        if copied is None:
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+            copied = fdst.tell()
+
+    shutil.copystat(source, destination)
+    count(BYTES_COPIED, copied)
+    return copied
+
+
+# Hard-link the entry itself, not what a symlink points to, where the platform allows it.
+_LINK_OPTIONS = {'follow_symlinks': False} if os.link in os.supports_follow_symlinks else {}
+
+
+def _rename_no_clobber(source: str, destination: str):
+    """
+    Renames a file within a device, raising FileExistsError instead of replacing
+    an existing destination. A hard link followed by unlinking the source makes
+    the check and the rename one step; file systems without hard links fall back
+    to checking right before the rename.
+    """
+    try:
+        os.link(source, destination, **_LINK_OPTIONS)
+    except OSError as e:
+        if e.errno in (errno.EEXIST, errno.EXDEV):
+            raise
+        if os.path.lexists(destination):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destination) from e
+        os.rename(source, destination)
+        return
+    os.unlink(source)
+
+
+def _place(source: str, destination: str, on_conflict: str, is_taken: Callable[[str], bool]) -> str:
+    """
+    Renames source to destination within a device under a conflict policy, for
+    targets that appeared after the plan was made. 'overwrite' replaces them,
+    'rename' picks a free name and 'skip' raises FileExistsError.
+
+    Returns:
+        str: The path the file was renamed to.
+    """
+    if on_conflict == 'overwrite':
+        os.replace(source, destination)
+        return destination
+    candidate = destination
+    while True:
+        try:
+            _rename_no_clobber(source, candidate)
+            return candidate
+        except FileExistsError:
+            if on_conflict != 'rename':
+                raise
+            candidate = _free_name(destination, is_taken)
+
+
+def _copy_and_remove(source: str, destination: str, on_conflict: str = 'skip', is_taken: Callable[[str], bool] = os.path.lexists) -> str:
+    """
+    Moves a file across devices: copy into a temporary file next to destination,
+    rename it into place, then delete the source. A failed copy only ever removes
+    the temporary file, never an existing destination.
+
+    Returns:
+        str: The path the file was moved to.
+    """
+    target_dir, name = os.path.split(destination)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".part", dir=target_dir)
+    os.close(fd)
+    try:
+        copy_file_fast(source, temp_path)
+        final = _place(temp_path, destination, on_conflict, is_taken)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.remove(source)
+    return final
+
+
+def move_operation(operation: MoveOperation, on_conflict: str = 'skip') -> str:
+    """
+    Executes a single planned move: a rename within a device, otherwise a copy
+    followed by deleting the source. Creates the target directory if needed.
+    A target that appeared since planning is handled by on_conflict, as in MovePlan.
+
+    Returns:
+        str: The path the file was moved to; it differs from the planned one if it was renamed.
+
+    Raises:
+        FileExistsError: If the target appeared since planning and on_conflict is 'skip'.
+    """
+    os.makedirs(os.path.dirname(operation.destination), exist_ok=True)
+    try:
+        final = _place(operation.source, operation.destination, on_conflict, os.path.lexists)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        final = _copy_and_remove(operation.source, operation.destination, on_conflict)
+    count(FILES_MOVED)
+    return final
+
+
+def execute_plan(plan: MovePlan, index=None, max_copy_workers: int = 4) -> int:
+    """
+    Executes a plan in target-directory order, creating each target directory once.
+
+    Operations are batched by (source device, destination device). Moves within a
+    device are a single rename that never replaces a file. Moves across devices are
+    copied on a bounded thread pool with zero-copy transfers, and each source is
+    deleted only after its copy succeeded, so copies from slow media overlap.
+    A target that appeared since planning is handled by the plan's on_conflict;
+    skipped moves are added to plan.skipped.
+
+    Args:
+        plan (MovePlan): The plan to execute.
+        index (ScanIndex, optional): Shared scan index; it is updated for every completed move.
+        max_copy_workers (int): Number of concurrent cross-device copies.
+
+    Returns:
+        int: The number of files moved.
+    """
+    target_devices = {}
+    cross_device = []
+    moved = 0
+
+    def is_taken(path):
+        return plan._is_taken(path) or os.path.lexists(path)
+
+    def record(operation, final):
+        count(FILES_MOVED)
+        if index is not None:
+            index.record_move(operation.source, final)
+        events.moved(operation.source, final, operation.size)
+
+    def skip(operation):
+        plan.skipped.append(operation._replace(reason="target appeared after planning"))
+        events.skipped(operation.source, f"'{operation.destination}' appeared after planning")
+
+    for operation in plan.sorted_operations():
+        target_dir = os.path.dirname(operation.destination)
+        try:
+            if target_dir not in target_devices:
+                os.makedirs(target_dir, exist_ok=True)
+                target_devices[target_dir] = os.stat(target_dir).st_dev
+
+            if os.stat(operation.source).st_dev != target_devices[target_dir]:
+                cross_device.append(operation)
+                continue
+
+            try:
+                final = _place(operation.source, operation.destination, plan.on_conflict, is_taken)
+            except FileExistsError:
+                skip(operation)
+                continue
+            except OSError as e:
+                if e.errno != errno.EXDEV: # e.g. a bind mount that reports the same device
+                    raise
+                cross_device.append(operation)
+                continue
+
+            moved += 1
+            record(operation, final)
+        except Exception as e:
+            count(ERRORS)
+            events.error(f"Error moving '{operation.source}' to '{operation.destination}': {e}", path=operation.source)
+
+    if not cross_device:
+        return moved
+
+    with ThreadPoolExecutor(max_workers=max_copy_workers) as executor:
+        futures = {
+            executor.submit(_copy_and_remove, operation.source, operation.destination, plan.on_conflict, is_taken): operation
+            for operation in cross_device
+        }
+        for future in as_completed(futures):
+            operation = futures[future]
+            try:
+                final = future.result()
+                moved += 1
+                record(operation, final)
+            except FileExistsError:
+                skip(operation)
+            except Exception as e:
+                count(ERRORS)
+                events.error(f"Error moving '{operation.source}' to '{operation.destination}': {e}", path=operation.source)
+    return moved
@@ -0,0 +1,311 @@
+import os
+import re
+import json
+import time
+import queue
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from metrics import count, stage, ERRORS, SUBPROCESSES
+import parity
+import events
+
+PAR2_EXECUTABLE = "par2j64"
+OUTPUT_TAIL_LINES = 20 # output lines kept for the report when a set is not complete
+
+# Statuses of a par2 set
+COMPLETE = "complete"           # every file verified
+DAMAGED = "damaged"             # repairable, repair not requested
+REPAIRED = "repaired"
+REPAIR_FAILED = "repair_failed"
+UNKNOWN = "unknown"             # par2 ended without a recognized status line
+MISSING = "missing"             # the .par2 file does not exist
+ERROR = "error"                 # par2 could not be run
+
+OK_STATUSES = (COMPLETE, REPAIRED)
+
+RECOVERY_VOLUME = re.compile(r"\.vol\d+\+\d+\.par2$", re.IGNORECASE) # name.vol00+10.par2
+
+# par2j64 output lines that decide the status, checked in order.
+VERIFY_MARKERS = [("All Files Complete", COMPLETE), ("Ready to repair", DAMAGED)]
+REPAIR_MARKERS = [("Repaired successfully", REPAIRED)]
+
+
+class Par2Result(NamedTuple):
+    path: str
+    status: str
+    verify_seconds: float
+    repair_seconds: float
+    output: List[str] # last lines of par2's output, kept when the set did not verify
+
+    @property
+    def ok(self) -> bool:
+        return self.status in OK_STATUSES
+
+    def as_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "status": self.status,
+            "verify_seconds": round(self.verify_seconds, 3),
+            "repair_seconds": round(self.repair_seconds, 3),
+            "output": self.output,
+        }
+
+
+def stream_par2(command: List[str], cwd: str, markers, popen: Callable = subprocess.Popen):
+    """
+    Runs par2 and reads its output line by line as it is written, so progress of
+    large sets is never buffered in memory. Returns the status of the first marker
+    seen (None if none), the exit code and the last OUTPUT_TAIL_LINES lines.
+    """
+    status = None
+    tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    count(SUBPROCESSES)
+    with popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+               text=True, errors="replace", bufsize=1) as process:
+        for line in process.stdout: # text mode turns par2's \r progress updates into lines too
+            line = line.rstrip()
+            if not line:
+                continue
+            tail.append(line)
+            if status is None:
+                status = next((marker_status for marker, marker_status in markers if marker in line), None)
+    return status, process.returncode, list(tail)
+
+
+class Par2Runner:
+    """
+    Verifies many par2 sets at once, with repairs queued apart from verification.
+
+    Every device (st_dev of the .par2 file) gets its own verify_per_device
+    threads, so sets on different disks verify in parallel while one disk is
+    never asked for more concurrent streams than it handles well. Sets found
+    damaged go to a separate repair queue, worked by repair_workers threads while
+    the other sets keep verifying. Recovery files of the native engine (.rsp) are
+    checked in process by parity instead of par2j64.
+
+    Args:
+        verify_per_device (int): Sets verified at once on one device.
+        repair (bool): Repair damaged sets; otherwise they are reported as damaged.
+        repair_workers (int): Repairs run at once.
+        executable (str): The par2 program, par2j64 by default.
+        popen (callable): Replacement for subprocess.Popen, e.g. to run a stand-in.
+        parity_workers (int, optional): Processes per .rsp set, see parity.verify_recovery.
+    """
+
+    def __init__(
+            self,
+            verify_per_device: int = 1,
+            repair: bool = True,
+            repair_workers: int = 1,
+            executable: str = PAR2_EXECUTABLE,
+            popen: Callable = subprocess.Popen,
+            parity_workers: Optional[int] = None
+    ):
+        self.verify_per_device = max(1, verify_per_device)
+        self.repair = repair
+        self.repair_workers = max(1, repair_workers)
+        self.executable = executable
+        self.popen = popen
+        self.parity_workers = parity_workers
+
+    def _run_parity(self, action: str, recovery_path: str):
+        # The native engine's status in the form of _run_par2's.
+        try:
+            if action == "r":
+                return (REPAIRED if parity.repair_recovery(recovery_path, self.parity_workers) else None), None, ["Repair did not restore every file"]
+            result = parity.verify_recovery(recovery_path, self.parity_workers)
+        except Exception as e:
+            return ERROR, None, [f"An unexpected error occurred: {e}"]
+        tail = [
+            f"{result.damaged_slices} damaged slice(s), {result.damaged_recovery} damaged recovery slice(s), "
+            f"{result.unrepairable_groups} unrepairable group(s), {len(result.resized_files)} file(s) of wrong size"
+        ]
+        return (COMPLETE if result.complete else DAMAGED), None, tail
+
+    def _run_par2(self, action: str, par2_file_path: str, markers):
+        if par2_file_path.endswith(parity.SUFFIX):
+            return self._run_parity(action, par2_file_path)
+        try:
+            return stream_par2([self.executable, action, par2_file_path], os.path.dirname(par2_file_path), markers, self.popen)
+        except FileNotFoundError:
+            return ERROR, None, [f"{self.executable} command not found. Make sure it is installed and in your PATH."]
+        except Exception as e:
+            return ERROR, None, [f"An unexpected error occurred: {e}"]
+
+    def verify(self, par2_file_path: str):
+        """Verifies one set. Returns its status, the seconds taken and par2's last lines."""
+        start = time.perf_counter()
+        with stage("par2_verify"):
+            status, _, tail = self._run_par2("v", par2_file_path, VERIFY_MARKERS)
+        seconds = time.perf_counter() - start
+        if status == COMPLETE:
+            events.info(f"Verification successful: All files are correct for {par2_file_path}")
+        elif status == DAMAGED:
+            events.warning(f"Verification failed: Some files are missing or damaged for {par2_file_path}")
+        elif status == ERROR:
+            count(ERRORS)
+            events.error(f"Error verifying {par2_file_path}: {tail[-1]}")
+        else:
+            count(ERRORS)
+            status = UNKNOWN
+            events.error(f"Unknown PAR2 output during verification for {par2_file_path}:\n" + "\n".join(tail))
+        return status, seconds, tail
+
+    def repair_set(self, par2_file_path: str):
+        """Repairs one set. Returns its status, the seconds taken and par2's last lines."""
+        events.info(f"Attempting repair for {par2_file_path}...")
+        start = time.perf_counter()
+        with stage("par2_repair"):
+            status, _, tail = self._run_par2("r", par2_file_path, REPAIR_MARKERS)
+        seconds = time.perf_counter() - start
+        if status == REPAIRED:
+            events.info(f"Repair successful for {par2_file_path}.")
+            return REPAIRED, seconds, tail
+        count(ERRORS)
+        events.error(f"Repair failed for {par2_file_path}:\n" + "\n".join(tail))
+        return REPAIR_FAILED, seconds, tail
+
+    def run(self, par2_files: Iterable[str]) -> List[Par2Result]:
+        """
+        Verifies (and repairs) every set and waits for them.
+
+        Returns:
+            list: A Par2Result per set, in the order given.
+        """
+        requested = list(par2_files)
+        paths = list(dict.fromkeys(requested))
+        results: Dict[str, Par2Result] = {}
+        lock = threading.Lock()
+
+        by_device: Dict[int, deque] = {}
+        for path in paths:
+            try:
+                device = os.stat(path).st_dev
+            except OSError:
+                count(ERRORS)
+                events.error(f"Error: PAR2 file not found: {path}")
+                results[path] = Par2Result(path, MISSING, 0.0, 0.0, [])
+                continue
+            by_device.setdefault(device, deque()).append(path)
+
+        repairs = queue.Queue()
+
+        def verify_worker(pending: deque):
+            while True:
+                try:
+                    path = pending.popleft()
+                except IndexError:
+                    return
+                status, seconds, tail = self.verify(path)
+                if status == DAMAGED and self.repair:
+                    repairs.put((path, seconds, tail))
+                    continue
+                with lock:
+                    results[path] = Par2Result(path, status, seconds, 0.0, [] if status == COMPLETE else tail)
+
+        def repair_worker():
+            while True:
+                item = repairs.get()
+                if item is None:
+                    return
+                path, verify_seconds, verify_tail = item
+                status, seconds, tail = self.repair_set(path)
+                with lock:
+                    results[path] = Par2Result(path, status, verify_seconds, seconds, verify_tail + tail)
+
+        verifiers = [
+            threading.Thread(target=verify_worker, args=(pending,), name=f"par2-verify-{device}-{n}", daemon=True)
+            for device, pending in by_device.items()
+            for n in range(min(self.verify_per_device, len(pending)))
+        ]
+        repairers = [
+            threading.Thread(target=repair_worker, name=f"par2-repair-{n}", daemon=True)
+            for n in range(self.repair_workers if self.repair else 0)
+        ]
+        for thread in verifiers + repairers:
+            thread.start()
+        for thread in verifiers:
+            thread.join()
+        for _ in repairers:
+            repairs.put(None)
+        for thread in repairers:
+            thread.join()
+
+        return [results[path] for path in requested]
+
+
+def index_files(par2_files: Iterable[str]) -> List[str]:
+    """
+    Drops recovery volumes (name.vol00+10.par2) whose index file name.par2 is in
+    par2_files, since verifying through the index reads the same set only once.
+    """
+    par2_files = list(dict.fromkeys(par2_files))
+    present = set(par2_files)
+    return [
+        path for path in par2_files
+        if not (RECOVERY_VOLUME.search(path) and RECOVERY_VOLUME.sub(".par2", path) in present)
+    ]
+
+
+def summarize(results: List[Par2Result]) -> dict:
+    """Counts per status and the sets that are not ok."""
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    return {
+        "sets": len(results),
+        "ok": sum(result.ok for result in results),
+        "statuses": statuses,
+        "failed": [result.path for result in results if not result.ok],
+    }
+
+
+def write_report(results: List[Par2Result], path: str) -> dict:
+    """Writes the summary and every set's result as JSON. Returns the summary."""
+    summary = summarize(results)
+    report = {
+        "finished": datetime.now(timezone.utc).isoformat(),
+        **summary,
+        "results": [result.as_dict() for result in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    return summary
+
+
+def verify_par2_sets(
+        par2_files: Iterable[str],
+        repair: bool = True,
+        verify_per_device: int = 1,
+        repair_workers: int = 1,
+        report_path: Optional[str] = None,
+        popen: Callable = subprocess.Popen
+) -> List[Par2Result]:
+    """
+    Verifies (and repairs) par2 sets with a Par2Runner and logs a summary.
+
+    Args:
+        par2_files (iterable): The .par2 files.
+        repair (bool): Repair damaged sets.
+        verify_per_device (int): Sets verified at once on one device.
+        repair_workers (int): Repairs run at once.
+        report_path (str, optional): Where to write the JSON report.
+        popen (callable): Replacement for subprocess.Popen.
+
+    Returns:
+        list: A Par2Result per set, in the order given.
+    """
+    runner = Par2Runner(verify_per_device, repair, repair_workers, popen=popen)
+    results = runner.run(par2_files)
+    summary = write_report(results, report_path) if report_path else summarize(results)
+    if len(results) > 1 or report_path:
+        statuses = ", ".join(f"{number} {status}" for status, number in sorted(summary["statuses"].items()))
+        events.info(f"Verified {summary['sets']} PAR2 sets: {statuses or 'none'}.")
+        if report_path:
+            events.info(f"PAR2 report written to '{report_path}'")
+    return results
@@ -0,0 +1,497 @@
+import os
+import json
+import math
+import struct
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from metrics import count, stage, ERRORS
+
+SUFFIX = ".rsp"                    # recovery file name: <first source file>.rsp
+MAGIC = b"FORSP\x001\n"
+TRAILER = struct.Struct("<Q8s")   # footer length, MAGIC
+GF_POLYNOMIAL = 0x11D              # x^8 + x^4 + x^3 + x^2 + 1
+MAX_SLICES_PER_GROUP = 256         # data + recovery slices of one GF(2^8) code
+DEFAULT_SLICE_COUNT = 2048         # data slices aimed for when no slice size is given
+COLUMN_SIZE = 256 * 1024           # bytes of every slice of a group processed at once
+
+
+# GF(2^8) arithmetic
+
+def _build_tables():
+    exp = [0] * 512
+    log = [0] * 256
+    value = 1
+    for power in range(255):
+        exp[power] = value
+        log[value] = power
+        value <<= 1
+        if value & 0x100:
+            value ^= GF_POLYNOMIAL
+    for power in range(255, 512):
+        exp[power] = exp[power - 255]
+    return exp, log
+
+
+EXP, LOG = _build_tables()
+
+
+def gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return EXP[LOG[a] + LOG[b]]
+
+
+def gf_inv(a: int) -> int:
+    if a == 0:
+        raise ZeroDivisionError("0 has no inverse in GF(2^8)")
+    return EXP[255 - LOG[a]]
+
+
+# MUL_TABLES[c] maps every byte x to c * x, for bytes.translate (or NumPy indexing).
+MUL_TABLES = [bytes(gf_mul(c, x) for x in range(256)) for c in range(256)]
+MUL_ARRAY = np.frombuffer(b"".join(MUL_TABLES), dtype=np.uint8).reshape(256, 256) if np is not None else None
+
+
+def gf_matrix_multiply(matrix: Sequence[Sequence[int]], blocks: Sequence[bytes], length: int) -> List[bytes]:
+    """
+    Multiplies a GF(2^8) matrix by a column of equally long blocks: row i of the
+    result is the XOR over j of matrix[i][j] * blocks[j], byte by byte.
+
+    With NumPy each block is multiplied by its whole column of coefficients in
+    one table lookup (take along the rows of MUL_ARRAY) and XORed into all the
+    results at once; without it each product is a bytes.translate and the sum an
+    XOR of big ints, which keeps both inner loops in C.
+    """
+    if not matrix:
+        return []
+    if np is not None:
+        coefficients = np.asarray(matrix, dtype=np.uint8)
+        data = np.frombuffer(b"".join(blocks), dtype=np.uint8).reshape(len(blocks), length)
+        results = np.zeros((len(matrix), length), dtype=np.uint8)
+        for column, block in enumerate(data):
+            results ^= MUL_ARRAY[coefficients[:, column]].take(block, axis=1)
+        return [row.tobytes() for row in results]
+
+    results = []
+    for row in matrix:
+        total = 0
+        for coefficient, block in zip(row, blocks):
+            if coefficient == 1:
+                total ^= int.from_bytes(block, "little")
+            elif coefficient:
+                total ^= int.from_bytes(block.translate(MUL_TABLES[coefficient]), "little")
+        results.append(total.to_bytes(length, "little"))
+    return results
+
+
+def gf_invert_matrix(matrix: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Inverts a square GF(2^8) matrix by Gauss-Jordan elimination."""
+    size = len(matrix)
+    rows = [list(row) + [int(column == index) for column in range(size)] for index, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next((row for row in range(column, size) if rows[row][column]), None)
+        if pivot is None:
+            raise ValueError("Matrix is singular")
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        scale = gf_inv(rows[column][column])
+        rows[column] = [gf_mul(scale, value) for value in rows[column]]
+        for row in range(size):
+            factor = rows[row][column]
+            if row != column and factor:
+                rows[row] = [value ^ gf_mul(factor, pivot_value) for value, pivot_value in zip(rows[row], rows[column])]
+    return [row[size:] for row in rows]
+
+
+def cauchy_matrix(rows: int, columns: int) -> List[List[int]]:
+    """
+    The rows x columns encoding matrix 1 / (x_i + y_j) with x_i = i and
+    y_j = rows + j. Every square submatrix of a Cauchy matrix is invertible, so any
+    damaged data slices can be rebuilt from as many intact recovery slices.
+    """
+    if rows + columns > MAX_SLICES_PER_GROUP:
+        raise ValueError(f"A group holds at most {MAX_SLICES_PER_GROUP} data and recovery slices")
+    return [[gf_inv(row ^ (rows + column)) for column in range(columns)] for row in range(rows)]
+
+
+# Layout
+
+def recovery_count(data_slices: int, redundancy_rate: float) -> int:
+    """Recovery slices for a group of data slices at a redundancy rate in percent."""
+    if redundancy_rate <= 0 or not data_slices:
+        return 0
+    return max(1, math.ceil(data_slices * redundancy_rate / 100))
+
+
+def choose_slice_size(total_size: int, slice_size_factor: int = 4096, slice_count: int = DEFAULT_SLICE_COUNT) -> int:
+    """A multiple of slice_size_factor (as par2j64 /sm) giving about slice_count slices."""
+    return max(slice_size_factor, math.ceil(total_size / slice_count / slice_size_factor) * slice_size_factor)
+
+
+def _slices(file_sizes: Sequence[int], slice_size: int):
+    """(file index, offset, length) of every data slice; slices do not span files."""
+    return [
+        (index, offset, min(slice_size, size - offset))
+        for index, size in enumerate(file_sizes)
+        for offset in range(0, size, slice_size)
+    ]
+
+
+def _group_count(slice_count: int, redundancy_rate: float) -> int:
+    largest = max(
+        size for size in range(1, MAX_SLICES_PER_GROUP)
+        if size + recovery_count(size, redundancy_rate) <= MAX_SLICES_PER_GROUP
+    )
+    return math.ceil(slice_count / largest) if slice_count else 0
+
+
+def _groups(slice_count: int, group_count: int) -> List[List[int]]:
+    # Interleaved, so damage to a run of consecutive slices (a bad disk region or a
+    # lost volume) is spread over every group instead of exhausting one.
+    return [list(range(group, slice_count, group_count)) for group in range(group_count)]
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+def _open_files(paths, mode="rb"):
+    handles = {}
+    for index, path in enumerate(paths):
+        try:
+            handles[index] = open(path, mode)
+        except FileNotFoundError:
+            handles[index] = None
+    return handles
+
+
+def _close_files(handles):
+    for handle in handles.values():
+        if handle is not None:
+            handle.close()
+
+
+def _read_block(handles, piece, start, length, digest=None) -> bytes:
+    """Bytes start:start + length of a data slice, zero padded past its end."""
+    file_index, offset, size = piece
+    block = b""
+    handle = handles[file_index]
+    if handle is not None and start < size:
+        handle.seek(offset + start)
+        block = handle.read(min(length, size - start))
+    if digest is not None:
+        digest.update(block)
+    return block.ljust(length, b"\0")
+
+
+def _read_recovery(handle, offset, length, digest=None) -> bytes:
+    handle.seek(offset)
+    block = handle.read(length)
+    if digest is not None:
+        digest.update(block)
+    return block.ljust(length, b"\0")
+
+
+class _Set:
+    """A recovery file's footer and the layout derived from it."""
+
+    def __init__(self, recovery_path: str, footer: dict):
+        directory = os.path.dirname(os.path.abspath(recovery_path))
+        self.recovery_path = recovery_path
+        self.slice_size = footer["slice_size"]
+        self.redundancy_rate = footer["redundancy_rate"]
+        self.files = footer["files"]
+        self.paths = [os.path.join(directory, entry["name"]) for entry in self.files]
+        self.recovery_hashes = footer["recovery_hashes"]
+        self.slices = _slices([entry["size"] for entry in self.files], self.slice_size)
+        self.slice_hashes = [digest for entry in self.files for digest in entry["hashes"]]
+        self.groups = _groups(len(self.slices), len(self.recovery_hashes))
+
+    def recovery_offsets(self) -> List[int]:
+        """File offset of the first recovery slice of every group."""
+        offsets = []
+        position = len(MAGIC)
+        for hashes in self.recovery_hashes:
+            offsets.append(position)
+            position += len(hashes) * self.slice_size
+        return offsets
+
+
+def read_footer(recovery_path: str) -> dict:
+    with open(recovery_path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a recovery file: {recovery_path}")
+        f.seek(-TRAILER.size, os.SEEK_END)
+        footer_size, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Recovery file is truncated or damaged: {recovery_path}")
+        f.seek(-TRAILER.size - footer_size, os.SEEK_END)
+        return json.loads(f.read(footer_size))
+
+
+def _map(function, jobs, workers):
+    if workers <= 1 or len(jobs) <= 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        return list(executor.map(function, jobs))
+
+
+# Workers, one group per job
+
+def _encode_group(job):
+    paths, pieces, slice_size, recovery_path, recovery_offset, recovery_slices = job
+    matrix = cauchy_matrix(recovery_slices, len(pieces))
+    data_digests = [_new_hash() for _ in pieces]
+    recovery_digests = [_new_hash() for _ in range(recovery_slices)]
+    handles = _open_files(paths)
+    try:
+        with open(recovery_path, "r+b") as out:
+            for start in range(0, slice_size, COLUMN_SIZE):
+                length = min(COLUMN_SIZE, slice_size - start)
+                blocks = [_read_block(handles, piece, start, length, digest) for piece, digest in zip(pieces, data_digests)]
+                for row, (block, digest) in enumerate(zip(gf_matrix_multiply(matrix, blocks, length), recovery_digests)):
+                    digest.update(block)
+                    out.seek(recovery_offset + row * slice_size + start)
+                    out.write(block)
+    finally:
+        _close_files(handles)
+    return [digest.hexdigest() for digest in data_digests], [digest.hexdigest() for digest in recovery_digests]
+
+
+def _verify_group(job):
+    paths, pieces, hashes, slice_size, recovery_path, recovery_offset, recovery_hashes = job
+    handles = _open_files(paths)
+    try:
+        damaged = []
+        for position, (piece, expected) in enumerate(zip(pieces, hashes)):
+            digest = _new_hash()
+            for start in range(0, piece[2], COLUMN_SIZE):
+                _read_block(handles, piece, start, min(COLUMN_SIZE, piece[2] - start), digest)
+            if digest.hexdigest() != expected:
+                damaged.append(position)
+    finally:
+        _close_files(handles)
+
+    damaged_recovery = []
+    with open(recovery_path, "rb") as f:
+        for row, expected in enumerate(recovery_hashes):
+            digest = _new_hash()
+            for start in range(0, slice_size, COLUMN_SIZE):
+                _read_recovery(f, recovery_offset + row * slice_size + start, min(COLUMN_SIZE, slice_size - start), digest)
+            if digest.hexdigest() != expected:
+                damaged_recovery.append(row)
+    return damaged, damaged_recovery
+
+
+def _repair_group(job):
+    paths, pieces, damaged, intact_rows, slice_size, recovery_path, recovery_offset, recovery_slices = job
+    matrix = cauchy_matrix(recovery_slices, len(pieces))
+    rows = intact_rows[:len(damaged)]
+    inverse = gf_invert_matrix([[matrix[row][position] for position in damaged] for row in rows])
+    known = [position for position in range(len(pieces)) if position not in set(damaged)]
+    # Each used recovery slice minus the known data slices' share leaves the damaged slices' share.
+    syndrome_matrix = [
+        [int(row == other) for other in rows] + [matrix[row][position] for position in known]
+        for row in rows
+    ]
+    handles = _open_files(paths, "r+b")
+    try:
+        with open(recovery_path, "rb") as recovery:
+            for start in range(0, slice_size, COLUMN_SIZE):
+                length = min(COLUMN_SIZE, slice_size - start)
+                blocks = [_read_recovery(recovery, recovery_offset + row * slice_size + start, length) for row in rows]
+                blocks += [_read_block(handles, pieces[position], start, length) for position in known]
+                syndromes = gf_matrix_multiply(syndrome_matrix, blocks, length)
+                for position, block in zip(damaged, gf_matrix_multiply(inverse, syndromes, length)):
+                    file_index, offset, size = pieces[position]
+                    if start < size:
+                        handles[file_index].seek(offset + start)
+                        handles[file_index].write(block[:size - start])
+    finally:
+        _close_files(handles)
+    return True
+
+
+# Public API
+
+class VerifyResult(NamedTuple):
+    damaged_slices: int       # data slices missing or not matching their hash
+    damaged_recovery: int     # recovery slices not matching their hash
+    unrepairable_groups: int  # groups with more damaged data slices than intact recovery slices
+    resized_files: List[str]  # files whose size differs from the recorded one
+    damage: Dict[int, tuple]  # group -> (damaged data positions, damaged recovery rows)
+
+    @property
+    def complete(self) -> bool:
+        return not self.damaged_slices and not self.resized_files
+
+    @property
+    def repairable(self) -> bool:
+        return not self.unrepairable_groups
+
+
+def create_recovery(
+        src_files,
+        output_path: Optional[str] = None,
+        redundancy_rate: float = 10,
+        slice_size_factor: int = 4096,
+        slice_size: Optional[int] = None,
+        workers: Optional[int] = None
+) -> str:
+    """
+    Creates Reed-Solomon recovery data for a set of files, without par2j64.
+
+    The files are cut into slices (a multiple of slice_size_factor bytes, like
+    par2j64 /sm) that never span two files. Slices are dealt round-robin into
+    groups of at most 256 data and recovery slices, the limit of a GF(2^8) code,
+    and every group gets redundancy_rate percent recovery slices (like /rr); a
+    group survives as many damaged slices as it has recovery slices. Groups are
+    encoded in parallel by a process pool.
+
+    The recovery file holds the recovery slices, then a JSON footer with the file
+    names (relative to it), sizes and slice hashes and the recovery slice hashes.
+
+    Args:
+        src_files (iterable): The files to protect, in one folder tree.
+        output_path (str, optional): The recovery file. Defaults to the first source file (sorted) + SUFFIX.
+        redundancy_rate (float): Recovery data as a percentage of the source data.
+        slice_size_factor (int): Slice sizes are a multiple of this.
+        slice_size (int, optional): Explicit slice size; chosen from the total size by default.
+        workers (int, optional): Processes encoding groups. Defaults to os.cpu_count().
+
+    Returns:
+        str: The path of the recovery file.
+    """
+    paths = sorted({os.path.abspath(file) for file in src_files})
+    if not paths:
+        raise ValueError("No files to protect")
+    output_path = output_path or paths[0] + SUFFIX
+    if os.path.exists(output_path):
+        raise FileExistsError(f"Output file already exists: {output_path}")
+
+    sizes = [os.path.getsize(path) for path in paths]
+    slice_size = slice_size or choose_slice_size(sum(sizes), slice_size_factor)
+    if slice_size % slice_size_factor:
+        raise ValueError(f"Slice size {slice_size} is not a multiple of {slice_size_factor}")
+    slices = _slices(sizes, slice_size)
+    groups = _groups(len(slices), _group_count(len(slices), redundancy_rate))
+    recovery_slices = [recovery_count(len(group), redundancy_rate) for group in groups]
+
+    jobs = []
+    position = len(MAGIC)
+    for group, rows in zip(groups, recovery_slices):
+        jobs.append((paths, [slices[index] for index in group], slice_size, output_path, position, rows))
+        position += rows * slice_size
+
+    with open(output_path, "xb") as f:
+        f.write(MAGIC)
+        f.truncate(position)
+    try:
+        with stage("parity_create"):
+            encoded = _map(_encode_group, jobs, workers or os.cpu_count() or 1)
+        slice_hashes = [None] * len(slices)
+        for group, (data_hashes, _) in zip(groups, encoded):
+            for index, digest in zip(group, data_hashes):
+                slice_hashes[index] = digest
+
+        directory = os.path.dirname(os.path.abspath(output_path))
+        files = []
+        for index, (path, size) in enumerate(zip(paths, sizes)):
+            files.append({
+                "name": os.path.relpath(path, directory),
+                "size": size,
+                "hashes": [slice_hashes[number] for number, piece in enumerate(slices) if piece[0] == index],
+            })
+        footer = json.dumps({
+            "version": 1,
+            "slice_size": slice_size,
+            "redundancy_rate": redundancy_rate,
+            "files": files,
+            "recovery_hashes": [recovery_hashes for _, recovery_hashes in encoded],
+        }).encode("utf-8")
+        with open(output_path, "ab") as f:
+            f.write(footer)
+            f.write(TRAILER.pack(len(footer), MAGIC))
+    except BaseException:
+        os.remove(output_path)
+        raise
+    return output_path
+
+
+def verify_recovery(recovery_path: str, workers: Optional[int] = None) -> VerifyResult:
+    """
+    Checks every data and recovery slice of a set against its hash, group by group
+    in a process pool.
+    """
+    recovery_set = _Set(recovery_path, read_footer(recovery_path))
+    resized = [
+        path for path, entry in zip(recovery_set.paths, recovery_set.files)
+        if not os.path.exists(path) or os.path.getsize(path) != entry["size"]
+    ]
+    jobs = [
+        (recovery_set.paths, [recovery_set.slices[index] for index in group], [recovery_set.slice_hashes[index] for index in group],
+         recovery_set.slice_size, recovery_path, offset, hashes)
+        for group, offset, hashes in zip(recovery_set.groups, recovery_set.recovery_offsets(), recovery_set.recovery_hashes)
+    ]
+    with stage("parity_verify"):
+        checked = _map(_verify_group, jobs, workers or os.cpu_count() or 1)
+
+    damage = {group: (damaged, damaged_recovery) for group, (damaged, damaged_recovery) in enumerate(checked) if damaged or damaged_recovery}
+    return VerifyResult(
+        damaged_slices=sum(len(damaged) for damaged, _ in checked),
+        damaged_recovery=sum(len(damaged_recovery) for _, damaged_recovery in checked),
+        unrepairable_groups=sum(
+            len(damaged) > len(hashes) - len(damaged_recovery)
+            for (damaged, damaged_recovery), hashes in zip(checked, recovery_set.recovery_hashes)
+        ),
+        resized_files=resized,
+        damage=damage,
+    )
+
+
+def repair_recovery(recovery_path: str, workers: Optional[int] = None, verified: Optional[VerifyResult] = None) -> bool:
+    """
+    Rebuilds damaged or missing files of a set and verifies them again.
+
+    Args:
+        recovery_path (str): The recovery file.
+        workers (int, optional): Processes repairing groups. Defaults to os.cpu_count().
+        verified (VerifyResult, optional): A fresh verify_recovery result, to skip verifying first.
+
+    Returns:
+        bool: True if every file verifies after the repair.
+    """
+    workers = workers or os.cpu_count() or 1
+    verified = verified or verify_recovery(recovery_path, workers)
+    if verified.complete:
+        return True
+    if not verified.repairable:
+        count(ERRORS)
+        return False
+
+    recovery_set = _Set(recovery_path, read_footer(recovery_path))
+    for path, entry in zip(recovery_set.paths, recovery_set.files):
+        if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as f: # missing files are recreated, wrong sizes corrected; their slices are damaged anyway
+                f.truncate(entry["size"])
+
+    offsets = recovery_set.recovery_offsets()
+    jobs = []
+    for group, (damaged, damaged_recovery) in verified.damage.items():
+        if not damaged:
+            continue
+        intact_rows = [row for row in range(len(recovery_set.recovery_hashes[group])) if row not in set(damaged_recovery)]
+        jobs.append((
+            recovery_set.paths, [recovery_set.slices[index] for index in recovery_set.groups[group]], damaged, intact_rows,
+            recovery_set.slice_size, recovery_path, offsets[group], len(recovery_set.recovery_hashes[group]),
+        ))
+    with stage("parity_repair"):
+        _map(_repair_group, jobs, workers)
+    return verify_recovery(recovery_path, workers).complete
@@ -0,0 +1,272 @@
+import time
+import asyncio
+import concurrent.futures
+from typing import Any, Callable, Iterable, List
+
+from move_planner import MovePlan, MoveOperation, execute_plan
+import events
+
+_DONE = object() # end-of-stream marker, one per downstream worker
+SOURCE_POLL_SECONDS = 0.1 # how often a threaded source blocked on a full queue checks for a stop
+
+
+class Stage:
+    """
+    One step of a pipeline: a function applied to every item from the previous stage.
+
+    The function returns the item to pass on, or None to drop it. It may be a plain
+    function, run on the event loop (for cheap steps such as planning), a plain
+    function run in a thread (in_executor=True, for blocking I/O such as reading
+    metadata), or a coroutine function.
+
+    With batch_size above 1, func is called with a list of the items already waiting
+    in the queue (up to batch_size of them) and returns a list of results instead.
+    Batches are never held back to fill up, so an idle pipeline still passes single
+    items through at once.
+
+    Args:
+        name (str): Name used in the stats.
+        func (callable): The function applied to each item.
+        concurrency (int): Number of items processed at the same time.
+        queue_size (int): Capacity of the queue feeding this stage. A full queue
+                          blocks the previous stage, which bounds memory use.
+        in_executor (bool): Run func in a worker thread instead of on the event loop.
+        batch_size (int): Largest number of items passed to func in one call.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], concurrency: int = 1, queue_size: int = 64, in_executor: bool = False, batch_size: int = 1):
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1: got {concurrency}")
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1: got {batch_size}")
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.in_executor = in_executor
+        self.batch_size = batch_size
+
+
+class StageStats:
+    """Counters and timings of one stage, filled in while the pipeline runs."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0 # summed over concurrent workers
+        self.started = None
+        self.finished = None
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Items per second between the first item arriving and the last one finishing."""
+        wall = self.wall_seconds
+        return self.items_in / wall if wall > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 6),
+            "wall_seconds": round(self.wall_seconds, 6),
+            "items_per_second": round(self.throughput, 3),
+        }
+
+    def __str__(self):
+        return (f"{self.name}: {self.items_in} in, {self.items_out} out, {self.errors} errors, "
+                f"{self.throughput:.1f} items/s")
+
+
+class Pipeline:
+    """
+    Runs items from a source through stages connected by bounded asyncio queues.
+
+    Every stage runs as its own set of workers, so while one file's metadata is being
+    read, earlier files are already being planned and moved. Bounded queues give
+    backpressure: a slow stage fills its input queue and stalls the stages before it
+    instead of letting work pile up in memory.
+
+    Args:
+        stages (list of Stage): The stages, in order. The output of the last stage is discarded.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self.stages = stages
+        self.source_stats = StageStats("source")
+        self.stats = [StageStats(stage.name) for stage in stages]
+
+    async def run(self, source: Iterable, threaded_source: bool = True) -> List[StageStats]:
+        """
+        Feeds every item of source through the stages and waits for them to finish.
+
+        Args:
+            source (iterable): The items to process, e.g. a generator walking a folder.
+            threaded_source (bool): Iterate the source in a worker thread, for sources
+                                    that block on disk. Use False for in-memory sources.
+
+        Returns:
+            list: StageStats for the source followed by one per stage.
+        """
+        loop = asyncio.get_running_loop()
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        remaining_workers = [stage.concurrency for stage in self.stages]
+        stopped = False
+
+        async def finish_stage(position):
+            remaining_workers[position] -= 1
+            if remaining_workers[position] == 0:
+                self.stats[position].finished = time.perf_counter()
+                if position + 1 < len(self.stages):
+                    for _ in range(self.stages[position + 1].concurrency):
+                        await queues[position + 1].put(_DONE)
+
+        async def worker(position):
+            stage = self.stages[position]
+            stats = self.stats[position]
+            while True:
+                item = await queues[position].get()
+                if item is _DONE:
+                    await finish_stage(position)
+                    return
+
+                # Take whatever else is already waiting, up to the batch size.
+                batch = [item]
+                ended = False
+                while len(batch) < stage.batch_size and not queues[position].empty():
+                    item = queues[position].get_nowait()
+                    if item is _DONE:
+                        ended = True
+                        break
+                    batch.append(item)
+                arg = batch if stage.batch_size > 1 else batch[0]
+
+                if stats.started is None:
+                    stats.started = time.perf_counter()
+                stats.items_in += len(batch)
+                began = time.perf_counter()
+                try:
+                    if asyncio.iscoroutinefunction(stage.func):
+                        result = await stage.func(arg)
+                    elif stage.in_executor:
+                        result = await loop.run_in_executor(None, stage.func, arg)
+                    else:
+                        result = stage.func(arg)
+                except Exception as e:
+                    stats.errors += len(batch)
+                    subject = f"{len(batch)} items" if stage.batch_size > 1 else repr(arg)
+                    events.error(f"Error in stage '{stage.name}' for {subject}: {e}", stage=stage.name)
+                    result = None
+                stats.busy_seconds += time.perf_counter() - began
+
+                results = (result or []) if stage.batch_size > 1 else [result]
+                for result in results:
+                    if result is None:
+                        continue
+                    stats.items_out += 1
+                    if position + 1 < len(self.stages):
+                        await queues[position + 1].put(result)
+
+                if ended:
+                    await finish_stage(position)
+                    return
+
+        def produce_in_thread():
+            for item in source:
+                # Blocks this thread, not the event loop, while the first queue is full.
+                # The wait is checked against stopped, so a failed pipeline never leaves it hanging.
+                put = asyncio.run_coroutine_threadsafe(queues[0].put(item), loop)
+                while True:
+                    if stopped:
+                        put.cancel()
+                        return
+                    try:
+                        put.result(timeout=SOURCE_POLL_SECONDS)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        continue
+                    except concurrent.futures.CancelledError:
+                        return
+                self.source_stats.items_out += 1
+
+        async def produce():
+            self.source_stats.started = time.perf_counter()
+            if threaded_source:
+                await loop.run_in_executor(None, produce_in_thread)
+            else:
+                for item in source:
+                    await queues[0].put(item)
+                    self.source_stats.items_out += 1
+            self.source_stats.items_in = self.source_stats.items_out
+            self.source_stats.finished = time.perf_counter()
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+        tasks = [asyncio.ensure_future(produce())]
+        for position, stage in enumerate(self.stages):
+            tasks.extend(asyncio.ensure_future(worker(position)) for _ in range(stage.concurrency))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            stopped = True
+            for task in tasks:
+                task.cancel()
+            # Unblock a source thread waiting on a full queue.
+            while not queues[0].empty():
+                queues[0].get_nowait()
+
+        return [self.source_stats] + self.stats
+
+
+def run_pipeline(source: Iterable, stages: List[Stage], threaded_source: bool = True) -> List[StageStats]:
+    """Runs a Pipeline to completion from synchronous code. See Pipeline.run."""
+    return asyncio.run(Pipeline(stages).run(source, threaded_source))
+
+
+class _MoveLog:
+    """Takes the place of the ScanIndex in execute_plan on a worker thread and keeps the moves for later."""
+
+    def __init__(self):
+        self.moves = []
+
+    def record_move(self, src: str, final: str) -> str:
+        self.moves.append((src, final))
+        return final
+
+
+def move_stage(index=None, concurrency: int = 2, queue_size: int = 64, on_conflict: str = 'skip', batch_size: int = 64) -> Stage:
+    """
+    A final stage that executes the planned MoveOperations in batches with execute_plan.
+
+    Each batch holds the operations waiting in the queue, so under load the moves
+    get execute_plan's target-directory ordering and cross-device copy pool. The
+    batches run in worker threads; the shared ScanIndex, if any, is updated on the
+    event loop afterwards so it is never modified from two threads at once.
+    on_conflict handles targets that appeared since planning, as in MovePlan.
+    """
+    async def move(operations: List[MoveOperation]):
+        batch = MovePlan(on_conflict)
+        for operation in operations:
+            batch.add_operation(operation)
+        log = _MoveLog()
+        await asyncio.get_running_loop().run_in_executor(None, execute_plan, batch, log)
+
+        finals = dict(log.moves)
+        if index is not None:
+            for source, final in log.moves:
+                index.record_move(source, final)
+        return [operation._replace(destination=finals[operation.source])
+                for operation in operations if operation.source in finals]
+
+    return Stage("move", move, concurrency=concurrency, queue_size=queue_size, batch_size=batch_size)
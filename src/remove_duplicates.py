@@ -1,38 +1,97 @@
 import os
 import shutil
-from typing import Set, List
-from hash import calculate_md5 as get_md5
-from size_of_directory import get_file_size as get_file_size
-from find_files_by_name import find_files_by_name as find_files
+from typing import Dict, Set, List, Optional
+from hash import hash_files as hash_files
+from hash import calculate_partial_md5 as get_partial_md5
+from find_files_by_name import iter_files_by_name
+from string_content_check import NameMatcher
+from metrics import count, timed, FILES_MOVED
+import events
 
+PARTIAL_HASH_SAMPLE_SIZE = 16384 # bytes read from each end of a file
 
-def find_duplicates(path: str, file_types_allowed: List[str]) -> Set[str]:
-    if not os.path.isdir(path):
-        return NotADirectoryError(f"Path is not a directory: {path}")
 
-    files = set()
-    for file_type in file_types_allowed:
-        if not file_type.startswith('.'):
-            file_type = '.' + file_type
-
-        files.update(find_files(path, ends_with=file_type, search_subdir=True))
-    
-    file_hosts = {} # key: MD5, value: size
-    duplicate_files = set()
-    
+def _group_by(files, key_func) -> Dict[object, List[str]]:
+    """
+    Buckets files by key_func(file) and keeps only the buckets with more than one file.
+    Files for which key_func returns None are dropped.
+    """
+    buckets: Dict[object, List[str]] = {}
     for file in files:
-        size = get_file_size(file)
-        if not size:
+        key = key_func(file)
+        if key is None:
             continue
+        buckets.setdefault(key, []).append(file)
+    return {key: bucket for key, bucket in buckets.items() if len(bucket) > 1}
+
 
-        file_hash = get_md5(file)
+@timed("find_duplicates")
+def find_duplicate_groups(path: str, file_types_allowed: List[str], cache=None, max_workers: Optional[int] = None) -> List[List[str]]:
+    """
+    Finds groups of files with identical content.
+
+    Files are compared in tiers so most of them are never read: first by size
+    (unique sizes are dropped without opening the file), then by a hash of a
+    small sample from the start and end of the file, and only files that still
+    collide are fully hashed.
+
+    Args:
+        path (str): The directory to search (including subdirectories).
+        file_types_allowed (list): File extensions to consider (e.g. ['.jpg', '.mov']).
+        cache (MetadataCache, optional): Persistent cache for the full hashes.
+        max_workers (int, optional): Number of threads used for full hashing.
+
+    Returns:
+        list: Groups of duplicate file paths, each sorted, with at least two files per group.
+    """
+    extensions = [file_type if file_type.startswith('.') else '.' + file_type for file_type in file_types_allowed]
+    if not extensions:
+        return []
 
-        if size not in file_hosts.values():
-            file_hosts[file_hash] = size
-        else:
-            if file_hosts.get(file_hash) == size:
-                duplicate_files.add(file)         
-           
+    # One walk for every extension; the sizes come from the walk's own stat.
+    file_sizes = {}
+    for _, file, stat_result in iter_files_by_name(path, {'allowed': NameMatcher(extensions=extensions)}, search_subdir=True):
+        file_sizes[file] = stat_result.st_size
+
+    def get_size(file):
+        return file_sizes[file] or None # empty files are not considered duplicates
+
+    def get_sample_hash(file):
+        return get_partial_md5(file, PARTIAL_HASH_SAMPLE_SIZE)
+
+    duplicate_groups = []
+    sizes = {} # files that still collide after sampling, with their sizes
+    for size, size_group in _group_by(file_sizes, get_size).items():
+        for sample_group in _group_by(size_group, get_sample_hash).values():
+            if size <= 2 * PARTIAL_HASH_SAMPLE_SIZE:
+                # The sample already covered the whole file.
+                duplicate_groups.append(sorted(sample_group))
+            else:
+                sizes.update((file, size) for file in sample_group)
+
+    # The remaining candidates are hashed in parallel; size is kept in the key so
+    # files from different size buckets can never be grouped together.
+    full_hashes = {}
+    for file, digests in hash_files(sizes, max_workers=max_workers, cache=cache):
+        if digests:
+            full_hashes[file] = (sizes[file], digests['md5'])
+
+    for hash_group in _group_by(sizes, full_hashes.get).values():
+        duplicate_groups.append(sorted(hash_group))
+
+    return sorted(duplicate_groups)
+
+
+def find_duplicates(path: str, file_types_allowed: List[str], cache=None, max_workers: Optional[int] = None) -> Set[str]:
+    """
+    Finds duplicate files, keeping the first path of each duplicate group as the original.
+
+    Returns:
+        set: The paths of every file that duplicates another one.
+    """
+    duplicate_files = set()
+    for group in find_duplicate_groups(path, file_types_allowed, cache, max_workers):
+        duplicate_files.update(group[1:])
     return duplicate_files
 
 def move_to_duplicates(file: str, dir_path: str) -> None:
@@ -48,13 +107,14 @@ def move_to_duplicates(file: str, dir_path: str) -> None:
     try:
         os.makedirs(duplicates_dir, exist_ok=True)  # Create directory if it doesn't exist
         shutil.move(file, duplicates_dir)
-        print(f"Moved '{file}' to '{duplicates_dir}'")
+        count(FILES_MOVED)
+        events.moved(file, duplicates_dir)
     except FileNotFoundError:
-        print(f"Error: File '{file}' not found.")
+        events.error(f"Error: File '{file}' not found.", path=file)
     except OSError as e:
-        print(f"Error moving '{file}': {e}")
+        events.error(f"Error moving '{file}': {e}", path=file)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        events.error(f"An unexpected error occurred: {e}", path=file)
 
 def main():
     dir_path = input("Path: ")
@@ -0,0 +1,329 @@
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from metrics import count, DIRECTORIES_LISTED
+
+
+class ScanIndex:
+    """
+    In-memory index of one or more directory trees, built with a single walk.
+
+    The index is keyed by directory, by lowercase extension and by lowercase
+    basename. Stages read the tree from the index instead of calling os.walk
+    again, and route their moves through it so the index stays current.
+    File sizes are stat'ed once, when a stage first asks for them, and kept.
+
+    Args:
+        roots (str or iterable of str): The directories to index.
+        cache (MetadataCache, optional): Metadata cache whose stored paths are
+                                         updated in place when files are moved.
+        walk (callable, optional): Replacement for os.walk used to build the index,
+                                   e.g. parallel_walk for network mounts.
+    """
+
+    def __init__(self, roots: Union[str, Iterable[str]], cache=None, walk=None):
+        if isinstance(roots, str):
+            roots = [roots]
+
+        self.cache = cache
+        self._walk_tree = walk or os.walk
+        self.roots = [os.path.normpath(os.path.abspath(root)) for root in roots]
+        self._dirs: Dict[str, Set[str]] = {}   # key: dir path, value: subdir names
+        self._files: Dict[str, Set[str]] = {}  # key: dir path, value: file names
+        self._by_ext: Dict[str, Set[str]] = {}
+        self._by_name: Dict[str, Set[str]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._moved_dirs: Set[str] = set() # folders moved out of or into, see take_moved_dirs
+
+        for root in self.roots:
+            if os.path.isdir(root) and root not in self._dirs:
+                self._scan(root)
+
+    def _scan(self, top: str):
+        for dirpath, dirnames, filenames in self._walk_tree(top):
+            count(DIRECTORIES_LISTED)
+            self._dirs[dirpath] = set(dirnames)
+            self._files[dirpath] = set()
+            for filename in filenames:
+                self._add_file(dirpath, filename)
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    def _is_indexed(self, path: str) -> bool:
+        for root in self.roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return True
+        return False
+
+    def _add_file(self, dirpath: str, filename: str):
+        path = os.path.join(dirpath, filename)
+        self._files[dirpath].add(filename)
+        self._by_ext.setdefault(os.path.splitext(filename)[1].lower(), set()).add(path)
+        self._by_name.setdefault(filename.lower(), set()).add(path)
+
+    def _discard_file(self, dirpath: str, filename: str):
+        path = os.path.join(dirpath, filename)
+        self._files.get(dirpath, set()).discard(filename)
+        self._by_ext.get(os.path.splitext(filename)[1].lower(), set()).discard(path)
+        self._by_name.get(filename.lower(), set()).discard(path)
+        self._sizes.pop(path, None)
+
+    def _ensure_dir(self, path: str):
+        """Registers a directory and any missing parents up to an indexed root."""
+        if path in self._dirs or not self._is_indexed(path):
+            return
+        parent, name = os.path.split(path)
+        if path not in self.roots:
+            self._ensure_dir(parent)
+            if parent in self._dirs:
+                self._dirs[parent].add(name)
+        self._dirs[path] = set()
+        self._files[path] = set()
+
+    def _discard_dir(self, path: str):
+        """Drops a directory and everything below it from the index."""
+        if path not in self._dirs:
+            return
+        for name in list(self._dirs[path]):
+            self._discard_dir(os.path.join(path, name))
+        for filename in list(self._files[path]):
+            self._discard_file(path, filename)
+        del self._dirs[path]
+        del self._files[path]
+
+        parent, name = os.path.split(path)
+        if parent in self._dirs:
+            self._dirs[parent].discard(name)
+
+    def _relocate_dir(self, src: str, dst: str):
+        """Re-keys a directory subtree after it was moved on disk."""
+        subdirs = self._dirs.pop(src)
+        filenames = list(self._files[src])
+        for filename in filenames:
+            self._discard_file(src, filename)
+        del self._files[src]
+
+        self._dirs[dst] = set(subdirs)
+        self._files[dst] = set()
+        for filename in filenames:
+            self._add_file(dst, filename)
+        for name in subdirs:
+            self._relocate_dir(os.path.join(src, name), os.path.join(dst, name))
+
+    # Queries
+
+    def isdir(self, path: str) -> bool:
+        return self._normalize(path) in self._dirs
+
+    def isfile(self, path: str) -> bool:
+        dirpath, filename = os.path.split(self._normalize(path))
+        return filename in self._files.get(dirpath, ())
+
+    def exists(self, path: str) -> bool:
+        return self.isdir(path) or self.isfile(path)
+
+    def size(self, path: str) -> int:
+        """
+        The size of a file in bytes, like os.path.getsize, stat'ed only the first time.
+
+        Raises:
+            OSError: If the file cannot be stat'ed.
+        """
+        path = self._normalize(path)
+        size = self._sizes.get(path)
+        if size is None:
+            size = os.path.getsize(path)
+            if self.isfile(path):
+                self._sizes[path] = size
+        return size
+
+    def listdir(self, path: str) -> List[str]:
+        """
+        Lists the entries of an indexed directory, like os.listdir.
+
+        Raises:
+            FileNotFoundError: If the directory is not in the index.
+        """
+        path = self._normalize(path)
+        if path not in self._dirs:
+            raise FileNotFoundError(f"Directory is not indexed: {path}")
+        return sorted(self._dirs[path]) + sorted(self._files[path])
+
+    def walk(self, top: str, topdown: bool = True):
+        """
+        Yields (dirpath, dirnames, filenames) from the index, like os.walk.
+
+        The yielded lists are snapshots, so callers may move or delete entries
+        while iterating. With topdown=True, pruning dirnames skips those subtrees.
+        """
+        top = self._normalize(top)
+        if top not in self._dirs:
+            return
+
+        dirnames = sorted(self._dirs[top])
+        filenames = sorted(self._files[top])
+
+        if topdown:
+            yield top, dirnames, filenames
+
+        for name in dirnames:
+            yield from self.walk(os.path.join(top, name), topdown)
+
+        if not topdown:
+            # Re-read after children were visited so removals are reflected.
+            if top in self._dirs:
+                yield top, sorted(self._dirs[top]), sorted(self._files[top])
+
+    def find(self, extensions: Optional[Iterable[str]] = None, name: Optional[str] = None, under: Optional[str] = None) -> Set[str]:
+        """
+        Looks up files by extension and/or basename without walking.
+
+        Args:
+            extensions (iterable of str, optional): Extensions to match (e.g. ['.jpg']), case-insensitive.
+            name (str, optional): Exact basename to match, case-insensitive.
+            under (str, optional): Only return files below this directory.
+
+        Returns:
+            set: Full paths of the matching files.
+        """
+        results = None
+        if extensions is not None:
+            results = set()
+            for ext in extensions:
+                ext = ext.lower() if ext.startswith('.') else '.' + ext.lower()
+                results |= self._by_ext.get(ext, set())
+        if name is not None:
+            by_name = self._by_name.get(name.lower(), set())
+            results = set(by_name) if results is None else results & by_name
+        if results is None:
+            results = {os.path.join(d, f) for d, names in self._files.items() for f in names}
+
+        if under is not None:
+            prefix = self._normalize(under).rstrip(os.sep) + os.sep
+            results = {path for path in results if path.startswith(prefix)}
+        return results
+
+    # Mutations
+
+    def add_root(self, root: str, scan: bool = True):
+        """
+        Adds a directory tree to the index. With scan=False only the directory itself
+        is registered, e.g. a watched folder whose files are added as they arrive.
+        """
+        root = self._normalize(root)
+        if root not in self.roots:
+            self.roots.append(root)
+        if scan and os.path.isdir(root):
+            self._scan(root)
+        else:
+            self._ensure_dir(root)
+
+    def add_file(self, path: str):
+        """Registers a file that appeared on disk, along with any missing parent directories."""
+        dirpath, filename = os.path.split(self._normalize(path))
+        if not self._is_indexed(dirpath):
+            return
+        self._ensure_dir(dirpath)
+        self._add_file(dirpath, filename)
+
+    def forget(self, path: str, keep: Iterable[str] = ()):
+        """
+        Drops a file, or a directory and everything below it, from the index without
+        touching the disk. Directories in keep that lie below path stay indexed with
+        their contents, e.g. a destination tree nested in a watched source folder.
+        """
+        path = self._normalize(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        keep = {self._normalize(kept) for kept in keep}
+        keep = {kept for kept in keep if kept.startswith(prefix)}
+        if path in self._dirs and keep:
+            self._discard_dir_except(path, keep)
+        elif path in self._dirs:
+            self._discard_dir(path)
+        else:
+            self._discard_file(*os.path.split(path))
+
+    def _discard_dir_except(self, path: str, keep: Set[str]):
+        """Drops what lies below path except the kept directories; path itself stays."""
+        for filename in list(self._files[path]):
+            self._discard_file(path, filename)
+        for name in list(self._dirs[path]):
+            child = os.path.join(path, name)
+            if child in keep:
+                continue
+            if any(kept.startswith(child + os.sep) for kept in keep):
+                self._discard_dir_except(child, keep)
+            else:
+                self._discard_dir(child)
+
+    def move(self, src: str, dst: str) -> str:
+        """
+        Moves a file or directory with shutil.move and updates the index.
+
+        Returns:
+            str: The final destination path, as returned by shutil.move.
+        """
+        src = self._normalize(src)
+        final = shutil.move(src, dst)
+        return self.record_move(src, final)
+
+    def record_move(self, src: str, final: str) -> str:
+        """
+        Updates the index (and its metadata cache) for a move that was already
+        performed on disk, e.g. by a batched executor.
+
+        Returns:
+            str: The normalized destination path.
+        """
+        src = self._normalize(src)
+        final = self._normalize(final)
+        if self.cache is not None:
+            self.cache.record_move(src, final)
+        self._moved_dirs.add(os.path.dirname(src))
+        self._moved_dirs.add(os.path.dirname(final))
+
+        if src in self._dirs:
+            if not self._is_indexed(final):
+                self._discard_dir(src)
+                return final
+            parent, name = os.path.split(src)
+            if parent in self._dirs:
+                self._dirs[parent].discard(name)
+            self._ensure_dir(os.path.dirname(final))
+            self._relocate_dir(src, final)
+            parent, name = os.path.split(final)
+            if parent in self._dirs:
+                self._dirs[parent].add(name)
+        else:
+            size = self._sizes.get(src)
+            self._discard_file(*os.path.split(src))
+            if self._is_indexed(final):
+                dirpath, filename = os.path.split(final)
+                self._ensure_dir(dirpath)
+                self._add_file(dirpath, filename)
+                if size is not None:
+                    self._sizes[final] = size
+        return final
+
+    def take_moved_dirs(self) -> Set[str]:
+        """
+        Returns the folders that moves recorded since the last call went out of or into,
+        and starts a new set, so a caller can limit follow-up work to those folders.
+        """
+        moved, self._moved_dirs = self._moved_dirs, set()
+        return moved
+
+    def remove(self, path: str):
+        """Deletes a file with os.remove and drops it from the index."""
+        path = self._normalize(path)
+        os.remove(path)
+        self._discard_file(*os.path.split(path))
+
+    def rmdir(self, path: str):
+        """Deletes an empty directory with os.rmdir and drops it from the index."""
+        path = self._normalize(path)
+        os.rmdir(path)
+        self._discard_dir(path)
@@ -0,0 +1,301 @@
+import os
+import stat
+import sqlite3
+import threading
+from typing import List, NamedTuple, Optional
+
+DEFAULT_SIZE_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "file-organizer", "directory_sizes.sqlite3")
+SCHEMA_VERSION = 1 # 1: hardlinked files are stored apart and counted once per subtree
+
+
+class DirectoryTotals(NamedTuple):
+    path: str
+    bytes: int
+    allocated: int
+    files: int
+    newest_mtime_ns: int # newest file modification time in the subtree, 0 if it has no files
+
+
+def _scan_own_files(path: str):
+    """
+    Lists one directory and sums the files directly inside it.
+
+    Returns:
+        tuple: (bytes, allocated, file count, newest mtime_ns, hardlinked files, subdirectory names).
+               Hardlinked files map (st_dev, st_ino) to (bytes, allocated) and are left out
+               of the sums so they can be counted once per subtree.
+    """
+    size = allocated = files = newest = 0
+    linked = {}
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                if not entry.is_file():
+                    continue
+                stat_result = entry.stat()
+            except OSError: # removed since the listing or a broken link
+                continue
+
+            blocks = getattr(stat_result, 'st_blocks', None) # not available on Windows
+            file_allocated = blocks * 512 if blocks is not None else stat_result.st_size
+            newest = max(newest, stat_result.st_mtime_ns)
+            if stat_result.st_nlink > 1:
+                linked[(stat_result.st_dev, stat_result.st_ino)] = (stat_result.st_size, file_allocated)
+                continue
+            size += stat_result.st_size
+            allocated += file_allocated
+            files += 1
+    return size, allocated, files, newest, linked, subdirs
+
+
+def _merge_linked(totals, linked, other):
+    """
+    Adds the subtree totals and hardlinked files of other into totals and linked,
+    taking back the files both already counted. Returns the merged linked dict.
+    """
+    size, allocated, files, newest, other_linked = other
+    totals[0] += size
+    totals[1] += allocated
+    totals[2] += files
+    totals[3] = max(totals[3], newest)
+    if len(other_linked) > len(linked):
+        linked, other_linked = other_linked, linked
+    for key, (file_size, file_allocated) in other_linked.items():
+        if key in linked:
+            totals[0] -= file_size
+            totals[1] -= file_allocated
+            totals[2] -= 1
+        else:
+            linked[key] = (file_size, file_allocated)
+    return linked
+
+
+class DirectorySizeIndex:
+    """
+    On-disk index of directory sizes, stored in SQLite and refreshed incrementally.
+
+    Each directory has a row with its own files (bytes, allocated bytes, count and
+    newest mtime) and the totals of its whole subtree. A refresh stats every indexed
+    directory but only re-lists those whose mtime changed, since adding, removing or
+    renaming an entry changes the mtime of its directory. Sizing an unchanged tree
+    therefore costs one stat per directory instead of a listing and a stat per file.
+
+    Changes that leave the directory mtime alone, such as a file rewritten in place,
+    are only picked up when that directory is re-listed. Files with several hard
+    links are counted once in each subtree, as measure_directory does; they are kept
+    per directory in a separate table so unchanged directories need no re-listing.
+
+    Args:
+        db_path (str): The path to the SQLite database file.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_SIZE_INDEX_PATH):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Older indexes counted hardlinks in the directory rows; rebuild them on next refresh.
+            self._conn.execute("DROP TABLE IF EXISTS directories")
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS directories (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER NOT NULL,
+                own_bytes INTEGER NOT NULL,
+                own_allocated INTEGER NOT NULL,
+                own_files INTEGER NOT NULL,
+                own_newest_ns INTEGER NOT NULL,
+                total_bytes INTEGER NOT NULL,
+                total_allocated INTEGER NOT NULL,
+                total_files INTEGER NOT NULL,
+                newest_ns INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS linked_files (
+                directory TEXT NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                allocated INTEGER NOT NULL,
+                PRIMARY KEY (directory, dev, ino)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS directories_total_bytes ON directories (total_bytes)")
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    @staticmethod
+    def _subtree_bounds(path: str):
+        # Range bound on the primary key: every path below path sorts in [prefix, prefix_end).
+        prefix = path.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def _forget(self, path: str):
+        """Drops a directory and everything below it."""
+        prefix, prefix_end = self._subtree_bounds(path)
+        self._conn.execute("DELETE FROM directories WHERE path=? OR (path >= ? AND path < ?)", (path, prefix, prefix_end))
+        self._conn.execute("DELETE FROM linked_files WHERE directory=? OR (directory >= ? AND directory < ?)", (path, prefix, prefix_end))
+
+    def _refresh_directory(self, path: str, mtime_ns: int):
+        """
+        Returns (own totals, hardlinked files, subdirectory paths) for one directory,
+        re-listing it only if its mtime differs from the stored one.
+        """
+        row = self._conn.execute(
+            "SELECT mtime_ns, own_bytes, own_allocated, own_files, own_newest_ns FROM directories WHERE path=?",
+            (path,),
+        ).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            subdirs = [child for (child,) in self._conn.execute("SELECT path FROM directories WHERE parent=?", (path,))]
+            linked = {
+                (dev, ino): (size, allocated)
+                for dev, ino, size, allocated in self._conn.execute(
+                    "SELECT dev, ino, bytes, allocated FROM linked_files WHERE directory=?", (path,)
+                )
+            }
+            return row[1:], linked, subdirs
+
+        size, allocated, files, newest, linked, names = _scan_own_files(path)
+        subdirs = [os.path.join(path, name) for name in names]
+        listed = set(subdirs)
+        for (child,) in self._conn.execute("SELECT path FROM directories WHERE parent=?", (path,)).fetchall():
+            if child not in listed:
+                self._forget(child)
+        self._conn.execute("DELETE FROM linked_files WHERE directory=?", (path,))
+        self._conn.executemany(
+            "INSERT INTO linked_files VALUES (?, ?, ?, ?, ?)",
+            ((path, dev, ino, file_size, file_allocated) for (dev, ino), (file_size, file_allocated) in linked.items()),
+        )
+        return (size, allocated, files, newest), dict(linked), subdirs
+
+    def refresh(self, folder_path: str) -> Optional[DirectoryTotals]:
+        """
+        Brings the index up to date for a folder and everything below it.
+
+        Returns:
+            DirectoryTotals: The folder's totals, or None if it is not a directory
+                             (any stored entries for it are dropped).
+        """
+        top = self._normalize(folder_path)
+        with self._lock:
+            try:
+                top_stat = os.stat(top)
+            except OSError:
+                top_stat = None
+            if top_stat is None or not os.path.isdir(top):
+                self._forget(top)
+                self._conn.commit()
+                return None
+
+            totals = {}
+            top_parent = os.path.dirname(top)
+            # Post-order without recursion: (path, parent, mtime_ns, expanded listing or None).
+            # totals holds finished subtrees with the hardlinked files counted in them.
+            stack = [(top, top_parent if top_parent != top else None, top_stat.st_mtime_ns, None)]
+            while stack:
+                path, parent, mtime_ns, expanded = stack.pop()
+                if expanded is None:
+                    try:
+                        own, linked, subdirs = self._refresh_directory(path, mtime_ns)
+                    except OSError: # unreadable or removed meanwhile
+                        self._forget(path)
+                        continue
+                    stack.append((path, parent, mtime_ns, (own, linked, subdirs)))
+                    for subdir in subdirs:
+                        try:
+                            stat_result = os.stat(subdir, follow_symlinks=False)
+                        except OSError:
+                            stat_result = None
+                        if stat_result is None or not stat.S_ISDIR(stat_result.st_mode):
+                            self._forget(subdir)
+                            continue
+                        stack.append((subdir, path, stat_result.st_mtime_ns, None))
+                    continue
+
+                own, linked, subdirs = expanded
+                subtree = list(own)
+                for file_size, file_allocated in linked.values():
+                    subtree[0] += file_size
+                    subtree[1] += file_allocated
+                    subtree[2] += 1
+                for subdir in subdirs:
+                    if subdir in totals:
+                        linked = _merge_linked(subtree, linked, totals.pop(subdir))
+                size, allocated, files, newest = subtree
+                totals[path] = (size, allocated, files, newest, linked)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, parent, mtime_ns) + tuple(own) + (size, allocated, files, newest),
+                )
+
+            self._conn.commit()
+            if top not in totals:
+                return None
+            return DirectoryTotals(top, *totals[top][:4])
+
+    def get(self, folder_path: str, refresh: bool = True) -> Optional[DirectoryTotals]:
+        """
+        Returns the totals of a folder. With refresh=False the stored totals are
+        returned as they are (None if the folder was never indexed).
+        """
+        if refresh:
+            return self.refresh(folder_path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, total_bytes, total_allocated, total_files, newest_ns FROM directories WHERE path=?",
+                (self._normalize(folder_path),),
+            ).fetchone()
+        return DirectoryTotals(*row) if row else None
+
+    def largest(self, n: int = 10, under: Optional[str] = None) -> List[DirectoryTotals]:
+        """
+        Returns the n largest indexed folders by total bytes, answered from the index
+        without touching the disk. Folders contain their subfolders' sizes, so a parent
+        always ranks at or above its children.
+
+        Args:
+            n (int): Number of folders to return.
+            under (str, optional): Only consider folders below this one (excluding itself).
+        """
+        query = "SELECT path, total_bytes, total_allocated, total_files, newest_ns FROM directories"
+        params = ()
+        if under is not None:
+            query += " WHERE path >= ? AND path < ?"
+            params = self._subtree_bounds(self._normalize(under))
+        query += " ORDER BY total_bytes DESC LIMIT ?"
+
+        with self._lock:
+            rows = self._conn.execute(query, params + (n,)).fetchall()
+        return [DirectoryTotals(*row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -1,5 +1,6 @@
 import os
-from typing import Union, Set, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import NamedTuple, Optional, Set, Tuple, Union
 
 from find_files_by_name import find_files_by_name as find_files
 
@@ -23,12 +24,116 @@ def get_file_size(file_path) -> int:
         return None
     
 
-def get_folder_size(folder_path):
+class DirectorySize(NamedTuple):
+    apparent: int  # sum of file sizes (st_size)
+    allocated: int # bytes allocated on disk (st_blocks), smaller for sparse files
+    files: int
+
+
+def _allocated_size(stat_result) -> int:
+    blocks = getattr(stat_result, 'st_blocks', None) # not available on Windows
+    return blocks * 512 if blocks is not None else stat_result.st_size
+
+
+def _scan_directory(path: str):
+    """
+    Lists one directory with os.scandir and sums its files from the listing's stat results.
+
+    Returns:
+        tuple: (apparent, allocated, file count, hardlinked files as (inode key, apparent, allocated),
+                subdirectory paths). Hardlinked files are left out of the sums so they can be counted once.
+    """
+    apparent = allocated = files = 0
+    linked = []
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return apparent, allocated, files, linked, subdirs
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+                continue
+            if not entry.is_file():
+                continue
+            stat_result = entry.stat()
+        except OSError: # removed since the listing or a broken link
+            continue
+
+        if stat_result.st_nlink > 1:
+            linked.append(((stat_result.st_dev, stat_result.st_ino), stat_result.st_size, _allocated_size(stat_result)))
+        else:
+            apparent += stat_result.st_size
+            allocated += _allocated_size(stat_result)
+            files += 1
+    return apparent, allocated, files, linked, subdirs
+
+
+def measure_directory(folder_path: str, max_workers: Optional[int] = None, seen_inodes: Optional[Set] = None) -> DirectorySize:
+    """
+    Measures a folder and its subfolders in one scandir pass.
+
+    Sizes come from the directory listing's stat results, files with several hard
+    links are counted once, and symlinked folders are not followed (like os.walk).
+    Unreadable folders are skipped.
+
+    Args:
+        folder_path (str): The path to the folder.
+        max_workers (int, optional): If greater than 1, subfolders are listed on this many
+                                     threads, which helps on network mounts.
+        seen_inodes (set, optional): (st_dev, st_ino) keys of hardlinked files already
+                                     counted; pass the same set to measure several paths
+                                     without counting a shared file twice.
+
+    Returns:
+        DirectorySize: Apparent and allocated bytes and the number of files.
+    """
+    if seen_inodes is None:
+        seen_inodes = set()
+    apparent = allocated = files = 0
+
+    def add(result):
+        nonlocal apparent, allocated, files
+        dir_apparent, dir_allocated, dir_files, linked, subdirs = result
+        apparent += dir_apparent
+        allocated += dir_allocated
+        files += dir_files
+        for key, file_apparent, file_allocated in linked:
+            if key not in seen_inodes:
+                seen_inodes.add(key)
+                apparent += file_apparent
+                allocated += file_allocated
+                files += 1
+        return subdirs
+
+    if not max_workers or max_workers <= 1:
+        pending = [folder_path]
+        while pending:
+            pending.extend(add(_scan_directory(pending.pop())))
+        return DirectorySize(apparent, allocated, files)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {executor.submit(_scan_directory, folder_path)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.update(executor.submit(_scan_directory, subdir) for subdir in add(future.result()))
+    return DirectorySize(apparent, allocated, files)
+
+
+def get_folder_size(folder_path, walk=None, max_workers=None):
     """
     Gets the total size of a folder and its subfolders in bytes.
+    Files with several hard links are counted once; see measure_directory.
 
     Args:
         folder_path (str): The path to the folder.
+        walk (callable, optional): Replacement for os.walk, e.g. parallel_walk for network mounts.
+                                   By default the folder is measured with a scandir pass instead.
+        max_workers (int, optional): Threads for the scandir pass, see measure_directory.
 
     Returns:
         int: The total size of the folder in bytes, or None if the folder doesn't exist.
@@ -37,23 +142,36 @@ def get_folder_size(folder_path):
     if not os.path.isdir(folder_path):
         raise FileNotFoundError(f"Folder does not exist or is not a directory: {FileNotFoundError}")
 
+    if walk is None:
+        return measure_directory(folder_path, max_workers).apparent
+
     total_size = 0
+    seen_inodes = set()
     try:
-        for dirpath, _, filenames in os.walk(folder_path):
+        for dirpath, _, filenames in walk(folder_path):
             for filename in filenames:
-                file_path = os.path.join(dirpath, filename)
-                total_size += os.path.getsize(file_path)
+                stat_result = os.stat(os.path.join(dirpath, filename))
+                if stat_result.st_nlink > 1:
+                    key = (stat_result.st_dev, stat_result.st_ino)
+                    if key in seen_inodes:
+                        continue
+                    seen_inodes.add(key)
+                total_size += stat_result.st_size
         return total_size
     except FileNotFoundError:
         return None
     
 
-def get_directory_size(path: Union[str, Set[str]]) -> Optional[int]:
+def get_directory_size(path: Union[str, Set[str]], max_workers: Optional[int] = None, size_index=None) -> Optional[int]:
     """
     Gets the total size of a file or a folder and its subfolders in bytes.
 
     Args:
         folder_path (str): The path to the file, files, or folder.
+        max_workers (int, optional): Threads used to list subfolders, see measure_directory.
+        size_index (DirectorySizeIndex, optional): Persistent size index; folders are then
+                                                   answered from it, re-listing only changed
+                                                   directories.
 
     Returns:
         int: The total size of the folder in bytes, or None if the file, files, or folder doesn't exist.
@@ -64,12 +182,22 @@ def get_directory_size(path: Union[str, Set[str]]) -> Optional[int]:
     if isinstance(path, set): #if set of files or folders
         path = remove_redundant_items_in_set(path)
 
+        # Shared, so a file hardlinked into several of the items is counted once.
+        seen_inodes = set()
         size = 0
         for item_path in path:
-            if os.path.isdir(item_path):
-                size += get_folder_size(item_path)
+            if os.path.isdir(item_path) and size_index is not None:
+                size += size_index.get(item_path).bytes
+            elif os.path.isdir(item_path):
+                size += measure_directory(item_path, max_workers, seen_inodes).apparent
             else:
-                size += get_file_size(item_path)
+                stat_result = os.stat(item_path)
+                if stat_result.st_nlink > 1:
+                    key = (stat_result.st_dev, stat_result.st_ino)
+                    if key in seen_inodes:
+                        continue
+                    seen_inodes.add(key)
+                size += stat_result.st_size
         return size
 
     if isinstance(path, str):
@@ -77,7 +205,9 @@ def get_directory_size(path: Union[str, Set[str]]) -> Optional[int]:
             raise FileNotFoundError(f"File or directory not found: {path}")
 
         if os.path.isdir(path): #if folder
-            return get_folder_size(path)
+            if size_index is not None:
+                return size_index.get(path).bytes
+            return get_folder_size(path, max_workers=max_workers)
         
         else:
             return get_file_size(path)
@@ -85,41 +215,41 @@ def get_directory_size(path: Union[str, Set[str]]) -> Optional[int]:
     return None
 
         
+def _path_key(path: str) -> Tuple[str, ...]:
+    """Splits a normalized absolute path into components, so a folder sorts directly before its contents."""
+    normalized = os.path.normcase(os.path.normpath(os.path.abspath(path)))
+    return tuple(normalized.rstrip(os.sep).split(os.sep))
+
+
 def remove_redundant_items_in_set(files: Set[str]) -> Set[str]:
     """
     Removes items from the set if they are already contained within a folder in the set.
 
+    The paths are normalized and sorted by their components, which places every
+    item right after the folder that contains it, so one sweep in O(n log n)
+    finds all contained items. Paths that normalize to the same item are kept once.
+
     Args:
         path (Set[str]): A set of file or folder paths.
 
     Returns:
         Set[str]: A new set with items removed if contained within a folder.
     """
+    items = sorted((_path_key(p), p) for p in files)
 
-    folders = {p for p in files if os.path.isdir(p)}
-    files = {p for p in files if not os.path.isdir(p)}
-    
     items_to_keep = set()
-
-    for file in files:
-        is_contained = False
-        for folder in folders:
-            if os.path.commonpath([file, folder]) == folder:
-                if file != folder:
-                    is_contained = True
-                    break
-        if not is_contained:
-            items_to_keep.add(file)
-
-    for folder in folders:
-        is_contained = False
-        for _folder in folders:
-            if os.path.commonpath([folder, _folder]) == _folder:
-                if folder != _folder:
-                    is_contained = True
-                    break
-        if not is_contained:
-            items_to_keep.add(folder) 
+    folder = None # key of the last kept folder
+    previous = None
+    for key, item in items:
+        if key == previous:
+            continue
+        previous = key
+        if folder is not None and key[:len(folder)] == folder:
+            continue
+
+        items_to_keep.add(item)
+        if os.path.isdir(item):
+            folder = key
 
     return items_to_keep
 
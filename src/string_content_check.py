@@ -1,4 +1,91 @@
-from typing import Optional
+import os
+import re
+from typing import Iterable, List, Optional
+
+
+class NameMatcher:
+    """
+    Filename criteria compiled once into a reusable matcher.
+
+    The starts_with / contains / ends_with criteria become a single regular
+    expression and extensions become a set, so checking a name is one or two
+    C-level calls instead of re-normalizing the criteria. A name's extension is
+    taken with os.path.splitext, so a hidden file such as '.jpg' has none.
+
+    Args:
+        starts_with (str, optional): Name must start with this string.
+        contains (str, optional): Name must contain this substring.
+        ends_with (str, optional): Name must end with this string.
+        match_case (bool): Whether starts_with / contains / ends_with are case-sensitive.
+        must_pass_all (bool): If True, all criteria must match; otherwise, any match is sufficient.
+        extensions (iterable of str, optional): Allowed extensions (e.g. ['.jpg', '.png']),
+                                                required in addition to the criteria above.
+                                                The file's extension is lowercased; the allowed
+                                                ones are lowercased too unless match_case.
+    """
+
+    def __init__(
+            self,
+            starts_with: Optional[str] = None,
+            contains: Optional[str] = None,
+            ends_with: Optional[str] = None,
+            match_case: bool = False,
+            must_pass_all: bool = False, # AND operation
+            extensions: Optional[Iterable[str]] = None
+    ):
+        for name, value in (('starts_with', starts_with), ('contains', contains), ('ends_with', ends_with)):
+            if value is not None and not isinstance(value, str):
+                raise TypeError(f"{name} type expected None or str: got {type(value)}")
+        for name, value in (('match_case', match_case), ('must_pass_all', must_pass_all)):
+            if not isinstance(value, bool):
+                raise TypeError(f"{name} type expected bool: got {type(value)}")
+
+        if extensions:
+            self.extensions = frozenset(extensions if match_case else (ext.lower() for ext in extensions))
+        else:
+            self.extensions = None
+
+        flags = re.DOTALL if match_case else re.DOTALL | re.IGNORECASE
+        if must_pass_all:
+            parts = []
+            if starts_with:
+                parts.append(f"(?={re.escape(starts_with)})")
+            if contains:
+                parts.append(f"(?=.*{re.escape(contains)})")
+            if ends_with:
+                parts.append(f"(?=.*{re.escape(ends_with)}\\Z)")
+            pattern = '\\A' + ''.join(parts) if parts else ''
+        else:
+            parts = []
+            if starts_with:
+                parts.append(f"\\A{re.escape(starts_with)}")
+            if contains:
+                parts.append(re.escape(contains))
+            if ends_with:
+                parts.append(f"{re.escape(ends_with)}\\Z")
+            pattern = '|'.join(parts)
+
+        # No criteria means every name passes.
+        self._search = re.compile(pattern, flags).search if pattern else None
+
+    def _has_extension(self, name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def matches(self, name: str) -> bool:
+        if self.extensions is not None and not self._has_extension(name):
+            return False
+        return self._search is None or self._search(name) is not None
+
+    __call__ = matches
+
+    def filter(self, names: Iterable[str]) -> List[str]:
+        """Returns the names that match, in their original order."""
+        search = self._search
+        if self.extensions is not None:
+            names = [name for name in names if self._has_extension(name)]
+        if search is None:
+            return list(names)
+        return [name for name in names if search(name)]
 
 
 def string_content_check(
@@ -12,6 +99,8 @@ def string_content_check(
     """
     Checks if a given string matches the filtering criteria.
 
+    For checking many strings against the same criteria, build a NameMatcher once instead.
+
     Args:
         input_string (str): The string to check.
         starts_with (str, optional): String must start with this string.
@@ -25,46 +114,8 @@ def string_content_check(
     """
     if input_string is not None and not isinstance(input_string, str):
         raise TypeError(f"input_string type expected None or str: got {type(input_string)}") 
-    
-    if starts_with is not None and not isinstance(starts_with, str):
-        raise TypeError(f"input_string type expected None or str: got {type(starts_with)}") 
-    
-    if contains is not None and not isinstance(contains, str):
-        raise TypeError(f"input_string type expected None or str: got {type(contains)}") 
-    
-    if ends_with is not None and not isinstance(ends_with, str):
-        raise TypeError(f"input_string type expected None or str: got {type(ends_with)}") 
-    
-    if match_case is not None and not isinstance(match_case, bool):
-        raise TypeError(f"input_string type expected bool: got {type(match_case)}") 
-    
-    if must_pass_all is not None and not isinstance(must_pass_all, bool):
-        raise TypeError(f"input_string type expected bool: got {type(must_pass_all)}") 
-    
-
-
-    if not match_case:
-        input_string = input_string.lower()
-        starts_with = starts_with.lower() if starts_with else None
-        contains = contains.lower() if contains else None
-        ends_with = ends_with.lower() if ends_with else None
-
-    checks = set()
-
-    
-    if starts_with:
-        checks.add(input_string.startswith(starts_with))
-
-    if contains:
-        checks.add(contains in input_string)
-
-    if ends_with:
-        checks.add(input_string.endswith(ends_with))
-
-    if must_pass_all:
-        return all(checks)
 
-    return any(checks) if checks else True
+    return NameMatcher(starts_with, contains, ends_with, match_case, must_pass_all).matches(input_string)
 
 
 def main():
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# The modules import each other as top-level scripts, the grouping and archiving ones included.
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(1, os.path.join(SRC_DIR, "archiving"))
+sys.path.insert(2, os.path.join(SRC_DIR, "grouping"))
+
+import events # importable once src is on sys.path
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    """The (kind, message, fields) of every event emitted during the test, instead of writing them."""
+    recorded = []
+
+    def emit(level, kind, message=None, **fields):
+        recorded.append((kind, message, fields))
+
+    monkeypatch.setattr(events.REPORTER, "emit", emit)
+    return recorded
+
+
+@pytest.fixture
+def write_file():
+    """Writes bytes to a path, creating its parent folders."""
+    def write(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    return write
@@ -0,0 +1,54 @@
+"""Byte-level builders for the image and video fixtures of the reader tests."""
+
+import struct
+
+DATE = b"2021:07:04 18:30:05\x00"
+
+
+def tiff(endian="<", date=DATE, offset=b"+02:00\x00", subsec=b"12\x00"):
+    """A TIFF structure with IFD0 -> Exif IFD holding the capture date tags."""
+    def pack(fmt, *values):
+        return struct.pack(endian + fmt, *values)
+
+    exif_ifd = 8 + 18
+    data = exif_ifd + 42
+    entries = [
+        pack("HHI", 0x9003, 2, len(date)) + pack("I", data),
+        pack("HHI", 0x9011, 2, len(offset)) + pack("I", data + len(date)),
+        pack("HHI", 0x9291, 2, len(subsec)) + subsec.ljust(4, b"\x00"),
+    ]
+    return (
+        (b"II" if endian == "<" else b"MM") + pack("HI", 42, 8)
+        + pack("H", 1) + pack("HHII", 0x8769, 4, 1, exif_ifd) + pack("I", 0)
+        + pack("H", len(entries)) + b"".join(entries) + pack("I", 0)
+        + date + offset
+    )
+
+
+def jpeg(comment=b""):
+    """A JPEG without Exif: SOI, a comment segment holding comment, EOI."""
+    return b"\xff\xd8\xff\xfe" + struct.pack(">H", 2 + len(comment)) + comment + b"\xff\xd9"
+
+
+def box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def heic(exif):
+    """A HEIF file whose Exif item is found through meta/iinf and a version 1 iloc."""
+    ftyp = box(b"ftyp", b"heic" + bytes(4) + b"mif1heic")
+
+    def infe(item_id, item_type):
+        return box(b"infe", bytes([2, 0, 0, 0]) + struct.pack(">HH", item_id, 0) + item_type + b"\x00")
+
+    iinf = box(b"iinf", bytes(4) + struct.pack(">H", 2) + infe(1, b"hvc1") + infe(2, b"Exif"))
+    item = struct.pack(">I", 0) + exif # no padding before the TIFF header
+
+    def meta(item_offset):
+        iloc = box(b"iloc", bytes([1, 0, 0, 0, 0x44, 0x00]) + struct.pack(">H", 2)
+                   + struct.pack(">HHHHII", 1, 0, 0, 1, item_offset + len(item), 128)
+                   + struct.pack(">HHHHII", 2, 0, 0, 1, item_offset, len(item)))
+        return box(b"meta", bytes(4) + box(b"hdlr", bytes(24)) + iinf + iloc)
+
+    item_offset = len(ftyp) + len(meta(0)) + 8
+    return ftyp + meta(item_offset) + box(b"mdat", item + bytes(128))
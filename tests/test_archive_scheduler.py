@@ -0,0 +1,54 @@
+import threading
+
+from archive_scheduler import ArchiveJob, ArchiveScheduler
+
+
+def _overlapping_jobs(count, device=1):
+    """Jobs that each wait until all of them run at once, and fail if that never happens."""
+    barrier = threading.Barrier(count, timeout=5)
+
+    def run(threads):
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            return False
+        return True
+
+    return [ArchiveJob(f"job{i}", size=100 - i, device=device, run=run) for i in range(count)]
+
+
+def test_jobs_on_one_device_overlap_by_default():
+    scheduler = ArchiveScheduler(cpu_threads=4, retries=0)
+    assert scheduler.io_per_device == 2
+
+    results = scheduler.run(_overlapping_jobs(2))
+    assert [result.ok for result in results] == [True, True]
+    assert [result.threads for result in results] == [2, 2]
+
+
+def test_default_jobs_per_device_follow_the_cpu_budget():
+    assert ArchiveScheduler(cpu_threads=16).io_per_device == 4
+    assert ArchiveScheduler(cpu_threads=1).io_per_device == 2
+    assert ArchiveScheduler(cpu_threads=16, io_per_device=1).io_per_device == 1
+
+
+def test_one_job_per_device_runs_them_one_after_another():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run(threads):
+        with lock:
+            running.append(threads)
+            peak.append(len(running))
+        threading.Event().wait(0.02)
+        with lock:
+            running.pop()
+        return True
+
+    jobs = [ArchiveJob(f"job{i}", size=i, device=1, run=run) for i in range(3)]
+    results = ArchiveScheduler(cpu_threads=4, io_per_device=1).run(jobs)
+
+    assert all(result.ok for result in results)
+    assert max(peak) == 1
+    assert [result.job.name for result in results] == ["job2", "job1", "job0"]
@@ -0,0 +1,64 @@
+import os
+
+import compress
+from stream_archive import extract_stream_archive
+
+
+def test_retry_after_failed_recovery_only_creates_recovery_files(tmp_path, monkeypatch):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    (folder / "a.jpg").write_bytes(os.urandom(4096))
+    (folder / "b.jpg").write_bytes(os.urandom(1024))
+
+    real_create_recovery = compress.create_recovery
+    calls = []
+
+    def create_recovery(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            open(args[1], "wb").close()  # a partial recovery file
+            raise OSError("disk full")
+        return real_create_recovery(*args, **kwargs)
+
+    monkeypatch.setattr(compress, "create_recovery", create_recovery)
+    assert not compress.archive_and_parchive(str(folder), threads=1, backend="xz", parity="native")
+    assert sorted(os.listdir(folder)) == ["photos.tar.xz.001", "photos.tar.xz.done"]
+
+    assert compress.archive_and_parchive(str(folder), threads=1, backend="xz", parity="native")
+    assert sorted(os.listdir(folder)) == [
+        "photos.tar.xz.001", "photos.tar.xz.001" + compress.PARITY_SUFFIX, "photos.tar.xz.done",
+    ]
+    assert calls[1][0] == {str(folder / "photos.tar.xz.001")}
+
+
+def test_partial_volumes_of_an_interrupted_run_are_archived_again(tmp_path):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    (folder / "a.jpg").write_bytes(b"a" * 4096)
+    # A run killed while writing: a truncated volume and no marker, the sources still there.
+    (folder / "photos.tar.xz.001").write_bytes(b"\xfd7zXZ\x00 truncated")
+
+    assert compress.archive_and_parchive(str(folder), threads=1, backend="xz", parity="native")
+    assert sorted(os.listdir(folder)) == [
+        "photos.tar.xz.001", "photos.tar.xz.001" + compress.PARITY_SUFFIX, "photos.tar.xz.done",
+    ]
+
+    extracted = tmp_path / "extracted"
+    assert extract_stream_archive(str(folder / "photos.tar.xz.001"), str(extracted))
+    assert (extracted / "photos" / "a.jpg").read_bytes() == b"a" * 4096
+
+
+def test_volumes_without_sources_left_count_as_complete(tmp_path, monkeypatch):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    (folder / "a.jpg").write_bytes(b"a" * 4096)
+    assert compress.create_stream_archive(str(folder), str(folder / "photos.tar.xz"), workers=1)
+    volume = (folder / "photos.tar.xz.001").read_bytes()
+
+    def no_archiving(*args, **kwargs):
+        raise AssertionError("the complete archive was created again")
+
+    monkeypatch.setattr(compress, "create_stream_archive", no_archiving)
+    assert compress.archive_and_parchive(str(folder), threads=1, backend="xz", parity="native")
+    assert (folder / "photos.tar.xz.001").read_bytes() == volume
+    assert (folder / "photos.tar.xz.done").exists()
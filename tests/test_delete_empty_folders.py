@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from delete_empty_folders import delete_emptied_folders, delete_empty_folders
+from scan_index import ScanIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for relative in ("chain/a/b/c", "kept/empty", ".git/objects", "photos/@eaDir/thumbs"):
+        (root / relative).mkdir(parents=True)
+    (root / "kept" / "file.txt").write_text("x")
+    return str(root)
+
+
+def _folders(root):
+    return sorted(os.path.relpath(path, root) for path, _, _ in os.walk(root))
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_nested_empty_chain_is_removed_in_one_walk(tree, use_index):
+    walks = []
+
+    def counting_walk(top, topdown=True):
+        walks.append(top)
+        return os.walk(top, topdown)
+
+    index = ScanIndex(tree) if use_index else None
+    removed = delete_empty_folders(tree, index=index, walk=None if use_index else counting_walk)
+
+    assert removed == 10
+    assert _folders(tree) == [".", "kept"]
+    if index is None:
+        assert walks == [tree]
+    else:
+        assert [path for path, _, _ in index.walk(tree)] == [tree, os.path.join(tree, "kept")]
+
+
+def test_excluded_folders_and_their_contents_are_kept(tree):
+    removed = delete_empty_folders(tree, exclude=[".git", "@eaDir"])
+
+    assert removed == 5
+    assert _folders(tree) == [
+        ".", ".git", os.path.join(".git", "objects"), "kept", "photos",
+        os.path.join("photos", "@eaDir"), os.path.join("photos", "@eaDir", "thumbs"),
+    ]
+
+
+def test_dry_run_counts_without_deleting(tree, emitted):
+    before = _folders(tree)
+
+    assert delete_empty_folders(tree, dry_run=True) == 10
+    assert _folders(tree) == before
+    assert {kind for kind, _, _ in emitted if kind.endswith("delete") or kind == "deleted"} == {"would_delete"}
+    assert sum(1 for kind, _, _ in emitted if kind == "would_delete") == 10
+
+
+def test_start_folder_is_removed_only_without_keep_start(tmp_path):
+    start = tmp_path / "drop"
+    (start / "a" / "b").mkdir(parents=True)
+
+    assert delete_empty_folders(str(start), keep_start=True) == 2
+    assert start.is_dir() and not any(start.iterdir())
+
+    assert delete_empty_folders(str(start)) == 1
+    assert not start.exists()
+
+
+def test_emptied_folders_and_their_emptied_parents_are_removed(tmp_path):
+    root = tmp_path / "root"
+    for relative in ("batch/x", "batch/y", "other/empty"):
+        (root / relative).mkdir(parents=True)
+    (root / "busy" / "z").mkdir(parents=True)
+    (root / "busy" / "file.txt").write_text("x")
+
+    folders = [root / "batch" / "x", root / "batch" / "y", root / "busy" / "z", tmp_path / "outside"]
+    assert delete_emptied_folders([str(f) for f in folders], str(root)) == 4
+
+    assert sorted(os.listdir(root)) == ["busy", "other"]
+    assert os.listdir(root / "busy") == ["file.txt"]
+    assert (root / "other" / "empty").is_dir()
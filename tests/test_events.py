@@ -0,0 +1,17 @@
+import io
+
+from events import EventReporter
+
+
+def test_emitters_wait_for_the_writer_at_max_queued():
+    stream = io.StringIO()
+    # The writer would otherwise only wake once a minute.
+    reporter = EventReporter(stream=stream, progress=False, flush_interval=60, max_queued=10)
+    try:
+        for i in range(25):
+            reporter.info(f"event {i}")
+            assert len(reporter._queue) < 10
+        assert stream.getvalue().splitlines() == [f"event {i}" for i in range(20)]
+    finally:
+        reporter.close()
+    assert stream.getvalue().splitlines() == [f"event {i}" for i in range(25)]
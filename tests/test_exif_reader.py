@@ -0,0 +1,63 @@
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from exif_reader import ExifFormatError, get_date_time_original, read_exif_dates
+from media_fixtures import tiff
+
+
+def jpeg(exif):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    app1 = b"\xff\xe1" + struct.pack(">H", 2 + 6 + len(exif)) + b"Exif\x00\x00" + exif
+    return b"\xff\xd8" + app0 + app1 + b"\xff\xda" + bytes(64) + b"\xff\xd9"
+
+
+def png(exif):
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", bytes(32)) + chunk(b"eXIf", exif) + chunk(b"IEND", b""))
+
+
+EXPECTED = datetime(2021, 7, 4, 18, 30, 5, 120000, tzinfo=timezone(timedelta(hours=2)))
+
+
+@pytest.mark.parametrize("name, data", [
+    ("photo.jpg", jpeg(tiff("<"))),
+    ("photo_be.jpg", jpeg(tiff(">"))),
+    ("photo.cr2", tiff("<")),
+    ("photo.tif", tiff(">")),
+    ("photo.png", png(tiff(">"))),
+])
+def test_reads_capture_date(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+
+    assert read_exif_dates(str(path)) == {
+        "DateTimeOriginal": "2021:07:04 18:30:05",
+        "OffsetTimeOriginal": "+02:00",
+        "SubSecTimeOriginal": "12",
+    }
+    assert get_date_time_original(str(path)) == EXPECTED
+
+
+def test_without_offset_the_date_is_naive(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(jpeg(tiff(offset=b"\x00", subsec=b"\x00")))
+    assert get_date_time_original(str(path)) == datetime(2021, 7, 4, 18, 30, 5)
+
+
+def test_jpeg_without_exif_has_no_date(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xda" + bytes(16) + b"\xff\xd9")
+    assert get_date_time_original(str(path)) is None
+
+
+@pytest.mark.parametrize("data", [b"GIF89a" + bytes(16), jpeg(b"II*\x00" + struct.pack("<I", 8) + b"\x01")])
+def test_unsupported_or_truncated_files_raise(tmp_path, data):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(data)
+    with pytest.raises(ExifFormatError):
+        read_exif_dates(str(path))
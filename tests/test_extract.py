@@ -0,0 +1,19 @@
+import extract
+from par2_runner import Par2Result, COMPLETE, DAMAGED
+
+
+def test_failed_par2_set_falls_back_to_the_volume_set(tmp_path, monkeypatch):
+    archive = tmp_path / "photos.7z.001"
+    for path in (archive, tmp_path / "photos.7z.par2", tmp_path / "photos.7z.001.par2"):
+        path.write_bytes(b"")
+    verified = []
+
+    def verify_par2_sets(paths):
+        verified.append(list(paths))
+        return [Par2Result(path, COMPLETE if path.endswith(".7z.001.par2") else DAMAGED, 0.0, 0.0, []) for path in paths]
+
+    monkeypatch.setattr(extract, "verify_par2_sets", verify_par2_sets)
+    results = extract._verify_archives([("7z volume", str(archive), None)])
+
+    assert verified == [[str(tmp_path / "photos.7z.par2")], [str(tmp_path / "photos.7z.001.par2")]]
+    assert results[0].ok
@@ -0,0 +1,13 @@
+from group_images_by_date_taken import get_date_taken
+from media_fixtures import heic, tiff
+
+
+def test_heic_date_comes_from_its_exif_item(tmp_path, monkeypatch):
+    path = tmp_path / "IMG_0001.HEIC"
+    path.write_bytes(heic(tiff(">")))
+
+    def pillow(image_path):
+        raise AssertionError("HEIC must not need Pillow")
+
+    monkeypatch.setattr("group_images_by_date_taken.get_date_taken_with_pillow", pillow)
+    assert get_date_taken(str(path)) == "2021_07_04"
@@ -0,0 +1,63 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from isobmff_reader import IsobmffFormatError, MP4_EPOCH, read_creation_time
+from media_fixtures import box, heic, tiff
+
+CREATED = datetime(2022, 3, 1, 12, 0, 0, tzinfo=timezone.utc)
+SECONDS = int((CREATED - MP4_EPOCH).total_seconds())
+
+
+def large_box(box_type, payload):
+    return struct.pack(">I4sQ", 1, box_type, 16 + len(payload)) + payload
+
+
+def mvhd(version, creation_time):
+    if version == 1:
+        times = struct.pack(">QQIQ", creation_time, creation_time, 1000, 0)
+    else:
+        times = struct.pack(">IIII", creation_time, creation_time, 1000, 0)
+    return box(b"mvhd", bytes([version, 0, 0, 0]) + times + bytes(80))
+
+
+def movie(version, creation_time, mdat=box):
+    ftyp = box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isommp41")
+    return ftyp + mdat(b"mdat", bytes(256)) + box(b"moov", mvhd(version, creation_time))
+
+
+@pytest.mark.parametrize("version, mdat", [(0, box), (1, box), (1, large_box)])
+def test_reads_mvhd_creation_time(tmp_path, version, mdat):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(movie(version, SECONDS, mdat))
+    assert read_creation_time(str(path)) == CREATED
+
+
+def test_mvhd_v1_holds_times_past_2040(tmp_path):
+    path = tmp_path / "clip.mov"
+    path.write_bytes(movie(1, SECONDS + (1 << 32)))
+    assert read_creation_time(str(path)) == CREATED + timedelta(seconds=1 << 32)
+
+
+def test_unset_mvhd_time_is_none(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(movie(0, 0))
+    assert read_creation_time(str(path)) is None
+
+
+def test_reads_heif_exif_item_through_iloc(tmp_path):
+    path = tmp_path / "photo.heic"
+    path.write_bytes(heic(tiff(">")))
+    assert read_creation_time(str(path)) == datetime(2021, 7, 4, 18, 30, 5, 120000, tzinfo=timezone(timedelta(hours=2)))
+
+
+@pytest.mark.parametrize("data", [
+    b"\x89PNG\r\n\x1a\n" + bytes(16),
+    box(b"ftyp", b"isom" + bytes(4)) + struct.pack(">I4s", 4096, b"moov"),
+])
+def test_malformed_files_raise(tmp_path, data):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(data)
+    with pytest.raises(IsobmffFormatError):
+        read_creation_time(str(path))
@@ -0,0 +1,65 @@
+import os
+
+from match_files_by_name_start import PrefixTrie, sort_by_matching_name
+from scan_index import ScanIndex
+
+
+def test_prefixes_are_found_shortest_first():
+    trie = PrefixTrie()
+    for key in ("IMG_1", "IMG_12", "IMG_2", "DSC"):
+        trie.add(key, key.lower())
+
+    assert trie.prefixes_of("IMG_123.jpg") == [("IMG_1", "img_1"), ("IMG_12", "img_12")]
+    assert trie.prefixes_of("IMG_1.jpg") == [("IMG_1", "img_1")]
+    assert trie.prefixes_of("IMG_3.jpg") == []
+    assert trie.prefixes_of("IMG") == []
+
+
+def test_adding_a_key_again_replaces_its_value():
+    trie = PrefixTrie()
+    trie.add("IMG_1", "first")
+    trie.add("IMG_1", "second")
+    assert len(trie) == 1
+    assert trie.prefixes_of("IMG_1.jpg") == [("IMG_1", "second")]
+
+
+def test_remove_keeps_longer_and_shorter_keys():
+    trie = PrefixTrie()
+    for key in ("IMG_1", "IMG_12", "IMG_123"):
+        trie.add(key)
+
+    trie.remove("IMG_12")
+    trie.remove("IMG_9")  # absent keys are ignored
+    trie.remove("IMG_")   # so are prefixes that are not keys
+    assert len(trie) == 2
+    assert [key for key, _ in trie.prefixes_of("IMG_1234.jpg")] == ["IMG_1", "IMG_123"]
+
+    trie.remove("IMG_1")
+    trie.remove("IMG_123")
+    assert len(trie) == 0
+    assert trie._root == {}  # emptied branches are pruned
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_sidecars_follow_the_longest_match_and_move_once(tmp_path, emitted):
+    src, dest = str(tmp_path / "src"), str(tmp_path / "dest")
+    for name in ("IMG_1.aae", "IMG_12.aae"):
+        _touch(os.path.join(src, name))
+    for relative in ("a/IMG_123.jpg", "b/IMG_1.jpg", "c/IMG_120.jpg"):
+        _touch(os.path.join(dest, relative))
+
+    index = ScanIndex([src, dest])
+    sort_by_matching_name(src, dest, [".aae"], [".jpg"], index=index)
+
+    assert sorted(os.listdir(os.path.join(dest, "a"))) == ["IMG_12.aae", "IMG_123.jpg"]
+    assert sorted(os.listdir(os.path.join(dest, "b"))) == ["IMG_1.aae", "IMG_1.jpg"]
+    assert os.listdir(os.path.join(dest, "c")) == ["IMG_120.jpg"]
+    assert os.listdir(src) == []
+
+    warnings = [message for kind, message, _ in emitted if kind == "warning"]
+    assert len(warnings) == 1 and "'IMG_1', 'IMG_12'" in warnings[0]
+    assert not [event for event in emitted if event[0] == "error"]
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+from metadata_cache import MetadataCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with MetadataCache(str(tmp_path / "cache.db")) as cache:
+        yield cache
+
+
+def _stored_paths(cache):
+    return sorted(row[0] for row in cache._conn.execute("SELECT path FROM metadata"))
+
+
+def test_hit_while_the_file_is_unchanged(tmp_path, cache):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"data")
+    assert cache.get(str(path), "md5") == (False, None)
+
+    cache.put(str(path), "md5", "digest")
+    assert cache.get(str(path), "md5") == (True, "digest")
+    assert cache.get(str(path), "date_taken") == (False, None)
+
+
+def test_miss_when_size_or_mtime_changes(tmp_path, cache):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"data")
+    cache.put(str(path), "md5", "digest")
+
+    stat_result = os.stat(path)
+    os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000))
+    assert cache.get(str(path), "md5") == (False, None)
+
+    path.write_bytes(b"longer data")
+    assert cache.get(str(path), "md5") == (False, None)
+
+
+def test_miss_for_another_inode_at_the_same_path(tmp_path, cache):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"data")
+    cache.put(str(path), "md5", "digest")
+    stat_result = os.stat(path)
+
+    replacement = tmp_path / "b.jpg"
+    replacement.write_bytes(b"data")
+    os.utime(replacement, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    os.replace(replacement, path)
+    assert cache.get(str(path), "md5") == (False, None)
+
+
+def test_negative_results_are_cached(tmp_path, cache):
+    path = tmp_path / "a.png"
+    path.write_bytes(b"no exif")
+    cache.put(str(path), "date_taken", None)
+    assert cache.get(str(path), "date_taken") == (True, None)
+
+
+def test_put_replaces_the_entry_of_the_same_inode(tmp_path, cache):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"data")
+    cache.put(str(path), "md5", "old")
+    path.write_bytes(b"new data")
+    cache.put(str(path), "md5", "new")
+
+    assert cache.get(str(path), "md5") == (True, "new")
+    assert cache._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0] == 1
+
+
+def test_record_move_on_the_same_device(tmp_path, cache):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    (folder / "a.jpg").write_bytes(b"a")
+    (folder / "b.jpg").write_bytes(b"b")
+    cache.put(str(folder / "a.jpg"), "md5", "digest a")
+    cache.put(str(folder / "b.jpg"), "md5", "digest b")
+
+    os.rename(folder, tmp_path / "out")
+    cache.record_move(str(folder), str(tmp_path / "out"))
+
+    assert _stored_paths(cache) == [str(tmp_path / "out" / "a.jpg"), str(tmp_path / "out" / "b.jpg")]
+    assert cache.get(str(tmp_path / "out" / "a.jpg"), "md5") == (True, "digest a")
+
+
+def _as_if_on_another_device(cache, path):
+    # Pretends the file was cached on another device before it was copied here.
+    cache._conn.execute("UPDATE metadata SET dev=dev+1 WHERE path=?", (os.path.abspath(path),))
+
+
+def test_record_move_across_devices_rekeys_the_copy(tmp_path, cache):
+    source, target = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    source.write_bytes(b"data")
+    cache.put(str(source), "md5", "digest")
+    _as_if_on_another_device(cache, source)
+    os.rename(source, target)
+
+    cache.record_move(str(source), str(target))
+    assert cache.get(str(target), "md5") == (True, "digest")
+
+
+def test_record_move_across_devices_drops_a_changed_copy(tmp_path, cache):
+    source, target = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    source.write_bytes(b"data")
+    cache.put(str(source), "md5", "digest")
+    _as_if_on_another_device(cache, source)
+    os.remove(source)
+    target.write_bytes(b"other data")
+
+    cache.record_move(str(source), str(target))
+    assert cache.get(str(target), "md5") == (False, None)
+    assert _stored_paths(cache) == []
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"data")
+    with MetadataCache(str(tmp_path / "cache.db")) as cache:
+        cache.put(str(path), "md5", "digest")
+    with MetadataCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.get(str(path), "md5") == (True, "digest")
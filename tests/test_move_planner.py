@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+import move_planner
+from move_planner import MovePlan, MoveOperation, execute_plan, move_operation
+from scan_index import ScanIndex
+from group_files_by_name import sort_files as group_by_name
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_skip_keeps_a_target_that_appeared_after_planning(tmp_path, write_file):
+    source, target = str(tmp_path / "in" / "a.jpg"), str(tmp_path / "out" / "a.jpg")
+    write_file(source, b"new")
+    plan = MovePlan()
+    plan.add(source, target)
+    write_file(target, b"existing")
+
+    assert execute_plan(plan) == 0
+    assert _read(target) == b"existing"
+    assert _read(source) == b"new"
+    assert [operation.source for operation in plan.skipped] == [source]
+
+
+def test_rename_moves_next_to_a_target_that_appeared_after_planning(tmp_path, write_file):
+    source, target = str(tmp_path / "in" / "a.jpg"), str(tmp_path / "out" / "a.jpg")
+    write_file(source, b"new")
+    plan = MovePlan(on_conflict="rename")
+    plan.add(source, target)
+    write_file(target, b"existing")
+
+    assert execute_plan(plan) == 1
+    assert _read(target) == b"existing"
+    assert _read(str(tmp_path / "out" / "a (1).jpg")) == b"new"
+
+
+def test_move_operation_raises_instead_of_replacing(tmp_path, write_file):
+    source, target = str(tmp_path / "a.jpg"), str(tmp_path / "out" / "a.jpg")
+    write_file(source, b"new")
+    write_file(target, b"existing")
+
+    with pytest.raises(FileExistsError):
+        move_operation(MoveOperation(source, target, "", 3))
+    assert move_operation(MoveOperation(source, target, "", 3), on_conflict="overwrite") == target
+    assert _read(target) == b"new"
+
+
+def test_failed_copy_keeps_the_existing_target(tmp_path, monkeypatch, write_file):
+    source, target = str(tmp_path / "a.jpg"), str(tmp_path / "out" / "a.jpg")
+    write_file(source, b"new")
+    write_file(target, b"existing")
+
+    def failing_copy(src, dst):
+        write_file(dst, b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(move_planner, "copy_file_fast", failing_copy)
+    with pytest.raises(OSError):
+        move_planner._copy_and_remove(source, target, "overwrite")
+    assert _read(target) == b"existing"
+    assert _read(source) == b"new"
+    assert os.listdir(os.path.dirname(target)) == ["a.jpg"]
+
+
+def test_plan_takes_sizes_from_the_index(tmp_path, monkeypatch, write_file):
+    source = str(tmp_path / "in" / "a.jpg")
+    write_file(source, b"12345")
+    index = ScanIndex(str(tmp_path))
+    assert index.size(source) == 5
+
+    def no_stat(path):
+        raise AssertionError("size should come from the index")
+
+    monkeypatch.setattr(os.path, "getsize", no_stat)
+    plan = MovePlan(index=index)
+    assert plan.add(source, str(tmp_path / "out" / "a.jpg")).size == 5
+    execute_plan(plan, index)
+    assert index.size(str(tmp_path / "out" / "a.jpg")) == 5
+
+
+def test_stages_choose_the_conflict_policy(tmp_path, write_file):
+    source, target = str(tmp_path / "in" / "received_1.png"), str(tmp_path / "out" / "received_1.png")
+    write_file(source, b"new")
+    write_file(target, b"existing")
+
+    group_by_name(str(tmp_path / "in"), str(tmp_path / "out"), startswith="received_")
+    assert _read(target) == b"existing"
+
+    group_by_name(str(tmp_path / "in"), str(tmp_path / "out"), startswith="received_", on_conflict="overwrite")
+    assert _read(target) == b"new"
+    assert not os.path.exists(source)
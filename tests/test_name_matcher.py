@@ -0,0 +1,31 @@
+from string_content_check import NameMatcher, string_content_check
+from group_files_by_name import _build_matcher, file_matches
+
+
+def test_starts_with_is_anchored_when_all_must_pass():
+    assert not file_matches('old_Screenshot_1.png', startswith='screenshot', allowed_file_types=['.png'])
+    assert file_matches('Screenshot_1.png', startswith='screenshot', allowed_file_types=['.png'])
+    assert not string_content_check('xaaa.bbb.ccc', starts_with='aaa', contains='bbb', ends_with='ccc', must_pass_all=True)
+    assert string_content_check('aaa.bbb.ccc', starts_with='aaa', contains='bbb', ends_with='ccc', must_pass_all=True)
+
+
+def test_extensions_follow_splitext():
+    matcher = NameMatcher(extensions=['.jpg'])
+    assert matcher('photo.JPG')
+    assert not matcher('.jpg')  # hidden file without an extension
+    assert not matcher('photo.tar.jpg.txt')
+    assert not NameMatcher(extensions=['jpg'])('photo.jpg')
+    assert matcher.filter(['a.jpg', '.jpg', 'b.png', 'c.Jpg']) == ['a.jpg', 'c.Jpg']
+
+
+def test_extensions_respect_match_case():
+    assert file_matches('photo.jpg', allowed_file_types=['.JPG'])
+    assert not file_matches('photo.jpg', match_case=True, allowed_file_types=['.JPG'])
+    assert file_matches('photo.JPG', match_case=True, allowed_file_types=['.jpg'])
+
+
+def test_file_matches_reuses_the_matcher_for_the_same_criteria():
+    first = _build_matcher('img', None, None, False, ['.jpg', '.png'])
+    assert _build_matcher('img', None, None, False, ['.jpg', '.png']) is first
+    assert _build_matcher('img', None, None, True, ['.jpg', '.png']) is not first
+    assert file_matches('IMG_1.jpg', startswith='img', allowed_file_types=['.jpg', '.png'])
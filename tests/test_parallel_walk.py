@@ -0,0 +1,115 @@
+import os
+import time
+
+import pytest
+
+import parallel_walk
+from parallel_walk import parallel_walk as walk
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel in ('a/a1/f.txt', 'a/g.txt', 'b/b1/b2/h.txt', 'b/i.txt', 'c/j.txt', 'top.txt'):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel)
+    (tmp_path / 'a' / 'empty').mkdir()
+    os.symlink(tmp_path / 'b', tmp_path / 'c' / 'link_to_b')
+    return str(tmp_path)
+
+
+@pytest.fixture
+def slow_listing(monkeypatch):
+    """Delays listings of early-sorting directories so they complete out of order."""
+    list_dir = parallel_walk._list_dir
+
+    def delayed(path):
+        if os.path.basename(path) in ('a', 'a1', 'b1'):
+            time.sleep(0.05)
+        return list_dir(path)
+
+    monkeypatch.setattr(parallel_walk, '_list_dir', delayed)
+
+
+def _sorted_walk(top, topdown):
+    """os.walk with sorted names, which fixes the depth-first order."""
+    listings = {}
+    for path, dirs, files in os.walk(top):
+        dirs.sort()
+        listings[path] = (dirs, sorted(files))
+
+    def visit(path):
+        dirs, files = listings[path]
+        if topdown:
+            yield path, dirs, files
+        for name in dirs:
+            child = os.path.join(path, name)
+            if child in listings:
+                yield from visit(child)
+        if not topdown:
+            yield path, dirs, files
+
+    return list(visit(top))
+
+
+def _as_set(results):
+    return {(path, frozenset(dirs), frozenset(files)) for path, dirs, files in results}
+
+
+@pytest.mark.parametrize('topdown', [True, False])
+def test_ordered_walk_matches_sorted_os_walk(tree, slow_listing, topdown):
+    assert list(walk(tree, topdown=topdown, ordered=True)) == _sorted_walk(tree, topdown)
+
+
+@pytest.mark.parametrize('topdown', [True, False])
+def test_unordered_walk_yields_the_same_directories_as_os_walk(tree, slow_listing, topdown):
+    results = list(walk(tree, topdown=topdown))
+    assert _as_set(results) == _as_set(os.walk(tree, topdown=topdown))
+    assert len(results) == len(_as_set(results))
+
+    position = {path: i for i, (path, _, _) in enumerate(results)}
+    for path, dirs, _ in results:
+        for name in dirs:
+            child = os.path.join(path, name)
+            if child in position:
+                assert (position[path] < position[child]) == topdown
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_removing_dirnames_prunes_the_walk(tree, slow_listing, ordered):
+    seen = []
+    for path, dirs, _ in walk(tree, ordered=ordered):
+        seen.append(os.path.relpath(path, tree))
+        if 'b' in dirs:
+            dirs.remove('b')
+    assert sorted(seen) == ['.', 'a', os.path.join('a', 'a1'), os.path.join('a', 'empty'), 'c']
+
+
+@pytest.mark.parametrize('topdown', [True, False])
+@pytest.mark.parametrize('ordered', [True, False])
+def test_unlistable_directories_go_to_onerror(tree, monkeypatch, topdown, ordered):
+    list_dir = parallel_walk._list_dir
+    unreadable = os.path.join(tree, 'b')
+
+    def failing(path):
+        if path == unreadable:
+            raise PermissionError(13, 'Permission denied', path)
+        return list_dir(path)
+
+    monkeypatch.setattr(parallel_walk, '_list_dir', failing)
+    errors = []
+    paths = [path for path, _, _ in walk(tree, topdown=topdown, onerror=errors.append, ordered=ordered)]
+
+    assert [e.filename for e in errors] == [unreadable]
+    assert tree in paths
+    assert not any(path.startswith(unreadable) for path in paths)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_other_listing_errors_are_raised_instead_of_hanging(tree, monkeypatch, ordered):
+    def broken(path):
+        raise RuntimeError(f"cannot list {path}")
+
+    monkeypatch.setattr(parallel_walk, '_list_dir', broken)
+    with pytest.raises(RuntimeError):
+        list(walk(tree, ordered=ordered))
@@ -0,0 +1,74 @@
+import os
+import random
+
+import pytest
+
+import parity
+
+
+def _write_sources(folder):
+    rng = random.Random(0)
+    contents = {
+        "a.bin": bytes(rng.getrandbits(8) for _ in range(40000)),
+        "b.bin": bytes(rng.getrandbits(8) for _ in range(12345)),
+        "c.bin": b"",
+    }
+    for name, data in contents.items():
+        (folder / name).write_bytes(data)
+    return contents
+
+
+def _create(tmp_path, redundancy_rate=20):
+    contents = _write_sources(tmp_path)
+    paths = [str(tmp_path / name) for name in contents]
+    recovery_path = parity.create_recovery(paths, redundancy_rate=redundancy_rate, slice_size_factor=1024, slice_size=1024, workers=1)
+    return contents, recovery_path
+
+
+def test_gf_inverse():
+    assert all(parity.gf_mul(a, parity.gf_inv(a)) == 1 for a in range(1, 256))
+
+
+def test_fresh_set_verifies_complete(tmp_path):
+    _, recovery_path = _create(tmp_path)
+    assert recovery_path == str(tmp_path / "a.bin") + parity.SUFFIX
+    assert parity.verify_recovery(recovery_path, workers=1).complete
+
+
+def test_damaged_and_missing_files_are_repaired(tmp_path):
+    contents, recovery_path = _create(tmp_path, redundancy_rate=40)
+    with open(tmp_path / "a.bin", "r+b") as f:
+        f.seek(5000)
+        f.write(b"\xff" * 3000)
+    os.remove(tmp_path / "b.bin")
+
+    verified = parity.verify_recovery(recovery_path, workers=1)
+    assert not verified.complete
+    assert verified.repairable
+    assert verified.resized_files == [str(tmp_path / "b.bin")]
+
+    assert parity.repair_recovery(recovery_path, workers=1, verified=verified)
+    for name, data in contents.items():
+        assert (tmp_path / name).read_bytes() == data
+
+
+def test_too_much_damage_is_reported_unrepairable(tmp_path):
+    _, recovery_path = _create(tmp_path, redundancy_rate=5)
+    with open(tmp_path / "a.bin", "r+b") as f:
+        f.write(b"\x00" * 40000)
+
+    verified = parity.verify_recovery(recovery_path, workers=1)
+    assert not verified.repairable
+    assert not parity.repair_recovery(recovery_path, workers=1, verified=verified)
+
+
+@pytest.mark.skipif(parity.np is None, reason="numpy is not installed")
+def test_numpy_and_table_multiplies_agree():
+    matrix = parity.cauchy_matrix(3, 5)
+    blocks = [os.urandom(777) for _ in range(5)]
+    expected = parity.gf_matrix_multiply(matrix, blocks, 777)
+    numpy_module, parity.np = parity.np, None
+    try:
+        assert parity.gf_matrix_multiply(matrix, blocks, 777) == expected
+    finally:
+        parity.np = numpy_module
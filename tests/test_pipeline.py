@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+import pytest
+
+import pipeline
+from move_planner import MovePlan
+from pipeline import Stage, move_stage, run_pipeline
+from scan_index import ScanIndex
+
+
+class Crash(BaseException):
+    """Escapes the per-item error handling, like a bug in a stage would."""
+
+
+def _run_with_timeout(func, seconds=10):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "the pipeline hung"
+    return outcome
+
+
+@pytest.mark.parametrize("threaded_source", [True, False])
+def test_a_raising_stage_counts_errors_and_the_rest_flows(emitted, threaded_source):
+    passed = []
+
+    def check(item):
+        if item % 3 == 0:
+            raise ValueError(f"bad item {item}")
+        return item
+
+    stages = [Stage("check", check, concurrency=2, queue_size=2), Stage("collect", passed.append)]
+    outcome = _run_with_timeout(lambda: run_pipeline(range(30), stages, threaded_source))
+
+    source, check_stats, _ = outcome["result"]
+    assert source.items_out == 30
+    assert (check_stats.items_in, check_stats.errors, check_stats.items_out) == (30, 10, 20)
+    assert sorted(passed) == [i for i in range(30) if i % 3]
+    assert sum(1 for kind, _, _ in emitted if kind == "error") == 10
+
+
+def test_a_failed_stage_stops_a_blocked_source_thread(emitted):
+    produced = []
+
+    def source():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    def crash(item):
+        time.sleep(0.01)
+        raise Crash()
+
+    stages = [Stage("crash", crash, queue_size=1)]
+    outcome = _run_with_timeout(lambda: run_pipeline(source(), stages, threaded_source=True))
+
+    assert isinstance(outcome.get("error"), Crash)
+    time.sleep(2 * pipeline.SOURCE_POLL_SECONDS)
+    stopped_at = len(produced)
+    time.sleep(2 * pipeline.SOURCE_POLL_SECONDS)
+    assert len(produced) == stopped_at < 1000
+
+
+def test_move_stage_hands_batches_to_execute_plan(tmp_path, monkeypatch, emitted):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    src.mkdir()
+    for i in range(20):
+        (src / f"{i:02}.jpg").write_bytes(b"x")
+    index = ScanIndex([str(src), str(dest)])
+    plan = MovePlan(index=index)
+
+    batches = []
+    execute_plan = pipeline.execute_plan
+
+    def recording(batch, log):
+        batches.append(len(batch))
+        if len(batches) == 1:
+            time.sleep(0.05)  # the rest of the operations queue up meanwhile
+        return execute_plan(batch, log)
+
+    monkeypatch.setattr(pipeline, "execute_plan", recording)
+    stages = [
+        Stage("plan", lambda name: plan.add(str(src / name), str(dest / "sorted" / name))),
+        move_stage(index, concurrency=1),
+    ]
+    run_pipeline(sorted(os.listdir(src)), stages, threaded_source=False)
+
+    assert sum(batches) == 20
+    assert max(batches) > 1
+    assert sorted(os.listdir(dest / "sorted")) == sorted(f"{i:02}.jpg" for i in range(20))
+    assert index.listdir(str(src)) == []
+    assert len(index.listdir(str(dest / "sorted"))) == 20
+    assert sum(1 for kind, _, _ in emitted if kind == "moved") == 20
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import remove_duplicates
+from hash import calculate_partial_md5
+from remove_duplicates import PARTIAL_HASH_SAMPLE_SIZE, find_duplicate_groups, find_duplicates
+
+SAMPLE = PARTIAL_HASH_SAMPLE_SIZE
+
+
+@pytest.fixture
+def fully_hashed(monkeypatch):
+    """The files that reached the full-hash tier."""
+    hashed = []
+    hash_files = remove_duplicates.hash_files
+
+    def recording_hash_files(files, **kwargs):
+        files = list(files)
+        hashed.extend(files)
+        return hash_files(files, **kwargs)
+
+    monkeypatch.setattr(remove_duplicates, "hash_files", recording_hash_files)
+    return hashed
+
+
+def test_files_differing_only_in_the_middle_are_told_apart(tmp_path, fully_hashed):
+    data = os.urandom(3 * SAMPLE)
+    middle = bytearray(data)
+    middle[len(middle) // 2] ^= 0xFF
+    (tmp_path / "a.jpg").write_bytes(data)
+    (tmp_path / "b.jpg").write_bytes(bytes(middle))
+    (tmp_path / "c.jpg").write_bytes(data)
+
+    assert calculate_partial_md5(str(tmp_path / "a.jpg"), SAMPLE) == calculate_partial_md5(str(tmp_path / "b.jpg"), SAMPLE)
+    assert find_duplicate_groups(str(tmp_path), [".jpg"]) == [[str(tmp_path / "a.jpg"), str(tmp_path / "c.jpg")]]
+    assert sorted(fully_hashed) == [str(tmp_path / name) for name in ("a.jpg", "b.jpg", "c.jpg")]
+
+
+def test_unique_sizes_are_never_hashed(tmp_path, fully_hashed, monkeypatch):
+    sampled = []
+    monkeypatch.setattr(remove_duplicates, "get_partial_md5", lambda path, size: sampled.append(path) or "same")
+    (tmp_path / "a.jpg").write_bytes(b"x" * 10)
+    (tmp_path / "b.jpg").write_bytes(b"x" * 11)
+
+    assert find_duplicate_groups(str(tmp_path), [".jpg"]) == []
+    assert sampled == [] and fully_hashed == []
+
+
+@pytest.mark.parametrize("size", [1, SAMPLE, 2 * SAMPLE])
+def test_small_files_are_decided_by_the_sample(tmp_path, fully_hashed, size):
+    data = os.urandom(size)
+    other = bytes([data[0] ^ 0xFF]) + data[1:]
+    (tmp_path / "a.png").write_bytes(data)
+    (tmp_path / "b.png").write_bytes(data)
+    (tmp_path / "c.png").write_bytes(other)
+
+    assert find_duplicate_groups(str(tmp_path), [".png"]) == [[str(tmp_path / "a.png"), str(tmp_path / "b.png")]]
+    assert fully_hashed == []
+
+
+def test_hardlinked_copies_are_duplicates(tmp_path):
+    data = os.urandom(3 * SAMPLE)
+    (tmp_path / "a.mov").write_bytes(data)
+    os.link(tmp_path / "a.mov", tmp_path / "b.mov")
+    (tmp_path / "sub").mkdir()
+    os.link(tmp_path / "a.mov", tmp_path / "sub" / "c.mov")
+
+    groups = find_duplicate_groups(str(tmp_path), ["mov"])
+    assert groups == [sorted(str(path) for path in (tmp_path / "a.mov", tmp_path / "b.mov", tmp_path / "sub" / "c.mov"))]
+    assert find_duplicates(str(tmp_path), ["mov"]) == set(groups[0][1:])
+
+
+def test_empty_files_and_other_extensions_are_ignored(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"")
+    (tmp_path / "b.jpg").write_bytes(b"")
+    (tmp_path / "c.txt").write_bytes(b"same")
+    (tmp_path / "d.txt").write_bytes(b"same")
+    assert find_duplicate_groups(str(tmp_path), [".jpg"]) == []
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from scan_index import ScanIndex
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for relative in ("a.JPG", "sub/b.png", "sub/deep/c.jpg", "other/d.txt"):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+    (root / "empty").mkdir()
+    return str(root)
+
+
+def _os_walk(top, topdown=True):
+    return [(dirpath, sorted(dirnames), sorted(filenames)) for dirpath, dirnames, filenames in os.walk(top, topdown)]
+
+
+def test_find_by_extension_name_and_folder(tree):
+    index = ScanIndex(tree)
+    join = lambda *parts: os.path.join(tree, *parts)
+
+    assert index.find(extensions=["jpg"]) == {join("a.JPG"), join("sub", "deep", "c.jpg")}
+    assert index.find(extensions=[".PNG", ".txt"]) == {join("sub", "b.png"), join("other", "d.txt")}
+    assert index.find(name="B.PNG") == {join("sub", "b.png")}
+    assert index.find(extensions=[".jpg"], under=join("sub")) == {join("sub", "deep", "c.jpg")}
+    assert len(index.find()) == 4
+
+
+def test_walk_matches_os_walk_both_ways(tree):
+    index = ScanIndex(tree)
+    assert sorted(index.walk(tree)) == sorted(_os_walk(tree))
+
+    bottom_up = list(index.walk(tree, topdown=False))
+    assert sorted(bottom_up) == sorted(_os_walk(tree, topdown=False))
+    order = [dirpath for dirpath, _, _ in bottom_up]
+    assert order.index(os.path.join(tree, "sub", "deep")) < order.index(os.path.join(tree, "sub")) < order.index(tree)
+
+
+def test_walk_skips_pruned_folders(tree):
+    index = ScanIndex(tree)
+    visited = []
+    for dirpath, dirnames, _ in index.walk(tree):
+        visited.append(dirpath)
+        if "sub" in dirnames:
+            dirnames.remove("sub")
+    assert os.path.join(tree, "sub") not in visited
+    assert os.path.join(tree, "sub", "deep") not in visited
+
+
+def test_rmdir_and_remove_update_disk_and_index(tree):
+    index = ScanIndex(tree)
+    index.rmdir(os.path.join(tree, "empty"))
+    index.remove(os.path.join(tree, "other", "d.txt"))
+
+    assert not os.path.exists(os.path.join(tree, "empty"))
+    assert not index.exists(os.path.join(tree, "empty"))
+    assert index.listdir(os.path.join(tree, "other")) == []
+    assert index.find(extensions=[".txt"]) == set()
+
+
+def test_add_file_registers_new_folders_inside_roots_only(tree, tmp_path):
+    index = ScanIndex(tree)
+    arrival = os.path.join(tree, "new", "day", "e.heic")
+    index.add_file(arrival)
+    index.add_file(str(tmp_path / "elsewhere.heic"))
+
+    assert index.isfile(arrival)
+    assert index.isdir(os.path.join(tree, "new", "day"))
+    assert "new" in index.listdir(tree)
+    assert index.find(extensions=[".heic"]) == {arrival}
+
+
+def test_move_keeps_the_index_current(tree):
+    index = ScanIndex(tree)
+    final = index.move(os.path.join(tree, "sub"), os.path.join(tree, "other", "sub"))
+
+    assert final == os.path.join(tree, "other", "sub")
+    assert index.isfile(os.path.join(tree, "other", "sub", "deep", "c.jpg"))
+    assert not index.exists(os.path.join(tree, "sub"))
+    assert sorted(index.walk(tree)) == sorted(_os_walk(tree))
+
+
+def test_forget_keeps_listed_folders(tree):
+    index = ScanIndex(tree)
+    deep = os.path.join(tree, "sub", "deep")
+    index.forget(tree, keep=[deep])
+
+    assert index.find() == {os.path.join(deep, "c.jpg")}
+    assert index.listdir(os.path.join(tree, "sub")) == ["deep"]
+    assert index.listdir(tree) == ["sub"]
+    assert os.path.exists(os.path.join(tree, "a.JPG"))  # only the index forgets
+
+
+def test_forget_file_and_folder(tree):
+    index = ScanIndex(tree)
+    index.forget(os.path.join(tree, "a.JPG"))
+    index.forget(os.path.join(tree, "sub"))
+
+    assert index.find() == {os.path.join(tree, "other", "d.txt")}
+    assert not index.isdir(os.path.join(tree, "sub", "deep"))
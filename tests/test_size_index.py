@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import size_index
+from size_index import DirectorySizeIndex
+from size_of_directory import measure_directory
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for relative, size in (("a.bin", 100), ("big/b.bin", 5000), ("big/deep/c.bin", 300), ("small/d.bin", 10)):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+    return str(root)
+
+
+@pytest.fixture
+def index(tmp_path):
+    with DirectorySizeIndex(str(tmp_path / "sizes.sqlite3")) as index:
+        yield index
+
+
+@pytest.fixture
+def listed(monkeypatch):
+    """Records the directories the index lists."""
+    paths = []
+    scan = size_index._scan_own_files
+
+    def recording(path):
+        paths.append(path)
+        return scan(path)
+
+    monkeypatch.setattr(size_index, "_scan_own_files", recording)
+    return paths
+
+
+def _bump_mtime(path):
+    stat_result = os.stat(path)
+    os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+
+
+def test_totals_match_measure_directory(tree, index):
+    totals = index.get(tree)
+    expected = measure_directory(tree)
+    assert (totals.bytes, totals.allocated, totals.files) == (expected.apparent, expected.allocated, expected.files)
+    assert index.get(os.path.join(tree, "big"), refresh=False).bytes == 5300
+
+
+def test_only_changed_directories_are_listed_again(tree, index, listed):
+    index.refresh(tree)
+    assert len(listed) == 4
+
+    listed.clear()
+    assert index.refresh(tree).bytes == 5410
+    assert listed == []
+
+    deep = os.path.join(tree, "big", "deep")
+    with open(os.path.join(deep, "e.bin"), "wb") as f:
+        f.write(b"x" * 7)
+    _bump_mtime(deep)
+    assert index.refresh(tree).bytes == 5417
+    assert listed == [deep]
+
+
+def test_removed_folders_are_forgotten(tree, index):
+    index.refresh(tree)
+    small = os.path.join(tree, "small")
+    os.remove(os.path.join(small, "d.bin"))
+    os.rmdir(small)
+    _bump_mtime(tree)
+
+    assert index.refresh(tree).bytes == 5400
+    assert index.get(small, refresh=False) is None
+
+
+def test_hardlinks_are_counted_once_like_measure_directory(tree, index):
+    original = os.path.join(tree, "big", "b.bin")
+    os.link(original, os.path.join(tree, "small", "b_link.bin"))
+    os.link(original, os.path.join(tree, "big", "deep", "b_link.bin"))
+
+    expected = measure_directory(tree)
+    assert index.get(tree).bytes == expected.apparent == 5410
+    assert index.get(tree).files == expected.files == 4
+    # Each folder counts the file once even though the link sits in another folder too.
+    assert index.get(os.path.join(tree, "small"), refresh=False).bytes == 5010
+    assert index.get(os.path.join(tree, "big"), refresh=False).bytes == 5300
+
+    # Answered from the stored rows: the same totals without listing anything again.
+    assert index.refresh(tree).bytes == 5410
+
+
+def test_largest_ranks_folders_from_the_index(tree, index, monkeypatch):
+    index.refresh(tree)
+    monkeypatch.setattr(size_index, "_scan_own_files", None)  # largest() must not touch the disk
+
+    join = lambda *parts: os.path.join(tree, *parts)
+    assert [t.path for t in index.largest(3)] == [tree, join("big"), join("big", "deep")]
+    assert [t.path for t in index.largest(10, under=tree)] == [join("big"), join("big", "deep"), join("small")]
+    assert [t.path for t in index.largest(1, under=join("big"))] == [join("big", "deep")]
@@ -0,0 +1,89 @@
+import os
+import random
+
+import pytest
+
+from size_of_directory import get_directory_size, measure_directory, remove_redundant_items_in_set
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "root"
+    for relative, size in (("a.bin", 100), ("sub/b.bin", 200), ("sub/deep/c.bin", 300)):
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+    (root / "empty").mkdir()
+    return str(root)
+
+
+def test_measure_directory_sums_every_file(tree):
+    size = measure_directory(tree)
+    assert (size.apparent, size.files) == (600, 3)
+    assert measure_directory(tree, max_workers=4) == size
+    assert get_directory_size(tree) == 600
+
+
+def test_hardlinks_are_counted_once(tree):
+    os.link(os.path.join(tree, "sub", "b.bin"), os.path.join(tree, "b_link.bin"))
+    os.link(os.path.join(tree, "sub", "b.bin"), os.path.join(tree, "sub", "deep", "b_link.bin"))
+
+    assert measure_directory(tree) == measure_directory(tree, max_workers=4)
+    assert (measure_directory(tree).apparent, measure_directory(tree).files) == (600, 3)
+
+    # Items of a set share the seen inodes, so a file linked into two of them counts once.
+    items = {os.path.join(tree, "sub"), os.path.join(tree, "b_link.bin")}
+    assert get_directory_size(items) == 500
+
+
+@pytest.mark.skipif(not hasattr(os.stat_result, "st_blocks"), reason="st_blocks is not available")
+def test_allocated_size_differs_from_apparent_for_sparse_files(tmp_path):
+    sparse = tmp_path / "sparse.img"
+    with open(sparse, "wb") as f:
+        f.truncate(8 * 1024 * 1024)
+    if os.stat(sparse).st_blocks * 512 >= os.path.getsize(sparse):
+        pytest.skip("the file system does not create sparse files")
+
+    size = measure_directory(str(tmp_path))
+    assert size.apparent == 8 * 1024 * 1024
+    assert size.allocated < size.apparent
+
+
+def test_contained_items_are_removed(tree):
+    join = lambda *parts: os.path.join(tree, *parts)
+    items = {
+        join("sub"),
+        join("sub", "b.bin"),
+        join("sub", "deep"),
+        join("sub", "deep", "c.bin"),
+        join("a.bin"),
+        join("sub") + os.sep,  # same folder, written differently
+    }
+    kept = remove_redundant_items_in_set(items)
+    assert len(kept) == 2
+    assert {os.path.normpath(p) for p in kept} == {join("sub"), join("a.bin")}
+    assert remove_redundant_items_in_set({tree} | items) == {tree}
+
+
+def test_sibling_with_a_common_prefix_is_not_contained(tmp_path):
+    (tmp_path / "photos").mkdir()
+    (tmp_path / "photos-2020").mkdir()
+    (tmp_path / "photos-2020" / "a.jpg").write_bytes(b"x")
+    items = {str(tmp_path / "photos"), str(tmp_path / "photos-2020" / "a.jpg")}
+    assert remove_redundant_items_in_set(items) == items
+
+
+def test_single_sweep_matches_pairwise_containment(tmp_path):
+    folders = []
+    for i in range(40):
+        folder = tmp_path.joinpath(*[f"d{(i * 7 + j) % 5}" for j in range(i % 4 + 1)])
+        folder.mkdir(parents=True, exist_ok=True)
+        folders.append(str(folder))
+    rng = random.Random(0)
+    items = set(rng.sample(folders, 25)) | {os.path.join(f, "file.txt") for f in rng.sample(folders, 15)}
+
+    def contained(item, folder):
+        return item != folder and item.startswith(folder + os.sep)
+
+    expected = {item for item in items if not any(os.path.isdir(f) and contained(item, f) for f in items)}
+    assert remove_redundant_items_in_set(items) == expected
@@ -0,0 +1,19 @@
+import os
+
+from stream_archive import create_stream_archive, extract_stream_archive
+
+
+def test_symlinked_folder_is_archived_as_a_link(tmp_path):
+    folder = tmp_path / "album"
+    (folder / "photos").mkdir(parents=True)
+    (folder / "photos" / "a.jpg").write_bytes(b"jpeg data")
+    os.symlink("photos", folder / "latest")
+    archive_path = str(folder / "album.tar.xz")
+
+    assert create_stream_archive(str(folder), archive_path, workers=1)
+    assert os.listdir(folder) == ["album.tar.xz.001"]
+
+    extracted = tmp_path / "extracted"
+    assert extract_stream_archive(archive_path, str(extracted))
+    assert os.readlink(extracted / "album" / "latest") == "photos"
+    assert (extracted / "album" / "latest" / "a.jpg").read_bytes() == b"jpeg data"
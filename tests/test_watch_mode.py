@@ -0,0 +1,84 @@
+import os
+
+import main
+from media_fixtures import jpeg
+from metadata_cache import MetadataCache
+from scan_index import ScanIndex
+
+MESSENGER_DIR = r"unsorted\facebook\facebook_messenger" # as main.run_stages names it
+
+
+def _contents(top):
+    contents = []
+    for dirpath, _, filenames in os.walk(top):
+        for filename in filenames:
+            with open(os.path.join(dirpath, filename), "rb") as f:
+                contents.append(f.read())
+    return sorted(contents)
+
+
+def test_forget_keeps_nested_destination(tmp_path, write_file):
+    src_dir = str(tmp_path / "src")
+    dest_dir = os.path.join(src_dir, "sorted")
+    write_file(os.path.join(src_dir, "loose.jpg"), b"x")
+    write_file(os.path.join(src_dir, "other", "deep.jpg"), b"x")
+    write_file(os.path.join(dest_dir, "2020", "kept.jpg"), b"x")
+    index = ScanIndex([src_dir, dest_dir])
+
+    index.forget(src_dir, keep=[dest_dir])
+
+    assert index.isfile(os.path.join(dest_dir, "2020", "kept.jpg"))
+    assert not index.isfile(os.path.join(src_dir, "loose.jpg"))
+    assert not index.isdir(os.path.join(src_dir, "other"))
+    assert index.isdir(src_dir)
+
+
+def test_watch_batch_does_not_overwrite_nested_destination(tmp_path, monkeypatch, write_file, emitted):
+    src_dir = str(tmp_path / "src")
+    dest_dir = os.path.join(src_dir, "sorted")
+    existing = os.path.join(dest_dir, MESSENGER_DIR, "received_1.jpeg")
+    arrival = os.path.join(src_dir, "received_1.jpeg")
+    write_file(existing, jpeg(b"ORIGINAL"))
+
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    index = ScanIndex([src_dir, dest_dir], cache=cache)
+
+    def fake_watch(root, on_batch, settle_seconds, exclude=None):
+        write_file(arrival, jpeg(b"NEW ARRIVAL"))
+        on_batch([arrival])
+
+    monkeypatch.setattr(main, "watch", fake_watch)
+    main.watch_and_organize(src_dir, dest_dir, index, cache)
+    cache.close()
+
+    # Later stages may regroup the destination, but neither file may be lost.
+    assert _contents(src_dir) == sorted([jpeg(b"NEW ARRIVAL"), jpeg(b"ORIGINAL")])
+    assert [message for kind, message, _ in emitted if kind == "error"] == []
+
+
+def test_watch_batch_only_cleans_up_the_folders_it_touched(tmp_path, monkeypatch, write_file, emitted):
+    src_dir = str(tmp_path / "src")
+    dest_dir = str(tmp_path / "dest")
+    unrelated_empty = os.path.join(src_dir, "untouched", "empty")
+    os.makedirs(unrelated_empty)
+    os.makedirs(os.path.join(dest_dir, "2019_05_01"))
+    arrival = os.path.join(src_dir, "drop", "inner", "20200102_120000.jpg")
+
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    index = ScanIndex([src_dir, dest_dir], cache=cache)
+
+    def fake_watch(root, on_batch, settle_seconds, exclude=None):
+        write_file(arrival, jpeg())
+        on_batch([arrival])
+
+    monkeypatch.setattr(main, "watch", fake_watch)
+    main.watch_and_organize(src_dir, dest_dir, index, cache)
+    cache.close()
+
+    assert os.path.isfile(os.path.join(dest_dir, "2020", "2020_01_02", "20200102_120000.jpg"))
+    # The arrival's emptied folders are removed, other empty folders are left for a full run.
+    assert not os.path.exists(os.path.join(src_dir, "drop"))
+    assert os.path.isdir(unrelated_empty)
+    # Only the folder that received the file is grouped by year.
+    assert os.path.isdir(os.path.join(dest_dir, "2019_05_01"))
+    assert [message for kind, message, _ in emitted if kind == "error"] == []